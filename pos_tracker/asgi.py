@@ -3,3 +3,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pos_tracker.settings")
 application = get_asgi_application()
+
+# Serve STATIC_ROOT/MEDIA_ROOT ahead of Django when SERVE_FILES is on
+from tracker.fileserver import FileServerASGI  # noqa: E402
+
+application = FileServerASGI(application)
+
+# Parse/compile all templates now rather than on the first requests
+from django.conf import settings  # noqa: E402
+
+if settings.TEMPLATE_PRECOMPILE:
+    from tracker.template_cache import precompile_templates
+
+    precompile_templates()
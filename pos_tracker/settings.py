@@ -1,30 +1,31 @@
 from pathlib import Path
 import os
+import sys
 import logging
-import pymysql
 
 # Apply compatibility monkeypatch for Django template Context on Python 3.14+
-# Importing tracker.patches.django_compat applies the safe __copy__ at startup.
-try:
-    from tracker.patches import django_compat  # noqa: F401
-except Exception:
-    pass
-
-# Install MySQL driver
-pymysql.install_as_MySQLdb()
+# Importing tracker.patches.django_compat applies the safe __copy__ at startup
+# (only on Python 3.14+, where Django 4.2's own version breaks).
+if sys.version_info >= (3, 14):
+    try:
+        from tracker.patches import django_compat  # noqa: F401
+    except Exception:
+        pass
 
 # Base directory of the project
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-# Load .env (optional) - set environment-specific variables here
-try:
-    from dotenv import load_dotenv
-    load_dotenv(BASE_DIR / '.env')
-    logger = logging.getLogger(__name__)
-    logger.info(f"Loaded .env from {BASE_DIR / '.env'}")
-except Exception:
-    # dotenv not installed or .env missing; fall back to environment
-    pass
+# Load .env (optional) - set environment-specific variables here. dotenv is
+# only imported when there is a file to load.
+if (BASE_DIR / '.env').is_file():
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(BASE_DIR / '.env')
+        logger = logging.getLogger(__name__)
+        logger.info(f"Loaded .env from {BASE_DIR / '.env'}")
+    except Exception:
+        # dotenv not installed; fall back to environment
+        pass
 
 # Security key (DO NOT use the default in production)
 SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-your-secret-key-here')
@@ -63,10 +64,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "tracker.middleware.CompressionMiddleware",  # Brotli/gzip for HTML and JSON
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "tracker.middleware.CustomerMiddleware",  # Lazy request.customer / request.user_profile
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "tracker.middleware.TimezoneMiddleware",  # Custom middleware
@@ -78,9 +81,21 @@ ROOT_URLCONF = "pos_tracker.urls"
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [BASE_DIR / "tracker" / "templates"],
-        "APP_DIRS": True,
+        # CSS-inlined email templates are built ahead of their sources
+        "DIRS": [
+            BASE_DIR / "build" / "email_templates",
+            BASE_DIR / "tracker" / "templates",
+            BASE_DIR / "tracker" / "email_templates",
+        ],
         "OPTIONS": {
+            # Parsed templates are cached in every environment; in development
+            # runserver's autoreloader resets the cache when a template changes
+            "loaders": [
+                ("django.template.loaders.cached.Loader", [
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ]),
+            ],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -90,8 +105,31 @@ TEMPLATES = [
             ],
         },
     },
+    {
+        # Jinja2 copies of the hot public pages (tracker/jinja2); see
+        # tracker.jinja2_env
+        "BACKEND": "django.template.backends.jinja2.Jinja2",
+        "DIRS": [],
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "environment": "tracker.jinja2_env.environment",
+            "context_processors": [
+                "django.contrib.auth.context_processors.auth",
+                "django.contrib.messages.context_processors.messages",
+                "tracker.context_processors.header_notifications",
+            ],
+        },
+    },
 ]
 
+# Render home, services and service_detail with the Jinja2 engine
+JINJA2_HOT_PAGES = str(os.environ.get('JINJA2_HOT_PAGES', True)).lower() in ('1', 'true', 'yes')
+JINJA2_BYTECODE_CACHE_DIR = BASE_DIR / "build" / "jinja2"
+
+# Compile every project template when a WSGI/ASGI worker starts, so the first
+# requests after a deploy don't pay for parsing (see tracker.template_cache)
+TEMPLATE_PRECOMPILE = str(os.environ.get('TEMPLATE_PRECOMPILE', not DEBUG)).lower() in ('1', 'true', 'yes')
+
 WSGI_APPLICATION = "pos_tracker.wsgi.application"
 
  # DATABASE CONFIGURATION (MySQL) 
@@ -116,9 +154,42 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than the shared in-memory database, whose table locks
+        # fail the concurrency tests' threads instead of making them wait
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Precomputed catalog API payloads (tracker.payload_cache) and their version
+# key must be seen by every worker process, or a catalog change only
+# invalidates the worker that saved it. They use the PAYLOAD_CACHE_ALIAS
+# cache: files under build/cache by default (shared by the processes of one
+# host), or e.g. Redis through PAYLOAD_CACHE_BACKEND/PAYLOAD_CACHE_LOCATION
+# when workers run on several hosts. tracker.W002 flags a per-process cache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'payloads': {
+        'BACKEND': os.environ.get('PAYLOAD_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('PAYLOAD_CACHE_LOCATION', str(BASE_DIR / 'build' / 'cache' / 'payloads')),
+    },
+}
+PAYLOAD_CACHE_ALIAS = 'payloads'
+
+# Libraries that must only be imported inside the code that uses them (PDF,
+# OCR, spreadsheets, image processing, CSS tooling), never while Django starts.
+# The tracker.W001 system check and `manage.py importtime --check` enforce it.
+HEAVY_MODULES = (
+    'pandas', 'numpy', 'reportlab', 'fitz', 'pymupdf', 'PyPDF2', 'pytesseract',
+    'lxml', 'PIL', 'cssutils', 'premailer', 'openpyxl', 'requests',
+)
+
+# Install MySQL driver (only needed, and only imported, for the MySQL backend)
+if DATABASES['default']['ENGINE'] == 'django.db.backends.mysql':
+    import pymysql
+    pymysql.install_as_MySQLdb()
+
 # Timezone settings
 TIME_ZONE = 'Asia/Riyadh'
 USE_TZ = True
@@ -155,6 +226,29 @@ STATIC_URL = "/static/"
 STATICFILES_DIRS = [BASE_DIR / "tracker" / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# collectstatic minifies CSS, writes content-hashed names with a manifest and
+# precompressed .gz/.br siblings (see tracker.storage)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "tracker.storage.MinifiedManifestStaticFilesStorage"},
+}
+STATIC_BUILD_CACHE_DIR = BASE_DIR / "build" / "static"
+
+# `manage.py purge_css` writes per-page-group Bootstrap bundles without unused
+# rules (see tracker.css_purge). Run it before collectstatic; until a bundle
+# exists the templates keep loading the full stylesheet from the CDN.
+CSS_BUNDLE_DIR = BASE_DIR / "build" / "css_bundles"
+if CSS_BUNDLE_DIR.is_dir():
+    STATICFILES_DIRS.append(("bundles", CSS_BUNDLE_DIR))
+
+# `manage.py build_critical_css` (see tracker.critical_css) renders the landing
+# pages, extracts the rules needed for their first screen and stores them here.
+# Those pages inline the rules and load their full stylesheets asynchronously.
+# Re-run it after purge_css/collectstatic or when the page layout changes.
+CRITICAL_CSS_DIR = BASE_DIR / "build" / "critical_css"
+CRITICAL_CSS_PAGES = ("home", "services", "service_detail")
+CRITICAL_CSS_FOLD_ELEMENTS = 150
+
 # Media files (uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -162,9 +256,34 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Allow same-origin embedding (needed to preview PDFs in iframes)
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
+# The WSGI/ASGI entry points serve STATIC_ROOT and MEDIA_ROOT themselves
+# (tracker.fileserver): precompressed variants, byte ranges and sendfile.
+# Off in DEBUG, where runserver serves files from the app directories.
+SERVE_FILES = str(os.environ.get('SERVE_FILES', not DEBUG)).lower() in ('1', 'true', 'yes')
+# Cache lifetime (seconds) for files without a content hash in their name
+FILE_SERVER_MAX_AGE = int(os.environ.get('FILE_SERVER_MAX_AGE', 3600))
+
+# CompressionMiddleware levels, picked with `manage.py benchmark_compression`
+# on /tracker/services/ (110 KB of HTML). Brotli 5 gives 15.2 KB in ~4 ms,
+# while 11 only saves another 2 KB for ~240 ms. Gzip 6 gives 16.5 KB in ~3 ms,
+# and 9 triples the CPU time for 1%.
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+# Bodies smaller than this (bytes) aren't worth the Vary/CPU
+COMPRESS_MIN_SIZE = 500
+
+# Admin CSV/XLSX exports (tracker.exports) fetch and write this many rows at
+# a time, which bounds their memory use whatever the table size
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
 # Primary key auto field
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Authentication backends (email-first login, username fallback)
+AUTHENTICATION_BACKENDS = [
+    "tracker.backends.EmailBackend",
+]
+
 # Authentication redirects
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/login/"
@@ -186,6 +305,114 @@ if not DEBUG:
 APSCHEDULER_DATETIME_FORMAT = "N j, Y, f:s a"
 APSCHEDULER_RUN_NOW_TIMEOUT = 25  # Seconds
 
+# Workshop reminders: window key -> minutes before the start time
+WORKSHOP_REMINDER_WINDOWS = {
+    '24h': 24 * 60,
+    '1h': 60,
+}
+
+# Registration availability checks: seconds before each process rebuilds its
+# username/email Bloom filters from the database
+AVAILABILITY_FILTER_TTL = int(os.environ.get('AVAILABILITY_FILTER_TTL', 300))
+
+# Intake queue: contact/service-request submissions are spooled here and
+# written to the database by `manage.py drain_intake`. With write-behind off
+# (the default in DEBUG) each submission is drained inline.
+INTAKE_SPOOL_PATH = os.environ.get('INTAKE_SPOOL_PATH', BASE_DIR / 'intake_spool.sqlite3')
+INTAKE_WRITE_BEHIND = str(os.environ.get('INTAKE_WRITE_BEHIND', not DEBUG)).lower() in ('1', 'true', 'yes')
+
+# Email: messages are spooled by tracker.mail.SpoolEmailBackend and sent by
+# `manage.py send_queued_mail` through MAIL_SPOOL_BACKEND. With
+# MAIL_BACKGROUND off (the default in DEBUG) each message is sent as soon as
+# it is spooled. For local testing, point EMAIL_HOST/EMAIL_PORT at an SMTP
+# stand-in such as `python -m aiosmtpd -n -l localhost:1025`.
+EMAIL_BACKEND = 'tracker.mail.SpoolEmailBackend'
+MAIL_SPOOL_BACKEND = os.environ.get('MAIL_SPOOL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+MAIL_SPOOL_PATH = os.environ.get('MAIL_SPOOL_PATH', BASE_DIR / 'mail_spool.sqlite3')
+MAIL_BACKGROUND = str(os.environ.get('MAIL_BACKGROUND', not DEBUG)).lower() in ('1', 'true', 'yes')
+# Seconds a sender holds a claimed batch before another sender may retry it
+MAIL_SEND_LEASE = 900
+# CSS-inlined email templates, written by `manage.py build_email_templates`
+# (run it on deploy) and refreshed by the mail worker
+EMAIL_TEMPLATE_BUILD_DIR = BASE_DIR / 'build' / 'email_templates'
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 1025 if DEBUG else 587))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = str(os.environ.get('EMAIL_USE_TLS', not DEBUG)).lower() in ('1', 'true', 'yes')
+EMAIL_TIMEOUT = 20
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'The Writing Hub Tz <thewritinghubtz@gmail.com>')
+
+# Uploaded images get WebP/JPEG variants at these widths (see tracker.images),
+# generated by the scheduler or `manage.py generate_image_derivatives`. With
+# background processing off (the default in DEBUG) uploads are processed
+# right after they are saved. Until then pages use the original, and each
+# process re-checks for the variants every IMAGE_MANIFEST_MISS_TTL seconds.
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 960, 1280)
+IMAGE_SPOOL_PATH = os.environ.get('IMAGE_SPOOL_PATH', BASE_DIR / 'image_spool.sqlite3')
+IMAGE_DERIVATIVES_BACKGROUND = str(os.environ.get('IMAGE_DERIVATIVES_BACKGROUND', not DEBUG)).lower() in ('1', 'true', 'yes')
+IMAGE_MANIFEST_MISS_TTL = int(os.environ.get('IMAGE_MANIFEST_MISS_TTL', 30))
+
+# Admin report PDFs (see tracker.reports) are rendered by the scheduler and
+# cached here by period and data version. With background rendering off (the
+# default in DEBUG) the request that asks for a PDF renders it.
+REPORT_PDF_DIR = Path(os.environ.get('REPORT_PDF_DIR', BASE_DIR / 'build' / 'reports'))
+REPORT_SPOOL_PATH = os.environ.get('REPORT_SPOOL_PATH', BASE_DIR / 'report_spool.sqlite3')
+REPORT_PDF_BACKGROUND = str(os.environ.get('REPORT_PDF_BACKGROUND', not DEBUG)).lower() in ('1', 'true', 'yes')
+
+# Attendance certificates (tracker.certificates) are rendered in chunks of
+# CERTIFICATE_CHUNK_SIZE pages by up to CERTIFICATE_WORKERS processes
+# (default: one per CPU)
+CERTIFICATE_WORKERS = int(os.environ['CERTIFICATE_WORKERS']) if os.environ.get('CERTIFICATE_WORKERS') else None
+CERTIFICATE_CHUNK_SIZE = 50
+
+# Service request attachments (tracker.attachments) are uploaded in chunks of
+# up to ATTACHMENT_CHUNK_SIZE bytes into ATTACHMENT_ROOT, which is private
+# (downloads go through a permission-checked view). Page and word counts are
+# extracted by the scheduler, or right after the upload with background
+# processing off (the default in DEBUG).
+ATTACHMENT_ROOT = Path(os.environ.get('ATTACHMENT_ROOT', BASE_DIR / 'private'))
+ATTACHMENT_MAX_SIZE = int(os.environ.get('ATTACHMENT_MAX_SIZE', 200 * 1024 * 1024))
+ATTACHMENT_CHUNK_SIZE = 4 * 1024 * 1024
+ATTACHMENT_EXTENSIONS = (
+    '.pdf', '.doc', '.docx', '.odt', '.rtf', '.txt', '.tex',
+    '.csv', '.xls', '.xlsx', '.sav', '.dta', '.zip',
+)
+# ResearchService categories whose request form takes attachments
+ATTACHMENT_CATEGORIES = ('concept_proposal', 'thesis', 'articles', 'data_analysis', 'research_design')
+# Unfinished uploads, and finished ones never attached to a request, are
+# deleted after this many seconds
+ATTACHMENT_UPLOAD_EXPIRY = 24 * 60 * 60
+ATTACHMENT_SPOOL_PATH = os.environ.get('ATTACHMENT_SPOOL_PATH', BASE_DIR / 'attachment_spool.sqlite3')
+ATTACHMENT_ANALYSIS_BACKGROUND = str(os.environ.get('ATTACHMENT_ANALYSIS_BACKGROUND', not DEBUG)).lower() in ('1', 'true', 'yes')
+
+# OCR of scanned PDF attachments (tracker.ocr). Pages with fewer than
+# OCR_MIN_WORDS words of text layer are rendered at OCR_DPI and recognized by
+# tesseract in OCR_WORKERS processes (default: one per CPU), with at most
+# OCR_MAX_PENDING page images queued (default: twice the workers).
+OCR_WORKERS = int(os.environ['OCR_WORKERS']) if os.environ.get('OCR_WORKERS') else None
+OCR_MAX_PENDING = None
+OCR_DPI = 300
+OCR_LANGUAGES = os.environ.get('OCR_LANGUAGES', 'eng')
+OCR_MIN_WORDS = 10
+OCR_SPOOL_PATH = os.environ.get('OCR_SPOOL_PATH', BASE_DIR / 'ocr_spool.sqlite3')
+OCR_BACKGROUND = str(os.environ.get('OCR_BACKGROUND', not DEBUG)).lower() in ('1', 'true', 'yes')
+
+# Near-duplicate detection for attachment texts (tracker.similarity): MinHash
+# signatures of SIMILARITY_SHINGLE_SIZE-word shingles, split into
+# SIMILARITY_BANDS LSH bands. 64 bands of 2 rows also catch partly recycled
+# documents (from about 15% shared shingles).
+SIMILARITY_INDEX_DIR = ATTACHMENT_ROOT / 'similarity'
+SIMILARITY_SHINGLE_SIZE = 5
+SIMILARITY_PERMUTATIONS = 128
+SIMILARITY_BANDS = 64
+SIMILARITY_MIN_SCORE = 0.2
+
+# Admin changelists of tables with at least this many rows show the
+# database's row estimate (PostgreSQL/MySQL statistics) instead of running
+# COUNT(*) when unfiltered
+ADMIN_ESTIMATED_COUNT_MIN = 50000
+
 # Logging configuration
 LOGGING = {
     'version': 1,
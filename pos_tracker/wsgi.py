@@ -3,3 +3,16 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pos_tracker.settings")
 application = get_wsgi_application()
+
+# Serve STATIC_ROOT/MEDIA_ROOT ahead of Django when SERVE_FILES is on
+from tracker.fileserver import FileServerWSGI  # noqa: E402
+
+application = FileServerWSGI(application)
+
+# Parse/compile all templates now rather than on the first requests
+from django.conf import settings  # noqa: E402
+
+if settings.TEMPLATE_PRECOMPILE:
+    from tracker.template_cache import precompile_templates
+
+    precompile_templates()
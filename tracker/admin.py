@@ -1,10 +1,83 @@
+from django.conf import settings
 from django.contrib import admin
-from django.utils.html import format_html
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count, Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html, format_html_join
 from .models import (
     Customer, ResearchService, ConsultancySubService, ServiceRequest,
-    Workshop, WorkshopRegistration, ClientTestimonial, UserProfile,
-    Notification, CompanyProfile, Leadership, ServiceImage, TutorialVideo, ServiceFAQ
+    Workshop, WorkshopRegistration, WorkshopWaitlistEntry, ClientTestimonial, UserProfile,
+    Notification, CompanyProfile, Leadership, ServiceImage, TutorialVideo, ServiceFAQ,
+    RequestAttachment,
 )
+from .certificates import certificates_filename, merged_pdf, stream_zip
+from .forms import AdminUserChangeForm, AdminUserCreationForm
+from .exports import export_response
+from .similarity import similar_attachments
+from .workshops import cancel_registration, sync_seats
+
+
+def _export_action(dataset, fmt):
+    def action(modeladmin, request, queryset):
+        return export_response(dataset, fmt, {}, queryset)
+    action.__name__ = f'export_{fmt}'
+    action.short_description = f"Export selected as {fmt.upper()}"
+    return action
+
+
+def estimated_count(model):
+    """Row count of ``model``'s table from the database statistics, or None
+    where the backend keeps none (SQLite)
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for a table that was never analyzed
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Uses the planner's row estimate instead of COUNT(*) for an unfiltered
+    changelist of a table above ``ADMIN_ESTIMATED_COUNT_MIN`` rows
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_count(self.object_list.model)
+            if estimate is not None and estimate >= getattr(settings, 'ADMIN_ESTIMATED_COUNT_MIN', 50000):
+                return estimate
+        return super().count
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class TrackerUserAdmin(UserAdmin):
+    """Stock user admin, checking emails case-insensitively like the database does"""
+    form = AdminUserChangeForm
+    add_form = AdminUserCreationForm
+    add_fieldsets = (
+        (None, {
+            'classes': ('wide',),
+            'fields': ('username', 'email', 'password1', 'password2'),
+        }),
+    )
 
 
 @admin.register(Customer)
@@ -13,6 +86,9 @@ class CustomerAdmin(admin.ModelAdmin):
     list_filter = ('customer_type', 'is_active', 'registration_date')
     search_fields = ('full_name', 'email', 'phone', 'organization')
     readonly_fields = ('registration_date', 'last_contact')
+    actions = [_export_action('clients', 'csv'), _export_action('clients', 'xlsx')]
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     fieldsets = (
         ('Basic Information', {
             'fields': ('user', 'email', 'full_name', 'phone', 'organization')
@@ -76,12 +152,55 @@ class ConsultancySubServiceAdmin(admin.ModelAdmin):
     )
 
 
+class RequestAttachmentInline(admin.TabularInline):
+    model = RequestAttachment
+    extra = 0
+    can_delete = False
+    fields = ('download_link', 'size', 'page_count', 'word_count', 'ocr_pages', 'similar_documents', 'status', 'completed_at')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def similar_documents(self, obj):
+        if not obj.extracted_text:
+            return '-'
+        matches = similar_attachments(obj, limit=3)
+        if not matches:
+            return 'None found'
+        return format_html_join(
+            format_html('<br>'), '{} <a href="{}">{}</a> ({})',
+            (
+                (
+                    f'{score:.0%}',
+                    reverse('admin:tracker_servicerequest_change', args=[match.service_request_id]) if match.service_request_id
+                    else reverse('download_attachment', args=[match.upload_id]),
+                    match.original_name,
+                    match.service_request.customer.full_name if match.service_request_id else 'not submitted',
+                )
+                for match, score in matches
+            ),
+        )
+    similar_documents.short_description = "Similar documents"
+
+    def download_link(self, obj):
+        if obj.status != 'complete':
+            return obj.original_name
+        return format_html('<a href="{}">{}</a>', reverse('download_attachment', args=[obj.upload_id]), obj.original_name)
+    download_link.short_description = "File"
+
+
 @admin.register(ServiceRequest)
 class ServiceRequestAdmin(admin.ModelAdmin):
     list_display = ('title', 'customer_link', 'service', 'status_badge', 'deadline', 'created_at')
     list_filter = ('status', 'created_at', 'service')
-    search_fields = ('title', 'description', 'customer__full_name', 'customer__email')
+    search_fields = ('title', 'description', 'customer__full_name', 'customer__email', 'attachments__extracted_text')
     readonly_fields = ('created_at', 'updated_at', 'completed_at')
+    actions = [_export_action('requests', 'csv'), _export_action('requests', 'xlsx')]
+    inlines = [RequestAttachmentInline]
+    list_select_related = ('customer', 'service')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     fieldsets = (
         ('Request Information', {
             'fields': ('customer', 'service', 'title', 'description')
@@ -101,6 +220,7 @@ class ServiceRequestAdmin(admin.ModelAdmin):
     def customer_link(self, obj):
         return obj.customer.full_name
     customer_link.short_description = "Customer"
+    customer_link.admin_order_field = 'customer__full_name'
     
     def status_badge(self, obj):
         colors = {
@@ -120,10 +240,11 @@ class ServiceRequestAdmin(admin.ModelAdmin):
 
 @admin.register(Workshop)
 class WorkshopAdmin(admin.ModelAdmin):
-    list_display = ('title', 'date', 'location_display', 'participant_count', 'is_active')
+    list_display = ('title', 'date', 'location_display', 'participant_count', 'seats_left', 'is_active')
     list_filter = ('is_active', 'is_online', 'date')
     search_fields = ('title', 'description', 'location')
     prepopulated_fields = {'slug': ('title',)}
+    actions = ['certificates_pdf', 'certificates_zip']
     fieldsets = (
         ('Workshop Information', {
             'fields': ('title', 'slug', 'description', 'detailed_description')
@@ -144,14 +265,38 @@ class WorkshopAdmin(admin.ModelAdmin):
             return format_html('<span style="color: blue;">🌐 Online</span>')
         return obj.location
     location_display.short_description = "Location"
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            registered_count=Count('registrations', filter=Q(registrations__status='registered'))
+        )
+
+    def certificates_pdf(self, request, queryset):
+        workshops = list(queryset.select_related('facilitator'))
+        pdf = merged_pdf(workshops)
+        if pdf is None:
+            self.message_user(request, "None of the selected workshops has attendees marked as attended.", level='warning')
+            return None
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{certificates_filename(workshops, "pdf")}"'
+        return response
+    certificates_pdf.short_description = "Attendance certificates (one PDF)"
+
+    def certificates_zip(self, request, queryset):
+        workshops = list(queryset.select_related('facilitator'))
+        response = StreamingHttpResponse(stream_zip(workshops), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{certificates_filename(workshops, "zip")}"'
+        return response
+    certificates_zip.short_description = "Attendance certificates (ZIP of PDFs)"
     
     def participant_count(self, obj):
-        count = obj.get_registration_count()
+        count = obj.registered_count
         max_p = obj.max_participants
         if max_p:
             return f"{count}/{max_p}"
         return str(count)
     participant_count.short_description = "Participants"
+    participant_count.admin_order_field = 'registered_count'
 
 
 @admin.register(WorkshopRegistration)
@@ -160,11 +305,39 @@ class WorkshopRegistrationAdmin(admin.ModelAdmin):
     list_filter = ('status', 'registered_at', 'workshop')
     search_fields = ('customer__full_name', 'workshop__title')
     readonly_fields = ('registered_at', 'attended_at')
+    actions = ['cancel_registrations', _export_action('registrations', 'csv'), _export_action('registrations', 'xlsx')]
+    list_select_related = ('customer', 'workshop')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     
     def customer_name(self, obj):
         return obj.customer.full_name
     customer_name.short_description = "Customer"
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change or {'status', 'workshop'} & set(form.changed_data):
+            sync_seats({obj.workshop_id, form.initial.get('workshop') or obj.workshop_id})
+
+    def cancel_registrations(self, request, queryset):
+        cancelled = sum(cancel_registration(registration) for registration in queryset)
+        self.message_user(request, f"{cancelled} registration(s) cancelled; freed seats went to the waitlist.")
+    cancel_registrations.short_description = "Cancel selected registrations"
+
+
+@admin.register(WorkshopWaitlistEntry)
+class WorkshopWaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('customer_name', 'workshop', 'joined_at')
+    list_filter = ('workshop',)
+    search_fields = ('customer__full_name', 'workshop__title')
+    readonly_fields = ('joined_at',)
+    list_select_related = ('customer', 'workshop')
+    show_full_result_count = False
+
+    def customer_name(self, obj):
+        return obj.customer.full_name
+    customer_name.short_description = "Customer"
+
 
 @admin.register(ClientTestimonial)
 class ClientTestimonialAdmin(admin.ModelAdmin):
@@ -172,6 +345,8 @@ class ClientTestimonialAdmin(admin.ModelAdmin):
     list_filter = ('is_published', 'is_featured', 'rating', 'created_at')
     search_fields = ('customer__full_name', 'quote', 'service__name')
     readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('customer', 'service')
+    show_full_result_count = False
     fieldsets = (
         ('Testimonial', {
             'fields': ('customer', 'service', 'rating', 'quote')
@@ -203,6 +378,9 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_filter = ('email_verified', 'phone_verified', 'newsletter_subscribed', 'created_at')
     search_fields = ('user__username', 'user__email')
     readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('user',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     
     def username(self, obj):
         return obj.user.username
@@ -215,6 +393,9 @@ class NotificationAdmin(admin.ModelAdmin):
     list_filter = ('notification_type', 'is_read', 'created_at')
     search_fields = ('title', 'message', 'user__username')
     readonly_fields = ('created_at',)
+    list_select_related = ('user',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
     def user_link(self, obj):
         return obj.user.username
@@ -304,6 +485,7 @@ class ServiceImageAdmin(admin.ModelAdmin):
     list_filter = ('is_featured', 'service', 'created_at')
     search_fields = ('service__name', 'title', 'description')
     readonly_fields = ('created_at', 'updated_at', 'image_preview')
+    list_select_related = ('service',)
     fieldsets = (
         ('Image Information', {
             'fields': ('service', 'title', 'image', 'image_preview')
@@ -336,6 +518,7 @@ class TutorialVideoAdmin(admin.ModelAdmin):
     list_filter = ('is_published', 'service', 'created_at')
     search_fields = ('service__name', 'title', 'description')
     readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('service',)
     fieldsets = (
         ('Video Information', {
             'fields': ('service', 'title', 'description')
@@ -365,6 +548,7 @@ class ServiceFAQAdmin(admin.ModelAdmin):
     list_filter = ('is_published', 'service', 'created_at')
     search_fields = ('service__name', 'question', 'answer')
     readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('service',)
     fieldsets = (
         ('FAQ Information', {
             'fields': ('service', 'question', 'answer')
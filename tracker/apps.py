@@ -6,8 +6,19 @@ class TrackerConfig(AppConfig):
     name = "tracker"
 
     def ready(self):  # noqa: D401
+        from . import checks  # noqa: F401
+
         # Import signal handlers
         try:
             from . import signals  # noqa: F401
         except Exception:
             pass
+
+        # Jinja2 templates are cached without mtime checks; let runserver's
+        # file watcher invalidate them instead
+        from django.conf import settings
+        if settings.DEBUG:
+            from .template_cache import connect_dev_invalidation
+            connect_dev_invalidation()
+
+        checks.record_startup_modules()
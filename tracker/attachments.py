@@ -0,0 +1,373 @@
+"""Chunked, resumable uploads of service request attachments.
+
+An upload is started with its name and size (and optionally the SHA-256 of
+the whole file), then sent as consecutive chunks. Each chunk says which byte
+offset it starts at and may carry its own SHA-256. Chunks are streamed from
+the request straight into ``partial/<upload id>.part`` under
+``ATTACHMENT_ROOT``, so memory use doesn't depend on the file or chunk size.
+The partial file's size is the resume point: after a dropped connection the
+client asks for the offset and carries on from there.
+
+When the last byte arrives the file is hashed, checked against the declared
+checksum and moved to ``attachments/<upload id>/<name>``. Its text, page and
+word counts (PDF via PyMuPDF, or PyPDF2 if that isn't installed; DOCX and
+plain text) are extracted afterwards by the attachment spool's worker, which
+hands PDFs with scanned pages on to ``tracker.ocr``.
+
+Uploads are made before the request exists (and with the write-behind intake,
+before it is in the database), so they are tied to the submission's intake
+key and linked to the ``ServiceRequest`` when it is written.
+"""
+import hashlib
+import logging
+import os
+import re
+import uuid
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import RequestAttachment, ServiceRequest
+from .spool import SQLiteSpool
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Request body read size while streaming a chunk to disk
+READ_BLOCK = 64 * 1024
+
+spool = SQLiteSpool(
+    getattr(settings, 'ATTACHMENT_SPOOL_PATH', settings.BASE_DIR / 'attachment_spool.sqlite3'),
+    table='attachments',
+)
+
+
+class UploadError(Exception):
+    """A request the upload can't accept; ``status`` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _storage():
+    return RequestAttachment.file.field.storage
+
+
+def partial_path(attachment):
+    return Path(_storage().path(f'partial/{attachment.upload_id}.part'))
+
+
+def received_bytes(attachment):
+    """Bytes stored so far: the offset the next chunk must start at"""
+    if attachment.status == 'complete':
+        return attachment.size
+    try:
+        return partial_path(attachment).stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def safe_name(name):
+    """File name without any directory part or unusual characters"""
+    name = os.path.basename(name.replace('\\', '/')).strip()
+    stem, extension = os.path.splitext(name)
+    stem = re.sub(r'[^\w.\- ]+', '', stem).strip(' .')[:100] or 'document'
+    return stem + extension.lower()
+
+
+# ============================================================================
+# UPLOAD
+# ============================================================================
+
+def start_upload(user, name, size, content_type='', checksum=''):
+    name = safe_name(name or '')
+    extension = os.path.splitext(name)[1]
+    if extension not in settings.ATTACHMENT_EXTENSIONS:
+        raise UploadError(f'{extension or "This file type"} files are not accepted')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('File size is required')
+    if not 0 < size <= settings.ATTACHMENT_MAX_SIZE:
+        raise UploadError(f'Files must be under {settings.ATTACHMENT_MAX_SIZE // (1024 * 1024)} MB', status=413)
+    checksum = (checksum or '').strip().lower()
+    if checksum and not re.fullmatch(r'[0-9a-f]{64}', checksum):
+        raise UploadError('Checksum must be a hex SHA-256 digest')
+
+    attachment = RequestAttachment.objects.create(
+        uploaded_by=user,
+        original_name=name,
+        content_type=(content_type or '')[:100],
+        size=size,
+        checksum=checksum,
+    )
+    path = partial_path(attachment)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return attachment
+
+
+def write_chunk(attachment, offset, stream, length, chunk_checksum=''):
+    """Append ``length`` bytes from ``stream`` at ``offset``; returns the new offset.
+
+    A chunk that doesn't start at the current offset is refused with 409 (the
+    client should ask for the offset and resume). A chunk whose SHA-256 doesn't
+    match ``chunk_checksum`` is discarded.
+    """
+    if attachment.status != 'uploading':
+        raise UploadError(f'Upload is {attachment.get_status_display().lower()}', status=409)
+    if length > settings.ATTACHMENT_CHUNK_SIZE:
+        raise UploadError(f'Chunks must be at most {settings.ATTACHMENT_CHUNK_SIZE} bytes', status=413)
+
+    path = partial_path(attachment)
+    if not path.exists():
+        raise UploadError('Upload has expired', status=410)
+    with path.open('r+b') as f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadError('Another chunk of this upload is being written', status=409)
+        current = os.fstat(f.fileno()).st_size
+        if offset != current:
+            raise UploadError(f'Expected offset {current}', status=409)
+        if current + length > attachment.size:
+            raise UploadError('Chunk goes past the end of the file')
+
+        f.seek(current)
+        digest = hashlib.sha256()
+        remaining = length
+        while remaining:
+            block = stream.read(min(READ_BLOCK, remaining))
+            if not block:
+                break
+            f.write(block)
+            digest.update(block)
+            remaining -= len(block)
+        if remaining or (chunk_checksum and digest.hexdigest() != chunk_checksum.lower()):
+            # Interrupted or corrupted: drop the partial chunk so the client
+            # can resend it from the same offset
+            f.truncate(current)
+            if remaining:
+                raise UploadError('Chunk was incomplete', status=400)
+            raise UploadError('Chunk checksum mismatch', status=422)
+        f.flush()
+        os.fsync(f.fileno())
+        offset = current + length
+
+    if offset == attachment.size:
+        complete_upload(attachment)
+    return offset
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete_upload(attachment):
+    path = partial_path(attachment)
+    attachment.sha256 = _file_sha256(path)
+    if attachment.checksum and attachment.checksum != attachment.sha256:
+        path.unlink(missing_ok=True)
+        attachment.status = 'failed'
+        attachment.save(update_fields=['sha256', 'status'])
+        raise UploadError('File checksum mismatch; please upload it again', status=422)
+
+    name = f'attachments/{attachment.upload_id}/{attachment.original_name}'
+    final = Path(_storage().path(name))
+    final.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(path, final)
+    attachment.file.name = name
+    attachment.status = 'complete'
+    attachment.completed_at = timezone.now()
+    attachment.save(update_fields=['sha256', 'file', 'status', 'completed_at'])
+    schedule_analysis(attachment)
+
+
+def delete_upload(attachment):
+    partial_path(attachment).unlink(missing_ok=True)
+    if attachment.file:
+        attachment.file.delete(save=False)
+        try:
+            Path(_storage().path(attachment.file.name)).parent.rmdir()
+        except OSError:
+            pass
+    attachment.delete()
+
+
+# ============================================================================
+# LINKING TO REQUESTS
+# ============================================================================
+
+def claim_uploads(user, upload_ids, intake_key):
+    """Tie the user's finished, unclaimed uploads to a submission"""
+    # The ids come straight from the form; anything that isn't a UUID can't
+    # name an upload and would make the query raise
+    valid_ids = []
+    for upload_id in upload_ids or ():
+        try:
+            valid_ids.append(uuid.UUID(str(upload_id)))
+        except ValueError:
+            continue
+    if not valid_ids:
+        return 0
+    claimed = RequestAttachment.objects.filter(
+        upload_id__in=valid_ids, uploaded_by=user, status='complete',
+        service_request__isnull=True, intake_key='',
+    ).update(intake_key=intake_key)
+    # The request may already be written (no write-behind)
+    link_attachments([intake_key])
+    return claimed
+
+
+def link_attachments(intake_keys):
+    """Point attachments at the requests written for their intake keys"""
+    return RequestAttachment.objects.filter(
+        intake_key__in=intake_keys, service_request__isnull=True,
+    ).update(service_request=Subquery(
+        ServiceRequest.objects.filter(intake_key=OuterRef('intake_key')).values('pk')[:1]
+    ))
+
+
+def delete_stale_uploads():
+    """Remove unfinished uploads, and finished ones never attached to a
+    request, older than ``ATTACHMENT_UPLOAD_EXPIRY``; returns the number removed
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.ATTACHMENT_UPLOAD_EXPIRY)
+    stale = RequestAttachment.objects.filter(created_at__lt=cutoff, service_request__isnull=True).exclude(
+        status='complete', intake_key__gt='',
+    )
+    removed = 0
+    for attachment in stale.iterator():
+        delete_upload(attachment)
+        removed += 1
+    return removed
+
+
+# ============================================================================
+# TEXT, PAGE AND WORD COUNTS
+# ============================================================================
+
+_WORD_RE = re.compile(r'\w+(?:[\'’.-]\w+)*')
+
+# Separates pages in ``extracted_text``
+PAGE_BREAK = '\f'
+
+
+def count_words(text):
+    return len(_WORD_RE.findall(text))
+
+
+def _pdf_text(path):
+    try:
+        import fitz
+    except ImportError:
+        from PyPDF2 import PdfReader
+
+        reader = PdfReader(str(path))
+        return len(reader.pages), PAGE_BREAK.join(page.extract_text() or '' for page in reader.pages)
+
+    with fitz.open(str(path)) as document:
+        return document.page_count, PAGE_BREAK.join(page.get_text() for page in document)
+
+
+def _docx_text(path):
+    from xml.etree.ElementTree import iterparse
+
+    text_tag = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t'
+    paragraph_tag = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p'
+    paragraphs = []
+    with zipfile.ZipFile(path) as archive:
+        with archive.open('word/document.xml') as document:
+            paragraph = []
+            for _, element in iterparse(document):
+                if element.tag == text_tag:
+                    paragraph.append(element.text or '')
+                elif element.tag == paragraph_tag:
+                    paragraphs.append(''.join(paragraph))
+                    paragraph = []
+                    element.clear()
+        # Word stores the page count it last laid out
+        pages = None
+        try:
+            app = archive.read('docProps/app.xml').decode('utf-8', 'replace')
+            match = re.search(r'<Pages>(\d+)</Pages>', app)
+            pages = int(match.group(1)) if match else None
+        except KeyError:
+            pass
+    return pages, '\n'.join(paragraphs)
+
+
+def _plain_text(path):
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return None, f.read()
+
+
+_EXTRACTORS = {
+    '.pdf': _pdf_text,
+    '.docx': _docx_text,
+    '.txt': _plain_text,
+    '.tex': _plain_text,
+}
+
+
+def analyze(attachment):
+    """Store the text, page and word counts of a finished upload, where the
+    format allows, and add it to the similarity index; PDFs with scanned
+    pages go on to the OCR queue first
+    """
+    from . import ocr, similarity
+
+    extension = os.path.splitext(attachment.original_name)[1]
+    extractor = _EXTRACTORS.get(extension)
+    if extractor is not None:
+        attachment.page_count, text = extractor(_storage().path(attachment.file.name))
+        attachment.extracted_text = text.replace('\x00', '')
+        attachment.word_count = count_words(text)
+    attachment.analyzed_at = timezone.now()
+    attachment.save(update_fields=['page_count', 'word_count', 'extracted_text', 'analyzed_at'])
+    if extension == '.pdf' and ocr.needs_ocr(attachment.extracted_text):
+        ocr.schedule(attachment)
+    elif attachment.extracted_text:
+        similarity.add(attachment)
+
+
+def schedule_analysis(attachment):
+    key = str(attachment.upload_id)
+
+    def enqueue():
+        spool.enqueue(key, key.encode('utf-8'))
+        if not getattr(settings, 'ATTACHMENT_ANALYSIS_BACKGROUND', True):
+            process_queue(keys=[key])
+
+    transaction.on_commit(enqueue)
+
+
+def process_queue(batch_size=10, keys=None):
+    """Analyze queued uploads; returns the number processed"""
+    done = 0
+    for key, _ in spool.fetch(batch_size, keys=keys):
+        try:
+            attachment = RequestAttachment.objects.filter(upload_id=key, status='complete').first()
+            if attachment is not None:
+                analyze(attachment)
+            spool.ack([key])
+            done += 1
+        except Exception as e:
+            logger.exception('Analyzing attachment %s failed', key)
+            spool.fail(key, e)
+    return done
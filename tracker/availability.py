@@ -0,0 +1,120 @@
+"""Per-process Bloom filters for the username/email availability endpoints.
+
+``check_username_availability`` and ``check_email_availability`` are called on
+every keystroke of the registration form. A Bloom filter never gives a false
+negative, so "definitely not taken" is answered from memory and only probable
+hits are confirmed against the database.
+
+Filters are built on first use in each process, kept current by the
+``post_save`` handlers in ``tracker.signals`` and rebuilt periodically so that
+accounts created by other worker processes are picked up. The registration form
+still validates uniqueness on submit; these checks are only a UI hint.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .backends import users_by_email
+from .models import Customer, normalize_email_key as normalize_email
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class AvailabilityIndex:
+    """Bloom filters of taken usernames and normalized emails"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usernames = None
+        self._emails = None
+        self._built_at = 0
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AVAILABILITY_FILTER_TTL', 300)
+
+    def _ensure_built(self):
+        if self._usernames is not None and time.monotonic() - self._built_at < self.ttl:
+            return
+        with self._lock:
+            if self._usernames is not None and time.monotonic() - self._built_at < self.ttl:
+                return
+            self.rebuild()
+
+    def rebuild(self):
+        usernames = list(User.objects.values_list('username', flat=True).iterator())
+        emails = set(normalize_email(e) for e in User.objects.exclude(email='').values_list('email', flat=True).iterator())
+        emails.update(normalize_email(e) for e in Customer.objects.values_list('email', flat=True).iterator())
+
+        # Leave headroom so signal-driven additions don't degrade the error rate
+        username_filter = BloomFilter(capacity=len(usernames) * 2 + 1000)
+        for username in usernames:
+            username_filter.add(username)
+        email_filter = BloomFilter(capacity=len(emails) * 2 + 1000)
+        for email in emails:
+            email_filter.add(email)
+
+        self._usernames, self._emails = username_filter, email_filter
+        self._built_at = time.monotonic()
+
+    def add_username(self, username):
+        if self._usernames is None or not username:
+            return
+        self._usernames.add(username)
+        if self._usernames.count > self._usernames.capacity:
+            self._built_at = 0
+
+    def add_email(self, email):
+        email = normalize_email(email)
+        if self._emails is None or not email:
+            return
+        self._emails.add(email)
+        if self._emails.count > self._emails.capacity:
+            self._built_at = 0
+
+    def username_taken(self, username):
+        self._ensure_built()
+        if username not in self._usernames:
+            return False
+        return User.objects.filter(username=username).exists()
+
+    def email_taken(self, email):
+        self._ensure_built()
+        email = normalize_email(email)
+        if email not in self._emails:
+            return False
+        return (
+            users_by_email(email).exists()
+            or Customer.objects.filter(email_key=email).exists()
+        )
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import CharField, Func
+
+
+class EmailKey(Func):
+    """``NULLIF(LOWER(email), '')`` - the expression indexed on ``auth_user``.
+
+    Blank emails map to NULL so they don't collide in the unique index. The
+    empty string is inlined rather than passed as a parameter so the database
+    can match the query expression against the index expression.
+    """
+    template = "NULLIF(LOWER(%(expressions)s), '')"
+    output_field = CharField()
+
+
+def users_by_email(email):
+    """Case-insensitive email lookup that uses the functional email index"""
+    UserModel = get_user_model()
+    return UserModel._default_manager.alias(
+        email_key=EmailKey('email')
+    ).filter(email_key=(email or '').strip().lower())
+
+
+class EmailBackend(ModelBackend):
+    """Authenticate with an email address (or a username) and password.
+
+    Email identifiers are resolved in a single indexed query; anything
+    without an ``@`` goes through the standard username lookup.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        if '@' not in username:
+            return super().authenticate(request, username=username, password=password, **kwargs)
+
+        user = users_by_email(username).order_by('pk').first()
+        if user is None:
+            # Usernames may contain "@" too; ModelBackend also runs the
+            # hasher for unknown users to keep timing uniform.
+            return super().authenticate(request, username=username, password=password, **kwargs)
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,246 @@
+"""Workshop attendance certificates.
+
+All certificates of a workshop share one page design. It is drawn once per
+PDF as a reportlab form XObject, and each page only stamps the attendee's
+name, attendance date and certificate number on top of it.
+
+Attendees are split into chunks of ``CERTIFICATE_CHUNK_SIZE`` that a
+``ProcessPoolExecutor`` renders in parallel (``CERTIFICATE_WORKERS``
+processes). The workers are given plain data and never touch the database.
+Results come back in attendee order, either merged into one PDF (PyMuPDF) or
+as a ZIP of individual PDFs that is streamed while later chunks are still
+being rendered.
+
+Used by ``manage.py generate_certificates`` and the workshop admin actions.
+"""
+import multiprocessing
+import os
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.text import slugify
+
+# Shared by every certificate of a workshop
+CertificateDesign = namedtuple('CertificateDesign', 'workshop_id title held_on venue facilitator company tagline')
+
+# One stamped page
+Attendee = namedtuple('Attendee', 'number name attended_on')
+
+
+def certificate_number(workshop_id, registration_id):
+    return f'WS{workshop_id:04d}-{registration_id:06d}'
+
+
+def certificate_design(workshop):
+    from .models import CompanyProfile
+
+    company = CompanyProfile.get_profile()
+    facilitator = workshop.facilitator
+    return CertificateDesign(
+        workshop_id=workshop.pk,
+        title=workshop.title,
+        held_on=timezone.localtime(workshop.date).strftime('%d %B %Y'),
+        venue='Online' if workshop.is_online else workshop.location,
+        facilitator=(facilitator.get_full_name() or facilitator.username) if facilitator else '',
+        company=company.company_name if company else '',
+        tagline=company.tagline if company else '',
+    )
+
+
+def attendees(workshop):
+    """Attendees of ``workshop`` in name order"""
+    from .models import WorkshopRegistration
+
+    rows = (
+        WorkshopRegistration.objects.filter(workshop=workshop, status='attended')
+        .order_by('customer__full_name', 'id')
+        .values_list('id', 'customer__full_name', 'attended_at')
+    )
+    fallback = timezone.localtime(workshop.date)
+    return [
+        Attendee(
+            certificate_number(workshop.pk, registration_id),
+            name,
+            (timezone.localtime(attended_at) if attended_at else fallback).strftime('%d %B %Y'),
+        )
+        for registration_id, name, attended_at in rows
+    ]
+
+
+# ============================================================================
+# RENDERING (runs in the worker processes)
+# ============================================================================
+
+NAVY = '#1a3a52'
+GOLD = '#c9a227'
+
+
+def _fit(canvas, text, font, size, width):
+    """Largest font size up to ``size`` at which ``text`` fits in ``width``"""
+    while size > 8 and canvas.stringWidth(text, font, size) > width:
+        size -= 1
+    return size
+
+
+def _draw_design(canvas, design, page_width, page_height):
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.utils import simpleSplit
+
+    canvas.beginForm('design')
+    canvas.setStrokeColor(HexColor(NAVY))
+    canvas.setLineWidth(6)
+    canvas.rect(24, 24, page_width - 48, page_height - 48)
+    canvas.setStrokeColor(HexColor(GOLD))
+    canvas.setLineWidth(1.5)
+    canvas.rect(36, 36, page_width - 72, page_height - 72)
+
+    center = page_width / 2
+    canvas.setFillColor(HexColor(NAVY))
+    canvas.setFont('Helvetica-Bold', 14)
+    canvas.drawCentredString(center, page_height - 80, design.company.upper())
+    canvas.setFont('Times-Bold', 40)
+    canvas.drawCentredString(center, page_height - 140, 'Certificate of Attendance')
+    canvas.setFillColor(HexColor('#555555'))
+    canvas.setFont('Times-Italic', 16)
+    canvas.drawCentredString(center, page_height - 185, 'This is to certify that')
+    canvas.drawCentredString(center, page_height - 290, 'attended the workshop')
+
+    canvas.setFillColor(HexColor(NAVY))
+    canvas.setFont('Helvetica-Bold', 20)
+    y = page_height - 325
+    for line in simpleSplit(design.title, 'Helvetica-Bold', 20, page_width - 200)[:2]:
+        canvas.drawCentredString(center, y, line)
+        y -= 26
+    canvas.setFillColor(HexColor('#555555'))
+    canvas.setFont('Helvetica', 12)
+    held = f'held on {design.held_on}' + (f' · {design.venue}' if design.venue else '')
+    canvas.drawCentredString(center, y - 4, held)
+
+    # Signature and date lines
+    canvas.setStrokeColor(HexColor('#999999'))
+    canvas.setLineWidth(0.75)
+    for x in (center - 250, center + 70):
+        canvas.line(x, 110, x + 180, 110)
+    canvas.setFont('Helvetica', 10)
+    canvas.drawCentredString(center - 160, 96, design.facilitator or 'Facilitator')
+    canvas.drawCentredString(center + 160, 96, 'Date of attendance')
+    if design.tagline:
+        canvas.setFont('Helvetica-Oblique', 9)
+        canvas.drawCentredString(center, 56, design.tagline)
+    canvas.endForm()
+
+
+def _render(design, attendees, buffer):
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen.canvas import Canvas
+
+    page_width, page_height = landscape(A4)
+    canvas = Canvas(buffer, pagesize=(page_width, page_height), pageCompression=1)
+    canvas.setTitle(f'Certificates - {design.title}')
+    canvas.setAuthor(design.company)
+    _draw_design(canvas, design, page_width, page_height)
+    for attendee in attendees:
+        canvas.doForm('design')
+        canvas.setFillColor(HexColor(NAVY))
+        size = _fit(canvas, attendee.name, 'Times-BoldItalic', 34, page_width - 160)
+        canvas.setFont('Times-BoldItalic', size)
+        canvas.drawCentredString(page_width / 2, page_height - 240, attendee.name)
+        canvas.setFillColor(HexColor('#333333'))
+        canvas.setFont('Helvetica', 11)
+        canvas.drawCentredString(page_width / 2 + 160, 116, attendee.attended_on)
+        canvas.setFont('Helvetica', 8)
+        canvas.drawRightString(page_width - 48, 44, f'Certificate No. {attendee.number}')
+        canvas.showPage()
+    canvas.save()
+
+
+def render_pdf(design, attendees):
+    """One PDF with a page per attendee"""
+    from io import BytesIO
+
+    buffer = BytesIO()
+    _render(design, attendees, buffer)
+    return buffer.getvalue()
+
+
+def render_individual(design, attendees):
+    """``[(filename, PDF bytes)]``, one certificate per file"""
+    return [
+        (f'{attendee.number}-{slugify(attendee.name) or "attendee"}.pdf', render_pdf(design, [attendee]))
+        for attendee in attendees
+    ]
+
+
+# ============================================================================
+# FAN-OUT
+# ============================================================================
+
+def _workers():
+    return getattr(settings, 'CERTIFICATE_WORKERS', None) or os.cpu_count() or 1
+
+
+def _chunk_size():
+    return getattr(settings, 'CERTIFICATE_CHUNK_SIZE', 50)
+
+
+def _rendered(render, design, attendees, workers=None):
+    """``render(design, chunk)`` for each chunk of ``attendees``, in order"""
+    size = _chunk_size()
+    chunks = [attendees[i:i + size] for i in range(0, len(attendees), size)]
+    workers = min(workers or _workers(), len(chunks))
+    if workers <= 1:
+        for chunk in chunks:
+            yield render(design, chunk)
+        return
+
+    # Fresh interpreters rather than forks of a (possibly threaded) web worker
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        yield from pool.map(render, [design] * len(chunks), chunks)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def merged_pdf(workshops, workers=None):
+    """Certificates of every attendee of ``workshops`` in one PDF, or None if
+    there are no attendees
+    """
+    import fitz
+
+    merged = fitz.open()
+    for workshop in workshops:
+        for part in _rendered(render_pdf, certificate_design(workshop), attendees(workshop), workers):
+            with fitz.open('pdf', part) as document:
+                merged.insert_pdf(document)
+    if not merged.page_count:
+        return None
+    return merged.tobytes(garbage=3, deflate=True)
+
+
+def stream_zip(workshops, workers=None):
+    """ZIP of individual certificates, one folder per workshop, yielded in
+    pieces as the chunks are rendered
+    """
+    from .exports import StreamBuffer
+
+    buffer = StreamBuffer(b'')
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for workshop in workshops:
+            folder = f'{workshop.pk}-{slugify(workshop.title)[:60] or "workshop"}'
+            for files in _rendered(render_individual, certificate_design(workshop), attendees(workshop), workers):
+                # PDF streams are compressed already
+                for name, data in files:
+                    archive.writestr(f'{folder}/{name}', data)
+                yield buffer.drain()
+    yield buffer.drain()
+
+
+def certificates_filename(workshops, extension):
+    if len(workshops) == 1:
+        return f'certificates-{slugify(workshops[0].title)[:60] or workshops[0].pk}.{extension}'
+    return f'certificates-{timezone.localdate():%Y-%m-%d}.{extension}'
+
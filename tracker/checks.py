@@ -0,0 +1,58 @@
+"""System checks for the tracker app"""
+import sys
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+# Modules imported once the apps were ready. Checks look at this rather than
+# sys.modules because Django's own checks import optional libraries (the
+# ImageField check imports PIL).
+_startup_modules = None
+
+
+def record_startup_modules():
+    """Remember what app loading imported; called at the end of ``TrackerConfig.ready()``"""
+    global _startup_modules
+    _startup_modules = frozenset(sys.modules)
+
+
+def loaded_heavy_modules():
+    """Root names from ``HEAVY_MODULES`` imported while the apps loaded"""
+    modules = sys.modules if _startup_modules is None else _startup_modules
+    return [name for name in getattr(settings, 'HEAVY_MODULES', ()) if name in modules]
+
+
+@register(Tags.urls)
+def check_heavy_imports(app_configs, **kwargs):
+    """Heavy optional libraries must not be imported by models, admin or app setup.
+
+    Anything imported by the time the apps are ready is paid for by every
+    worker boot. Views and URLconfs load later; ``manage.py importtime --check``
+    covers them.
+    """
+    return [
+        Warning(
+            f'{name} is imported while Django starts.',
+            hint=f'Import {name} inside the function that uses it; run `manage.py importtime` to find the importer.',
+            id='tracker.W001',
+        )
+        for name in loaded_heavy_modules()
+    ]
+
+
+@register(Tags.caches)
+def check_payload_cache(app_configs, **kwargs):
+    """The catalog payload cache must be shared by every worker process"""
+    alias = getattr(settings, 'PAYLOAD_CACHE_ALIAS', 'payloads')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    if alias in settings.CACHES and not backend.endswith(('LocMemCache', 'DummyCache')):
+        return []
+    return [
+        Warning(
+            f'The "{alias}" cache used for catalog API payloads is missing or local to each process.',
+            hint='Configure a shared backend (file-based, Redis, Memcached or database) so catalog '
+                 'changes invalidate every worker.',
+            id='tracker.W002',
+        )
+    ]
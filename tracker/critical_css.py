@@ -0,0 +1,270 @@
+"""Build-time critical CSS for the public landing pages.
+
+For each page in ``CRITICAL_CSS_PAGES`` the page is rendered with the test
+client and its ``<link rel="stylesheet">`` sheets are parsed with cssutils.
+The rules whose selectors match one of the first ``CRITICAL_CSS_FOLD_ELEMENTS``
+elements of ``<body>`` (the above-the-fold approximation: navbar, hero and
+whatever follows in document order) are written to
+``CRITICAL_CSS_DIR/<page>.css`` together with ``manifest.json``.
+
+At request time ``{% critical_css %}`` inlines that CSS in ``<head>`` and
+``{% stylesheet %}``/``{% css_bundle %}`` turn the covered links into
+asynchronously loaded ones, so first paint no longer waits for them. Pages
+without a build keep their ordinary render-blocking links.
+
+Selector matching ignores pseudo-classes and pseudo-elements
+(``.btn:hover`` counts as ``.btn``), which errs on the side of inlining a few
+extra rules rather than flashing unstyled content.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import re
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.urls import reverse
+
+from .storage import minify_css
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGES = ('home', 'services', 'service_detail')
+DEFAULT_FOLD_ELEMENTS = 150
+
+# Elements that never render anything themselves
+_SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'link', 'meta'}
+
+_PSEUDO_RE = re.compile(r'::?[a-zA-Z-]+(?:\((?:[^()]|\([^()]*\))*\))?')
+_TRAILING_COMBINATOR_RE = re.compile(r'[>+~]\s*$')
+_FONT_FAMILY_RE = re.compile(r'font-family\s*:\s*([^;}]+)', re.IGNORECASE)
+
+
+def pages():
+    return tuple(getattr(settings, 'CRITICAL_CSS_PAGES', DEFAULT_PAGES))
+
+
+def build_dir():
+    return Path(getattr(settings, 'CRITICAL_CSS_DIR', settings.BASE_DIR / 'build' / 'critical_css'))
+
+
+def _page_url(name):
+    if name == 'service_detail':
+        from .models import ResearchService
+
+        service = ResearchService.objects.filter(is_active=True).order_by('display_order', 'name').first()
+        return reverse(name, args=[service.pk]) if service else None
+    return reverse(name)
+
+
+def _client_host():
+    hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host not in ('*', '')]
+    return hosts[0] if hosts else 'localhost'
+
+
+# ============================================================================
+# STYLESHEETS
+# ============================================================================
+
+def _stylesheet_hrefs(doc):
+    """hrefs of the page's stylesheets, including ones already deferred"""
+    hrefs = []
+    for link in doc.iter('link'):
+        rel = (link.get('rel') or '').lower().split()
+        if 'stylesheet' in rel or ('preload' in rel and link.get('as') == 'style'):
+            href = link.get('href')
+            if href and href not in hrefs and link.getparent().tag != 'noscript':
+                hrefs.append(href)
+    return hrefs
+
+
+@lru_cache(maxsize=None)
+def _fetch_remote(url):
+    cache = build_dir() / 'remote' / f'{hashlib.sha1(url.encode("utf-8")).hexdigest()}.css'
+    if cache.exists():
+        return cache.read_text(encoding='utf-8')
+    if not getattr(settings, 'CRITICAL_CSS_FETCH_REMOTE', True):
+        return None
+
+    import requests
+
+    try:
+        response = requests.get(url, timeout=15)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.warning('Could not fetch %s for critical CSS: %s', url, e)
+        return None
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    cache.write_text(response.text, encoding='utf-8')
+    return response.text
+
+
+def _read_local(href):
+    path = urlsplit(href).path
+    if not path.startswith(settings.STATIC_URL):
+        return None
+    name = path[len(settings.STATIC_URL):]
+    candidates = [finders.find(name)]
+    if settings.STATIC_ROOT:
+        candidates.append(Path(settings.STATIC_ROOT) / name)
+    for candidate in candidates:
+        if candidate and Path(candidate).is_file():
+            return Path(candidate).read_text(encoding='utf-8')
+    return None
+
+
+def read_stylesheet(href):
+    """Text of a stylesheet linked from a page, or None when unavailable"""
+    if urlsplit(href).scheme in ('http', 'https') or href.startswith('//'):
+        return _fetch_remote(('https:' + href) if href.startswith('//') else href)
+    return _read_local(href)
+
+
+# ============================================================================
+# EXTRACTION
+# ============================================================================
+
+def fold_elements(doc, limit):
+    """The first ``limit`` rendered elements of <body> plus html/body themselves"""
+    body = doc.find('body')
+    if body is None:
+        return set()
+    fold = {doc, body}
+    skipped = set()
+    for el in body.iterdescendants():
+        if len(fold) >= limit + 2:
+            break
+        if not isinstance(el.tag, str):
+            continue
+        parent = el.getparent()
+        if el.tag in _SKIP_TAGS or parent in skipped:
+            skipped.add(el)
+            continue
+        fold.add(el)
+    return fold
+
+
+def _matchable(selector):
+    """Selector text lxml can evaluate, with pseudo-classes stripped"""
+    text = _PSEUDO_RE.sub('', selector).strip()
+    if not text or _TRAILING_COMBINATOR_RE.search(text):
+        text += '*'
+    return text
+
+
+class _Matcher:
+    def __init__(self, doc, fold):
+        self.doc = doc
+        self.fold = fold
+        self._cache = {}
+
+    def matches(self, selector):
+        from cssselect import SelectorError
+        from lxml.cssselect import CSSSelector
+
+        text = _matchable(selector)
+        if text not in self._cache:
+            try:
+                self._cache[text] = any(el in self.fold for el in CSSSelector(text)(self.doc))
+            except (SelectorError, ValueError, SyntaxError):
+                self._cache[text] = False
+        return self._cache[text]
+
+
+def _critical_rules(rules, matcher):
+    import cssutils
+
+    kept = []
+    for rule in rules:
+        if rule.type == rule.STYLE_RULE:
+            if any(matcher.matches(selector.selectorText) for selector in rule.selectorList):
+                kept.append(rule.cssText)
+        elif rule.type == rule.MEDIA_RULE:
+            inner = _critical_rules(rule.cssRules, matcher)
+            if inner:
+                kept.append(f'@media {rule.media.mediaText}{{{"".join(inner)}}}')
+        elif rule.type == cssutils.css.CSSRule.FONT_FACE_RULE:
+            # Kept for now, pruned once the critical rules are known
+            kept.append(rule.cssText)
+    return kept
+
+
+def _font_family(font_face):
+    match = _FONT_FAMILY_RE.search(font_face)
+    return match.group(1).strip().strip('"\'').lower() if match else ''
+
+
+def extract_critical(css, base_url, doc, fold):
+    """The rules of ``css`` that apply to ``fold``, minified, with absolute urls"""
+    import cssutils
+
+    cssutils.log.setLevel(logging.CRITICAL)
+    sheet = cssutils.parseString(css, href=base_url, validate=False)
+    cssutils.replaceUrls(sheet, lambda url: urljoin(base_url, url), ignoreImportRules=True)
+
+    kept = _critical_rules(sheet.cssRules, _Matcher(doc, fold))
+    font_faces = [text for text in kept if text.lstrip().startswith('@font-face')]
+    rules = [text for text in kept if text not in font_faces]
+    used = ' '.join(rules).lower()
+    # A @font-face only costs a download when a critical rule uses the family
+    font_faces = [text for text in font_faces if _font_family(text) and _font_family(text) in used]
+    return minify_css('\n'.join(font_faces + rules))
+
+
+def _sizes(text):
+    data = text.encode('utf-8')
+    return len(data), len(gzip.compress(data))
+
+
+def build_critical_css(write=True):
+    """Extract critical CSS for every page; returns a report row per page"""
+    from django.test import Client
+    from lxml import html as lxml_html
+
+    limit = getattr(settings, 'CRITICAL_CSS_FOLD_ELEMENTS', DEFAULT_FOLD_ELEMENTS)
+    client = Client(HTTP_HOST=_client_host())
+    manifest, report = {}, []
+
+    for name in pages():
+        url = _page_url(name)
+        if url is None:
+            logger.warning('No page to render for %s; skipping critical CSS', name)
+            continue
+        response = client.get(url)
+        if response.status_code != 200:
+            logger.warning('%s returned %s; skipping critical CSS', url, response.status_code)
+            continue
+
+        doc = lxml_html.fromstring(response.content.decode(response.charset or 'utf-8'))
+        fold = fold_elements(doc, limit)
+        critical, deferred, blocking = [], [], []
+        for href in _stylesheet_hrefs(doc):
+            css = read_stylesheet(href)
+            if css is None:
+                # Unknown contents stay render-blocking
+                blocking.append((href, None))
+                continue
+            critical.append(extract_critical(css, urljoin(url, href), doc, fold))
+            deferred.append((href, _sizes(css)))
+
+        css = '\n'.join(part for part in critical if part)
+        manifest[name] = {'css': f'{name}.css', 'deferred': [href for href, _ in deferred]}
+        report.append({
+            'page': name,
+            'url': url,
+            'deferred': deferred,
+            'blocking': blocking,
+            'critical': _sizes(css),
+        })
+        if write:
+            directory = build_dir()
+            directory.mkdir(parents=True, exist_ok=True)
+            (directory / f'{name}.css').write_text(css, encoding='utf-8')
+
+    if write:
+        (build_dir() / 'manifest.json').write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+    return report
@@ -0,0 +1,378 @@
+"""Build-time removal of unused rules from vendor stylesheets.
+
+Every page template is parsed with lxml (after blanking out Django template
+syntax) to collect the tags, ids and classes it can produce, following its
+``{% extends %}`` and ``{% include %}`` chain. Class names that only appear in
+inline JavaScript (``classList.add('show')``, HTML built in strings) are picked
+up from quoted strings, and ``class="badge-{{ status }}"`` keeps every class
+starting with ``badge-``.
+
+Pages are grouped by the base template they extend (``CSS_PURGE_GROUPS``). For
+each group the vendor stylesheets are reduced to the rules whose selectors can
+match something in the group, and written to ``CSS_BUNDLE_DIR/<group>.css``,
+which the ``css_bundle`` template tag serves in place of the full CDN file.
+The rule check is deliberately conservative: anything that can't be parsed,
+at-rules other than ``@media``/``@supports``, and selectors that only depend
+on attributes or pseudo-classes are kept.
+"""
+import gzip
+import re
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / 'templates'
+
+DEFAULT_GROUPS = {
+    'public': {
+        'base': 'base.html',
+        'sources': ['assets/css/vendors/bootstrap.css'],
+    },
+    'admin': {
+        'base': 'admin/base.html',
+        'sources': ['assets/css/vendors/bootstrap.css'],
+    },
+}
+
+# Classes Bootstrap's JavaScript adds at runtime
+DEFAULT_SAFELIST = {
+    'show', 'showing', 'hiding', 'fade', 'collapse', 'collapsing', 'collapse-horizontal',
+    'active', 'disabled', 'modal-open', 'modal-backdrop', 'modal-static', 'offcanvas-backdrop',
+    'was-validated', 'is-valid', 'is-invalid', 'dropdown-menu-end', 'dropdown-menu-start',
+    'tooltip', 'tooltip-inner', 'tooltip-arrow', 'popover', 'popover-arrow', 'popover-header',
+    'popover-body', 'toast', 'carousel-item-next', 'carousel-item-prev', 'carousel-item-start',
+    'carousel-item-end', 'visually-hidden', 'visually-hidden-focusable',
+}
+DEFAULT_SAFELIST_PREFIXES = ('bs-tooltip-', 'bs-popover-')
+
+# Elements every page has even if no template spells them out
+ALWAYS_PRESENT_TAGS = {'html', 'body', 'head', '*'}
+
+_EXTENDS_RE = re.compile(r'{%\s*extends\s+[\'"]([^\'"]+)[\'"]')
+_INCLUDE_RE = re.compile(r'{%\s*include\s+[\'"]([^\'"]+)[\'"]')
+_TAG_RE = re.compile(r'{%.*?%}|{#.*?#}', re.DOTALL)
+_VAR_RE = re.compile(r'{{.*?}}', re.DOTALL)
+_VAR_MARKER = 'DJVAR'
+_STRING_RE = re.compile(r'"([^"\\\n]*)"|\'([^\'\\\n]*)\'|`([^`\\]*)`')
+_TOKEN_RE = re.compile(r'-?[_a-zA-Z][\w-]*')
+
+
+class UsedSelectors:
+    """Tags, ids and classes (plus class prefixes) a set of templates can emit"""
+
+    def __init__(self):
+        self.tags = set(ALWAYS_PRESENT_TAGS)
+        self.ids = set()
+        self.classes = set(getattr(settings, 'CSS_PURGE_SAFELIST', DEFAULT_SAFELIST))
+        self.class_prefixes = set(getattr(settings, 'CSS_PURGE_SAFELIST_PREFIXES', DEFAULT_SAFELIST_PREFIXES))
+
+    def update(self, other):
+        self.tags |= other.tags
+        self.ids |= other.ids
+        self.classes |= other.classes
+        self.class_prefixes |= other.class_prefixes
+
+    def add_class(self, token):
+        if _VAR_MARKER in token:
+            prefix = token.split(_VAR_MARKER, 1)[0]
+            if len(prefix) > 2:
+                self.class_prefixes.add(prefix)
+        elif token:
+            self.classes.add(token)
+
+    def has_class(self, name):
+        return name in self.classes or any(name.startswith(p) for p in self.class_prefixes)
+
+
+# ============================================================================
+# TEMPLATES
+# ============================================================================
+
+def _read_template(name):
+    path = TEMPLATE_DIR / name
+    return path.read_text(encoding='utf-8') if path.exists() else ''
+
+
+def scan_template(source):
+    """Selectors used directly in one template's source"""
+    import lxml.html
+
+    used = UsedSelectors()
+    html = _VAR_RE.sub(_VAR_MARKER, _TAG_RE.sub(' ', source))
+    if not html.strip():
+        return used
+
+    try:
+        root = lxml.html.document_fromstring(html)
+    except Exception:
+        root = None
+
+    scripts = []
+    if root is not None:
+        for element in root.iter():
+            if not isinstance(element.tag, str):
+                continue
+            used.tags.add(element.tag.lower())
+            if element.get('id'):
+                used.ids.add(element.get('id').strip())
+            for token in (element.get('class') or '').split():
+                used.add_class(token)
+            if element.tag == 'script' and element.text:
+                scripts.append(element.text)
+            scripts.extend(value for key, value in element.attrib.items() if key.startswith('on'))
+    else:
+        scripts.append(html)
+
+    # Classes toggled or built in JavaScript; over-inclusive on purpose
+    for script in scripts:
+        for match in _STRING_RE.finditer(script):
+            literal = next(group for group in match.groups() if group is not None)
+            for token in _TOKEN_RE.findall(literal):
+                used.add_class(token)
+                used.ids.add(token)
+            for tag in re.findall(r'<([a-zA-Z][\w-]*)', literal):
+                used.tags.add(tag.lower())
+    return used
+
+
+def template_chain(name, _seen=None):
+    """``name`` plus every template it extends or includes, recursively"""
+    seen = _seen if _seen is not None else set()
+    if name in seen:
+        return seen
+    seen.add(name)
+    source = _read_template(name)
+    for parent in _EXTENDS_RE.findall(source) + _INCLUDE_RE.findall(source):
+        template_chain(parent, seen)
+    return seen
+
+
+def root_template(name):
+    while True:
+        match = _EXTENDS_RE.search(_read_template(name))
+        if not match:
+            return name
+        name = match.group(1)
+
+
+def page_templates():
+    """Templates that render whole pages: those extending a base template"""
+    names = sorted(str(p.relative_to(TEMPLATE_DIR)).replace('\\', '/') for p in TEMPLATE_DIR.rglob('*.html'))
+    return [name for name in names if _EXTENDS_RE.search(_read_template(name))]
+
+
+# ============================================================================
+# STYLESHEETS
+# ============================================================================
+
+def _strip_comments(css):
+    out, i, length = [], 0, len(css)
+    while i < length:
+        char = css[i]
+        if char == '/' and css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            i = length if end < 0 else end + 2
+            continue
+        if char in '"\'':
+            end = i + 1
+            while end < length and css[end] != char:
+                end += 2 if css[end] == '\\' else 1
+            out.append(css[i:end + 1])
+            i = end + 1
+            continue
+        out.append(char)
+        i += 1
+    return ''.join(out)
+
+
+def _split_blocks(css):
+    """Top-level ``(prelude, body)`` pairs of comment-free CSS.
+
+    Statements such as ``@charset`` come back with a body of None.
+    """
+    blocks = []
+    i, start, depth, length = 0, 0, 0, len(css)
+    body_start = prelude = None
+    while i < length:
+        char = css[i]
+        if char in '"\'':
+            end = i + 1
+            while end < length and css[end] != char:
+                end += 2 if css[end] == '\\' else 1
+            i = end + 1
+            continue
+        if char == '{':
+            if depth == 0:
+                prelude, body_start = css[start:i], i + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude.strip(), css[body_start:i]))
+                start = i + 1
+        elif char == ';' and depth == 0:
+            blocks.append((css[start:i + 1].strip(), None))
+            start = i + 1
+        i += 1
+    return blocks
+
+
+def _split_selectors(prelude):
+    parts, depth, current = [], 0, []
+    for char in prelude:
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        if char == ',' and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current).strip())
+    return [part for part in parts if part]
+
+
+def _selector_requirements(node, tags, ids, classes):
+    """Collect what must exist for ``node`` to match; False if unsure"""
+    kind = type(node).__name__
+    if kind == 'Element':
+        if node.element:
+            tags.add(node.element.lower())
+        return True
+    if kind == 'Class':
+        classes.add(node.class_name)
+        return _selector_requirements(node.selector, tags, ids, classes)
+    if kind == 'Hash':
+        ids.add(node.id)
+        return _selector_requirements(node.selector, tags, ids, classes)
+    if kind in ('Pseudo', 'Attrib', 'Function', 'Negation', 'Matching', 'SpecificityAdjustment', 'Relation'):
+        # Only the part the pseudo/attribute applies to is required
+        return _selector_requirements(node.selector, tags, ids, classes)
+    if kind == 'CombinedSelector':
+        return (
+            _selector_requirements(node.selector, tags, ids, classes)
+            and _selector_requirements(node.subselector, tags, ids, classes)
+        )
+    return False
+
+
+def selector_is_used(selector, used):
+    import cssselect
+
+    try:
+        parsed = cssselect.parse(selector)
+    except Exception:
+        return True
+    for item in parsed:
+        tags, ids, classes = set(), set(), set()
+        if not _selector_requirements(item.parsed_tree, tags, ids, classes):
+            return True
+        if (
+            tags <= used.tags
+            and ids <= used.ids
+            and all(used.has_class(name) for name in classes)
+        ):
+            return True
+    return False
+
+
+def purge_css(css, used):
+    """``css`` with the rules no template can match removed"""
+    return _purge_blocks(_strip_comments(css), used)
+
+
+def _purge_blocks(css, used):
+    out = []
+    for prelude, body in _split_blocks(css):
+        if body is None:
+            out.append(prelude)
+            continue
+        lowered = prelude.lower()
+        if lowered.startswith(('@media', '@supports', '@layer', '@container', '@document')):
+            inner = _purge_blocks(body, used)
+            if inner.strip():
+                out.append(f'{prelude}{{{inner}}}')
+        elif lowered.startswith('@'):
+            out.append(f'{prelude}{{{body}}}')
+        else:
+            kept = [s for s in _split_selectors(prelude) if selector_is_used(s, used)]
+            if kept:
+                out.append(f'{",".join(kept)}{{{body.strip()}}}')
+    return '\n'.join(out)
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def groups():
+    return getattr(settings, 'CSS_PURGE_GROUPS', DEFAULT_GROUPS)
+
+
+def bundle_dir():
+    return Path(getattr(settings, 'CSS_BUNDLE_DIR', settings.BASE_DIR / 'build' / 'css_bundles'))
+
+
+def _read_sources(sources):
+    parts = []
+    for source in sources:
+        path = finders.find(source)
+        if path is None:
+            raise FileNotFoundError(f'Static file {source!r} not found')
+        parts.append(Path(path).read_text(encoding='utf-8'))
+    return '\n'.join(parts)
+
+
+def _sizes(text):
+    data = text.encode('utf-8')
+    return len(data), len(gzip.compress(data, compresslevel=9))
+
+
+def build_bundles(write=True):
+    """Purge each group's stylesheets; returns ``(bundles, pages)`` report rows.
+
+    ``bundles`` maps group -> ``{'original', 'purged'}`` (bytes, gzip bytes)
+    and ``pages`` lists ``{'page', 'group', 'original', 'bundle', 'page_only'}``.
+    """
+    scans = {}
+
+    def used_by(names):
+        used = UsedSelectors()
+        for name in names:
+            if name not in scans:
+                scans[name] = scan_template(_read_template(name))
+            used.update(scans[name])
+        return used
+
+    pages_by_group = defaultdict(list)
+    base_to_group = {config['base']: group for group, config in groups().items()}
+    for page in page_templates():
+        group = base_to_group.get(root_template(page))
+        if group:
+            pages_by_group[group].append(page)
+
+    bundles, pages = {}, []
+    for group, config in groups().items():
+        css = _read_sources(config['sources'])
+        chains = {page: template_chain(page) for page in pages_by_group[group]}
+        group_used = used_by(set().union(*chains.values()) if chains else template_chain(config['base']))
+        purged = purge_css(css, group_used)
+        original_sizes = _sizes(css)
+        bundles[group] = {'original': original_sizes, 'purged': _sizes(purged)}
+
+        if write:
+            bundle_dir().mkdir(parents=True, exist_ok=True)
+            (bundle_dir() / f'{group}.css').write_text(purged, encoding='utf-8')
+
+        for page, chain in chains.items():
+            pages.append({
+                'page': page,
+                'group': group,
+                'original': original_sizes,
+                'bundle': bundles[group]['purged'],
+                'page_only': _sizes(purge_css(css, used_by(chain))),
+            })
+    return bundles, pages
@@ -0,0 +1,339 @@
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import (
+    Customer, UserProfile, ServiceRequest, WorkshopRegistration, WorkshopWaitlistEntry, ClientTestimonial,
+    normalize_email_key, normalize_phone_key,
+)
+from .workshops import SEAT_HOLDING_STATUSES, sync_seats
+
+# Phone keys shorter than this are too ambiguous to merge customers on
+MIN_PHONE_KEY_LENGTH = 7
+
+
+def _default_full_name(user):
+    return user.get_full_name() or (user.email.split('@')[0] if user.email else user.username)
+
+
+def resolve_account(request):
+    """Return ``(customer, user_profile)`` for the current request.
+
+    Both are loaded through the ``User`` one-to-one relations in a single
+    ``select_related`` query and cached on the request. A user without a linked
+    customer gets the unlinked customer with the same email, if any (e.g. one
+    created by the contact form or in the admin), so their history shows up
+    before anything links the two. When either row doesn't exist yet an unsaved
+    instance is returned instead, so read-only views never write; use
+    ``ensure_customer``/``ensure_user_profile`` before persisting anything that
+    points at them.
+    """
+    if not hasattr(request, '_cached_account'):
+        customer = user_profile = None
+        if request.user.is_authenticated:
+            user = User.objects.select_related('customer_profile', 'profile').get(pk=request.user.pk)
+            customer = getattr(user, 'customer_profile', None)
+            user_profile = getattr(user, 'profile', None)
+
+            email_key = normalize_email_key(request.user.email)
+            if customer is None and email_key:
+                customer = Customer.objects.filter(
+                    user__isnull=True, email_key=email_key,
+                ).order_by('pk').first()
+            if customer is None:
+                customer = Customer(
+                    user=request.user,
+                    email=request.user.email,
+                    full_name=_default_full_name(request.user),
+                    phone='',
+                )
+            elif customer.user_id == request.user.pk:
+                customer.user = request.user
+            if user_profile is None:
+                user_profile = UserProfile(user=request.user)
+            else:
+                user_profile.user = request.user
+        request._cached_account = (customer, user_profile)
+    return request._cached_account
+
+
+def ensure_customer(request):
+    """Persist the request's customer on first write and return it.
+
+    A customer created earlier by email (e.g. from the contact form) is linked
+    to the user instead of creating a second row.
+    """
+    customer, user_profile = resolve_account(request)
+    if customer is not None and (customer.pk is None or customer.user_id is None):
+        customer = customer_for_user(request.user, email=customer.email, full_name=customer.full_name)
+        request._cached_account = (customer, user_profile)
+        request.customer = customer
+    return customer
+
+
+def customer_for_user(user, email='', full_name='', phone=''):
+    """Return ``user``'s customer, linking or creating it if needed.
+
+    Besides the user's own row, only an unlinked customer with the same
+    (non-blank) address is taken over. A customer linked to another account is
+    never returned; if it holds the address, the new row is created without
+    one.
+    """
+    customer = Customer.objects.filter(user=user).first()
+    if customer is not None:
+        return customer
+
+    email = (email or '').strip()
+    email_key = normalize_email_key(email)
+    if email_key:
+        unlinked = Customer.objects.filter(user__isnull=True, email_key=email_key).order_by('pk').first()
+        # Conditional, so a concurrent link to another user wins cleanly
+        if unlinked is not None and Customer.objects.filter(pk=unlinked.pk, user__isnull=True).update(user=user):
+            unlinked.user = user
+            return unlinked
+        if Customer.objects.filter(email_key=email_key).exists():
+            email = ''
+
+    try:
+        with transaction.atomic():
+            return Customer.objects.create(
+                email=email or None,
+                full_name=full_name or _default_full_name(user),
+                phone=phone or '',
+                user=user,
+                last_contact=timezone.now(),
+            )
+    except IntegrityError:
+        # Created concurrently for the same user
+        customer = Customer.objects.filter(user=user).first()
+        if customer is None:
+            raise
+        return customer
+
+
+def ensure_user_profile(request):
+    """Persist the request's user profile on first write and return it"""
+    customer, user_profile = resolve_account(request)
+    if user_profile is not None and user_profile.pk is None:
+        user_profile, _ = UserProfile.objects.get_or_create(user=request.user)
+        request._cached_account = (customer, user_profile)
+        request.user_profile = user_profile
+    return user_profile
+
+
+# ============================================================================
+# INTAKE UPSERT
+# ============================================================================
+
+def _matching_customer(email_key, user):
+    if email_key:
+        return Customer.objects.filter(email_key=email_key).order_by('pk').first()
+    # Without an address there is nothing to match on but the user's own row
+    if user is not None:
+        return Customer.objects.filter(user=user).first()
+    return None
+
+
+def upsert_customer(email, full_name='', phone='', user=None):
+    """Return the customer for ``email``, creating it if needed.
+
+    Matching uses the indexed ``email_key`` so case and whitespace variants of
+    an address resolve to the same row. A blank address matches nothing (only
+    ``user``'s own customer, if given), so it always gets a row of its own.
+    Blank name/phone/user on an existing customer are filled in from the
+    submission; nothing is overwritten.
+    """
+    email = (email or '').strip()
+    email_key = normalize_email_key(email)
+    now = timezone.now()
+
+    customer = _matching_customer(email_key, user)
+    if customer is None:
+        try:
+            with transaction.atomic():
+                return Customer.objects.create(
+                    email=email or None,
+                    full_name=full_name or email_key.split('@')[0],
+                    phone=phone or '',
+                    user=user,
+                    last_contact=now,
+                )
+        except IntegrityError:
+            # Lost a race with a concurrent submission for the same address
+            # (or, without one, for the same user)
+            customer = _matching_customer(email_key, user)
+            if customer is None:
+                raise
+
+    update_fields = ['last_contact']
+    customer.last_contact = now
+    if full_name and not customer.full_name:
+        customer.full_name = full_name
+        update_fields.append('full_name')
+    if phone and not customer.phone:
+        customer.phone = phone
+        update_fields.append('phone')
+    if user is not None and customer.user_id is None:
+        customer.user = user
+        update_fields.append('user')
+    customer.save(update_fields=update_fields)
+    return customer
+
+
+# ============================================================================
+# DEDUPLICATION
+# ============================================================================
+
+def find_duplicate_clusters(match_phone=False):
+    """Group customers that share an email key (or, with ``match_phone``, a
+    phone key).
+
+    Phone matching is opt-in: households and offices share numbers, so it
+    clusters people who aren't the same customer. A single pass buckets every customer by its keys (blocking), then a
+    union-find joins buckets that overlap, so the whole table is clustered in
+    O(n) without pairwise comparisons. Returns a list of id lists, each with
+    at least two members.
+    """
+    parent = {}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a, b):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    first_by_key = {}
+    rows = Customer.objects.values_list('id', 'email_key', 'phone_key').order_by('id')
+    for customer_id, email_key, phone_key in rows.iterator(chunk_size=2000):
+        parent[customer_id] = customer_id
+        keys = []
+        if email_key:
+            keys.append(('email', email_key))
+        if match_phone and len(phone_key) >= MIN_PHONE_KEY_LENGTH:
+            keys.append(('phone', phone_key))
+        for key in keys:
+            if key in first_by_key:
+                union(first_by_key[key], customer_id)
+            else:
+                first_by_key[key] = customer_id
+
+    clusters = defaultdict(list)
+    for customer_id in parent:
+        clusters[find(customer_id)].append(customer_id)
+    return [sorted(ids) for ids in clusters.values() if len(ids) > 1]
+
+
+def choose_survivor(customers):
+    """Prefer the customer linked to a user account, then the oldest"""
+    return sorted(customers, key=lambda c: (c.user_id is None, c.registration_date, c.pk))[0]
+
+
+def _merge_workshop_rows(survivor, duplicate_ids):
+    """Re-point the duplicates' registrations and waitlist entries; returns the
+    ids of the workshops touched
+    """
+    registrations = {
+        r.workshop_id: r for r in WorkshopRegistration.objects.filter(customer=survivor)
+    }
+    drop_ids, keep_ids = [], []
+    for registration in WorkshopRegistration.objects.filter(
+        customer_id__in=duplicate_ids
+    ).order_by('registered_at', 'pk'):
+        current = registrations.get(registration.workshop_id)
+        if current is not None and (
+            current.status in SEAT_HOLDING_STATUSES or registration.status not in SEAT_HOLDING_STATUSES
+        ):
+            drop_ids.append(registration.pk)
+            continue
+        # The duplicate holds a seat the survivor doesn't: its registration wins
+        if current is not None:
+            if current.pk in keep_ids:
+                keep_ids.remove(current.pk)
+            drop_ids.append(current.pk)
+        registrations[registration.workshop_id] = registration
+        keep_ids.append(registration.pk)
+    WorkshopRegistration.objects.filter(pk__in=drop_ids).delete()
+    WorkshopRegistration.objects.filter(pk__in=keep_ids).update(customer=survivor)
+
+    # Keep the earliest waitlist place per workshop, unless the survivor now
+    # holds a seat there
+    seated = {
+        workshop_id for workshop_id, r in registrations.items() if r.status in SEAT_HOLDING_STATUSES
+    }
+    entries = {}
+    for entry in WorkshopWaitlistEntry.objects.filter(
+        customer_id__in=[survivor.pk] + duplicate_ids
+    ).order_by('joined_at', 'pk'):
+        if entry.workshop_id not in seated and entry.workshop_id not in entries:
+            entries[entry.workshop_id] = entry.pk
+    waitlisted = WorkshopWaitlistEntry.objects.filter(customer_id__in=[survivor.pk] + duplicate_ids)
+    waitlisted.exclude(pk__in=entries.values()).delete()
+    WorkshopWaitlistEntry.objects.filter(pk__in=entries.values()).update(customer=survivor)
+
+    return set(registrations) | set(entries)
+
+
+@transaction.atomic
+def merge_customers(survivor, duplicates):
+    """Fold ``duplicates`` into ``survivor`` and delete them.
+
+    Service requests, workshop registrations, waitlist entries and
+    testimonials are re-pointed with one UPDATE per table. Where both hold a
+    registration for the same workshop the seat-holding one is kept (the
+    survivor's on a tie), and seat counts are recomputed afterwards. The
+    duplicates' addresses are recorded in the survivor's notes.
+
+    Raises ``ValueError`` if the customers are linked to different users.
+    """
+    duplicates = [c for c in duplicates if c.pk != survivor.pk]
+    duplicate_ids = [c.pk for c in duplicates]
+    if not duplicate_ids:
+        return survivor
+    user_ids = {c.user_id for c in [survivor] + duplicates if c.user_id}
+    if len(user_ids) > 1:
+        raise ValueError(f'Customers {[survivor.pk] + duplicate_ids} are linked to different users')
+
+    ServiceRequest.objects.filter(customer_id__in=duplicate_ids).update(customer=survivor)
+    ClientTestimonial.objects.filter(customer_id__in=duplicate_ids).update(customer=survivor)
+    workshop_ids = _merge_workshop_rows(survivor, duplicate_ids)
+
+    update_fields = []
+    for field in ('phone', 'organization', 'full_name'):
+        if not getattr(survivor, field):
+            value = next((getattr(c, field) for c in duplicates if getattr(c, field)), '')
+            if value:
+                setattr(survivor, field, value)
+                update_fields.append(field)
+    notes = [survivor.notes] + [c.notes for c in duplicates]
+    notes += [
+        f'Merged from customer #{c.pk} ({c.email})' for c in duplicates
+        if c.email and normalize_email_key(c.email) != survivor.email_key
+    ]
+    notes = '\n\n'.join(filter(None, notes))
+    if notes != survivor.notes:
+        survivor.notes = notes
+        update_fields.append('notes')
+    user_id = next((c.user_id for c in duplicates if c.user_id), None)
+    contacts = [c.last_contact for c in [survivor] + list(duplicates) if c.last_contact]
+    if contacts and max(contacts) != survivor.last_contact:
+        survivor.last_contact = max(contacts)
+        update_fields.append('last_contact')
+
+    Customer.objects.filter(pk__in=duplicate_ids).delete()
+
+    # The one-to-one user link can only move once the duplicate row is gone
+    if user_id and survivor.user_id is None:
+        survivor.user_id = user_id
+        update_fields.append('user')
+    if update_fields:
+        survivor.save(update_fields=update_fields)
+    # Dropped registrations may have held seats
+    sync_seats(workshop_ids)
+    return survivor
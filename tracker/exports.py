@@ -0,0 +1,356 @@
+"""Streaming CSV/XLSX exports of service requests, clients and workshop
+registrations.
+
+Rows are read with ``values_list`` and ``QuerySet.iterator(chunk_size=...)``,
+so no model instances are built and only one chunk of rows is held at a time.
+Each writer drains its output after every chunk and ``StreamingHttpResponse``
+sends it on, so memory stays flat however many rows are exported. (On MySQL
+the driver still buffers the raw result tuples, since Django has no
+server-side cursors there.)
+
+An XLSX file is a zip of XML parts, and it is written here directly. The
+worksheet goes into a deflated zip entry with a trailing data descriptor,
+which ``zipfile`` supports on unseekable streams.
+
+The ``filter_*`` functions are shared with the admin list views, so an export
+holds the rows the page shows for the same query string.
+"""
+import csv
+import re
+import zipfile
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Customer, ServiceRequest, WorkshopRegistration
+
+# Query string flags meaning "yes" for boolean filters
+_TRUE = ('1', 'true', 'yes')
+
+
+# ============================================================================
+# FILTERS (shared with the admin list views)
+# ============================================================================
+
+def filter_service_requests(queryset, params):
+    """``q`` (title/customer) and ``status``"""
+    q = params.get('q', '').strip()
+    if q:
+        queryset = queryset.filter(
+            Q(title__icontains=q) | Q(customer__full_name__icontains=q) | Q(customer__email__icontains=q)
+        )
+    status = params.get('status')
+    if status in dict(ServiceRequest.STATUS_CHOICES):
+        queryset = queryset.filter(status=status)
+    return queryset
+
+
+def filter_customers(queryset, params):
+    """``q`` (name/email/phone/organization), ``customer_type`` and ``active``"""
+    q = params.get('q', '').strip()
+    if q:
+        queryset = queryset.filter(
+            Q(full_name__icontains=q) | Q(email__icontains=q)
+            | Q(phone__icontains=q) | Q(organization__icontains=q)
+        )
+    customer_type = params.get('customer_type')
+    if customer_type in dict(Customer.CUSTOMER_TYPE_CHOICES):
+        queryset = queryset.filter(customer_type=customer_type)
+    active = params.get('active')
+    if active:
+        queryset = queryset.filter(is_active=active.lower() in _TRUE)
+    return queryset
+
+
+def filter_registrations(queryset, params):
+    """``q`` (customer/workshop), ``status`` and ``workshop`` (id)"""
+    q = params.get('q', '').strip()
+    if q:
+        queryset = queryset.filter(
+            Q(customer__full_name__icontains=q) | Q(customer__email__icontains=q) | Q(workshop__title__icontains=q)
+        )
+    status = params.get('status')
+    if status in dict(WorkshopRegistration.STATUS_CHOICES):
+        queryset = queryset.filter(status=status)
+    workshop = params.get('workshop', '')
+    if workshop.isdigit():
+        queryset = queryset.filter(workshop_id=int(workshop))
+    return queryset
+
+
+# ============================================================================
+# DATASETS
+# ============================================================================
+
+# ``choices`` maps stored values to their labels
+Column = namedtuple('Column', 'header field choices', defaults=(None,))
+
+Dataset = namedtuple('Dataset', 'title queryset filter columns')
+
+DATASETS = {
+    'requests': Dataset(
+        'Service requests',
+        lambda: ServiceRequest.objects.order_by('-created_at'),
+        filter_service_requests,
+        (
+            Column('ID', 'id'),
+            Column('Title', 'title'),
+            Column('Customer', 'customer__full_name'),
+            Column('Customer email', 'customer__email'),
+            Column('Service', 'service__name'),
+            Column('Status', 'status', dict(ServiceRequest.STATUS_CHOICES)),
+            Column('Budget', 'budget'),
+            Column('Deadline', 'deadline'),
+            Column('Created', 'created_at'),
+            Column('Completed', 'completed_at'),
+            Column('Assigned to', 'assigned_to__username'),
+        ),
+    ),
+    'clients': Dataset(
+        'Clients',
+        lambda: Customer.objects.order_by('-registration_date'),
+        filter_customers,
+        (
+            Column('ID', 'id'),
+            Column('Name', 'full_name'),
+            Column('Email', 'email'),
+            Column('Phone', 'phone'),
+            Column('Organization', 'organization'),
+            Column('Type', 'customer_type', dict(Customer.CUSTOMER_TYPE_CHOICES)),
+            Column('Active', 'is_active'),
+            Column('Joined', 'registration_date'),
+            Column('Last contact', 'last_contact'),
+        ),
+    ),
+    'registrations': Dataset(
+        'Workshop registrations',
+        lambda: WorkshopRegistration.objects.order_by('-registered_at'),
+        filter_registrations,
+        (
+            Column('ID', 'id'),
+            Column('Workshop', 'workshop__title'),
+            Column('Workshop date', 'workshop__date'),
+            Column('Customer', 'customer__full_name'),
+            Column('Customer email', 'customer__email'),
+            Column('Status', 'status', dict(WorkshopRegistration.STATUS_CHOICES)),
+            Column('Registered', 'registered_at'),
+            Column('Attended', 'attended_at'),
+            Column('Special requirements', 'special_requirements'),
+        ),
+    ),
+}
+
+FORMATS = ('csv', 'xlsx')
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def export_rows(dataset, params, queryset=None):
+    """Rows of ``dataset`` (or of ``queryset``, one of its models) matching
+    ``params``, with choice labels and local times
+    """
+    spec = DATASETS[dataset]
+    if queryset is None:
+        queryset = spec.queryset()
+    queryset = spec.filter(queryset, params).values_list(*(column.field for column in spec.columns))
+    labels = [(index, column.choices) for index, column in enumerate(spec.columns) if column.choices]
+    for row in queryset.iterator(chunk_size=_chunk_size()):
+        row = [timezone.localtime(value).replace(tzinfo=None) if isinstance(value, datetime) and timezone.is_aware(value)
+               else value for value in row]
+        for index, choices in labels:
+            row[index] = choices.get(row[index], row[index])
+        yield row
+
+
+class StreamBuffer:
+    """Write-only file object whose contents are taken with ``drain()``; lets
+    ``csv`` and ``zipfile`` write into a streamed response
+    """
+
+    def __init__(self, empty):
+        self._empty = empty
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = self._empty.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+# ============================================================================
+# CSV
+# ============================================================================
+
+# Values that spreadsheets would evaluate as a formula; phone numbers and
+# signed numbers are left alone
+_FORMULA_RE = re.compile(r'^(?:[=@\t\r]|[+-](?![\d\s().-]*$))')
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, str) and _FORMULA_RE.match(value):
+        return "'" + value
+    return value
+
+
+def stream_csv(dataset, params, queryset=None):
+    buffer = StreamBuffer('')
+    writer = csv.writer(buffer)
+    # Byte order mark so Excel reads the file as UTF-8
+    buffer.write('\ufeff')
+    writer.writerow([column.header for column in DATASETS[dataset].columns])
+    for count, row in enumerate(export_rows(dataset, params, queryset), 1):
+        writer.writerow([_csv_value(value) for value in row])
+        if count % _chunk_size() == 0:
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+# ============================================================================
+# XLSX
+# ============================================================================
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Cell styles: 0 default, 1 date/time, 2 bold (header row)
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm"/></numFmts>'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+# Characters XML 1.0 does not allow
+_XML_ILLEGAL_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+
+def _xlsx_cell(value, style=0):
+    style = f' s="{style}"' if style else ''
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"{style}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c{style}><v>{value}</v></c>'
+    if isinstance(value, (datetime, date)):
+        if not isinstance(value, datetime):
+            value = datetime.combine(value, datetime.min.time())
+        serial = (value - _EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c s="1"><v>{serial:.10g}</v></c>'
+    text = escape(_XML_ILLEGAL_RE.sub('', str(value)))
+    return f'<c t="inlineStr"{style}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values, style=0):
+    return '<row>' + ''.join(_xlsx_cell(value, style) for value in values) + '</row>'
+
+
+def stream_xlsx(dataset, params, queryset=None):
+    spec = DATASETS[dataset]
+    buffer = StreamBuffer(b'')
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        workbook.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name={quoteattr(spec.title[:31])} sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((_SHEET_START + _xlsx_row([column.header for column in spec.columns], style=2)).encode())
+            for count, row in enumerate(export_rows(dataset, params, queryset), 1):
+                sheet.write(_xlsx_row(row).encode())
+                if count % _chunk_size() == 0:
+                    yield buffer.drain()
+            sheet.write(_SHEET_END.encode())
+    yield buffer.drain()
+
+
+_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def export_response(dataset, fmt, params, queryset=None):
+    """``StreamingHttpResponse`` with ``dataset`` as a CSV or XLSX attachment"""
+    stream = stream_csv if fmt == 'csv' else stream_xlsx
+    response = StreamingHttpResponse(stream(dataset, params, queryset), content_type=_CONTENT_TYPES[fmt])
+    filename = f'{dataset}-{timezone.localdate():%Y-%m-%d}.{fmt}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,374 @@
+"""Static and media file serving in front of Django.
+
+``FileServerWSGI`` and ``FileServerASGI`` wrap the project's application (see
+``pos_tracker/wsgi.py`` and ``asgi.py``). Requests under ``STATIC_URL`` or
+``MEDIA_URL`` that name a file in ``STATIC_ROOT``/``MEDIA_ROOT`` are answered
+directly, without going through the middleware stack. Everything else,
+including files that don't exist there, is passed on to Django.
+
+- ``.br``/``.gz`` siblings written by ``collectstatic`` (see
+  ``tracker.storage``) are served according to ``Accept-Encoding``.
+- Whole files are handed to the server's ``wsgi.file_wrapper`` or the ASGI
+  ``http.response.zerocopysend`` extension, so gunicorn/uWSGI can use
+  ``sendfile(2)`` instead of copying through Python.
+- Single byte ranges (``Range: bytes=...``) get ``206 Partial Content``, which
+  the browser's PDF viewer uses to load embedded documents page by page.
+- ETag/Last-Modified revalidation answers ``304 Not Modified``.
+- Content-hashed names (``app.3f2a91c0b7d4.css``) get a one-year
+  ``immutable`` cache lifetime; other files ``FILE_SERVER_MAX_AGE``.
+"""
+import asyncio
+import mimetypes
+import os
+import re
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+
+from django.conf import settings
+
+BLOCK_SIZE = 64 * 1024
+
+# Names written by ManifestStaticFilesStorage: name.<12 hex digits>.ext
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[A-Za-z0-9]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# (suffix, Content-Encoding) in order of preference
+ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+for _type, _ext in (
+    ('font/woff2', '.woff2'), ('font/woff', '.woff'), ('image/webp', '.webp'),
+    ('image/svg+xml', '.svg'), ('application/manifest+json', '.webmanifest'), ('text/javascript', '.mjs'),
+):
+    mimetypes.add_type(_type, _ext)
+
+
+def accepted_encodings(header):
+    """Encodings the client accepts (q > 0)"""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def parse_range(header, size):
+    """``(start, end)`` inclusive for a single-range header.
+
+    Returns None when the header should be ignored (absent, malformed or
+    several ranges, which are answered with the whole file) and ``'invalid'``
+    when the range can't be satisfied.
+    """
+    match = _RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return 'invalid'
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return 'invalid'
+    return start, end
+
+
+class ServedFile:
+    """What to send: status, headers and an optional ``(path, offset, count)`` body"""
+
+    def __init__(self, status, headers, path=None, offset=0, count=0):
+        self.status = status
+        self.headers = headers
+        self.path = path
+        self.offset = offset
+        self.count = count
+
+    @property
+    def status_line(self):
+        return {
+            200: '200 OK', 206: '206 Partial Content', 304: '304 Not Modified',
+            405: '405 Method Not Allowed', 416: '416 Range Not Satisfiable',
+        }[self.status]
+
+
+class _Entry:
+    """A servable file with its precompressed siblings"""
+
+    __slots__ = ('path', 'size', 'mtime', 'content_type', 'cache_control', 'variants')
+
+    def __init__(self, path, stat, cache_control):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        content_type, _ = mimetypes.guess_type(path)
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.variants = {}
+        for suffix, encoding in ENCODINGS:
+            try:
+                variant = os.stat(path + suffix)
+            except OSError:
+                continue
+            self.variants[encoding] = (path + suffix, variant.st_size, variant.st_mtime)
+
+    def etag(self, encoding=None):
+        size, mtime = (self.size, self.mtime) if encoding is None else self.variants[encoding][1:]
+        suffix = f'-{encoding}' if encoding else ''
+        return f'"{int(mtime):x}-{size:x}{suffix}"'
+
+
+class FileServer:
+    """Maps URL paths to files under ``STATIC_ROOT``/``MEDIA_ROOT``"""
+
+    def __init__(self):
+        self.mounts = []
+        max_age = getattr(settings, 'FILE_SERVER_MAX_AGE', 3600)
+        # Static files only change on deploy, so their lookups are cached
+        for url, root, cached in (
+            (settings.STATIC_URL, settings.STATIC_ROOT, True),
+            (settings.MEDIA_URL, settings.MEDIA_ROOT, False),
+        ):
+            if url and root and url.startswith('/'):
+                self.mounts.append((url, os.path.realpath(root), cached, max_age))
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, url_path):
+        for prefix, root, cached, max_age in self.mounts:
+            if not url_path.startswith(prefix):
+                continue
+            if cached and url_path in self._entries:
+                return self._entries[url_path]
+
+            relative = url_path[len(prefix):]
+            path = os.path.realpath(os.path.join(root, relative))
+            if not path.startswith(root + os.sep):
+                return None
+            try:
+                stat = os.stat(path)
+            except (OSError, ValueError):
+                entry = None
+            else:
+                if not os.path.isfile(path):
+                    entry = None
+                else:
+                    immutable = cached and HASHED_NAME_RE.search(relative)
+                    cache_control = IMMUTABLE_CACHE_CONTROL if immutable else f'public, max-age={max_age}'
+                    entry = _Entry(path, stat, cache_control)
+            if cached and entry is not None:
+                # Misses aren't cached, so probing random URLs can't grow the dict
+                with self._lock:
+                    self._entries[url_path] = entry
+            return entry
+        return None
+
+    def respond(self, method, url_path, headers):
+        """A ``ServedFile`` for the request, or None to let Django handle it.
+
+        ``headers`` maps lower-case header names to values.
+        """
+        entry = self._lookup(url_path)
+        if entry is None:
+            return None
+        if method not in ('GET', 'HEAD'):
+            return ServedFile(405, [('Allow', 'GET, HEAD'), ('Content-Length', '0')])
+
+        range_header = headers.get('range')
+        encoding = None
+        if entry.variants and not range_header:
+            accepted = accepted_encodings(headers.get('accept-encoding', ''))
+            encoding = next((name for name in entry.variants if name in accepted), None)
+
+        path, size = (entry.path, entry.size) if encoding is None else entry.variants[encoding][:2]
+        etag = entry.etag(encoding)
+        last_modified = formatdate(entry.mtime, usegmt=True)
+        response_headers = [
+            ('Content-Type', entry.content_type),
+            ('Cache-Control', entry.cache_control),
+            ('ETag', etag),
+            ('Last-Modified', last_modified),
+            ('Accept-Ranges', 'bytes'),
+            ('X-Content-Type-Options', 'nosniff'),
+        ]
+        if entry.variants:
+            response_headers.append(('Vary', 'Accept-Encoding'))
+        if encoding:
+            response_headers.append(('Content-Encoding', encoding))
+        if getattr(settings, 'X_FRAME_OPTIONS', None):
+            response_headers.append(('X-Frame-Options', settings.X_FRAME_OPTIONS))
+
+        if self._not_modified(headers, etag, entry.mtime):
+            return ServedFile(304, [h for h in response_headers if h[0] != 'Content-Type'])
+
+        byte_range = None
+        if range_header and self._if_range_matches(headers.get('if-range'), etag, entry.mtime):
+            byte_range = parse_range(range_header, size)
+        if byte_range == 'invalid':
+            return ServedFile(416, response_headers + [
+                ('Content-Range', f'bytes */{size}'), ('Content-Length', '0'),
+            ])
+        if byte_range is not None:
+            start, end = byte_range
+            count = end - start + 1
+            response_headers += [('Content-Range', f'bytes {start}-{end}/{size}'), ('Content-Length', str(count))]
+            return ServedFile(206, response_headers, path if method == 'GET' else None, start, count)
+
+        response_headers.append(('Content-Length', str(size)))
+        return ServedFile(200, response_headers, path if method == 'GET' else None, 0, size)
+
+    @staticmethod
+    def _not_modified(headers, etag, mtime):
+        if_none_match = headers.get('if-none-match')
+        if if_none_match:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags
+        if_modified_since = headers.get('if-modified-since')
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _if_range_matches(if_range, etag, mtime):
+        if not if_range:
+            return True
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            return if_range == etag
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_range).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+
+class FileSlice:
+    """Iterates over ``count`` bytes of ``f`` from ``offset``; closes ``f`` when done"""
+
+    def __init__(self, f, offset, count):
+        self.f = f
+        self.remaining = count
+        f.seek(offset)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.remaining <= 0:
+            self.close()
+            raise StopIteration
+        chunk = self.f.read(min(BLOCK_SIZE, self.remaining))
+        if not chunk:
+            self.close()
+            raise StopIteration
+        self.remaining -= len(chunk)
+        return chunk
+
+    def close(self):
+        self.f.close()
+
+
+def _enabled():
+    return getattr(settings, 'SERVE_FILES', False)
+
+
+# ============================================================================
+# WSGI
+# ============================================================================
+
+class FileServerWSGI:
+    def __init__(self, application):
+        self.application = application
+        self.server = FileServer() if _enabled() else None
+
+    def __call__(self, environ, start_response):
+        if self.server is None:
+            return self.application(environ, start_response)
+        headers = {
+            key[5:].replace('_', '-').lower(): value
+            for key, value in environ.items() if key.startswith('HTTP_')
+        }
+        response = self.server.respond(environ['REQUEST_METHOD'], environ.get('PATH_INFO', ''), headers)
+        if response is None:
+            return self.application(environ, start_response)
+
+        start_response(response.status_line, response.headers)
+        if response.path is None:
+            return []
+        f = open(response.path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None and response.offset == 0 and response.count == os.fstat(f.fileno()).st_size:
+            # gunicorn and uWSGI turn this into sendfile(2)
+            return file_wrapper(f, BLOCK_SIZE)
+        return FileSlice(f, response.offset, response.count)
+
+
+# ============================================================================
+# ASGI
+# ============================================================================
+
+class FileServerASGI:
+    def __init__(self, application):
+        self.application = application
+        self.server = FileServer() if _enabled() else None
+
+    async def __call__(self, scope, receive, send):
+        if self.server is None or scope['type'] != 'http':
+            return await self.application(scope, receive, send)
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        response = self.server.respond(scope['method'], scope['path'], headers)
+        if response is None:
+            return await self.application(scope, receive, send)
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers],
+        })
+        if response.path is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        f = open(response.path, 'rb')
+        if 'http.response.zerocopysend' in scope.get('extensions', {}):
+            try:
+                await send({
+                    'type': 'http.response.zerocopysend',
+                    'file': f,
+                    'offset': response.offset,
+                    'count': response.count,
+                })
+            finally:
+                f.close()
+            return
+
+        loop = asyncio.get_running_loop()
+        chunks = FileSlice(f, response.offset, response.count)
+        try:
+            while True:
+                # File reads happen off the event loop
+                chunk = await loop.run_in_executor(None, next, chunks, None)
+                if chunk is None:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            chunks.close()
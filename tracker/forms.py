@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm, PasswordChangeForm, PasswordResetForm
 from django.core.exceptions import ValidationError
 from django.contrib.auth import password_validation
+from .backends import users_by_email
 from .models import Customer, UserProfile, ServiceRequest, ClientTestimonial, Workshop, WorkshopRegistration, ResearchService
 
 
@@ -48,7 +49,7 @@ class CustomUserCreationForm(UserCreationForm):
 
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        if users_by_email(email).exists():
             raise ValidationError('This email is already registered.')
         return email
 
@@ -70,6 +71,28 @@ class CustomUserCreationForm(UserCreationForm):
         return user
 
 
+class UniqueUserEmailMixin:
+    """Case-insensitive email uniqueness, as enforced by the ``auth_user``
+    index, reported as a form error rather than a failed save
+    """
+
+    def clean_email(self):
+        email = self.cleaned_data.get('email')
+        if email and users_by_email(email).exclude(pk=self.instance.pk).exists():
+            raise ValidationError('A user with this email address already exists.')
+        return email
+
+
+class AdminUserCreationForm(UniqueUserEmailMixin, UserCreationForm):
+    """Admin "add user" form, with the email address"""
+    class Meta(UserCreationForm.Meta):
+        fields = ('username', 'email')
+
+
+class AdminUserChangeForm(UniqueUserEmailMixin, UserChangeForm):
+    """Admin user change form"""
+
+
 class CustomUserLoginForm(forms.Form):
     """Custom user login form - username or email"""
     username = forms.CharField(
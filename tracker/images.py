@@ -0,0 +1,242 @@
+"""Resized WebP/JPEG derivatives of uploaded images.
+
+Uploads (service images, leadership photos, avatars, video thumbnails) are
+stored at whatever size the admin picked. After an upload is committed its
+name is spooled, and the worker (``runapscheduler`` or
+``manage.py generate_image_derivatives``) writes WebP and JPEG copies at each
+of ``IMAGE_DERIVATIVE_WIDTHS`` that is smaller than the original:
+
+    derivatives/<upload path>/<width>w.webp
+    derivatives/<upload path>/<width>w.jpg
+    derivatives/<upload path>/manifest.json
+
+Templates ask for ``srcset`` strings through the ``responsive_image`` tag and
+the ``srcset``/``image_url`` filters in ``custom_filters``. They fall back to
+the original file until the derivatives exist.
+"""
+import json
+import logging
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .spool import SQLiteSpool
+
+logger = logging.getLogger(__name__)
+
+# (model name, image field) pairs that get derivatives
+IMAGE_FIELDS = (
+    ('ServiceImage', 'image'),
+    ('Leadership', 'photo'),
+    ('UserProfile', 'avatar'),
+    ('TutorialVideo', 'thumbnail'),
+)
+
+DEFAULT_WIDTHS = (320, 640, 960, 1280)
+
+FORMATS = {
+    'webp': {'ext': 'webp', 'format': 'WEBP', 'options': {'quality': 80, 'method': 6}},
+    'jpeg': {'ext': 'jpg', 'format': 'JPEG', 'options': {'quality': 82, 'optimize': True, 'progressive': True}},
+}
+
+DERIVATIVE_ROOT = 'derivatives'
+
+spool = SQLiteSpool(
+    getattr(settings, 'IMAGE_SPOOL_PATH', settings.BASE_DIR / 'image_spool.sqlite3'),
+    table='images',
+    max_attempts=3,
+    backoff=60,
+)
+
+
+def derivative_widths():
+    return tuple(sorted(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', DEFAULT_WIDTHS)))
+
+
+def derivative_dir(name):
+    return posixpath.join(DERIVATIVE_ROOT, name)
+
+
+def derivative_name(name, width, fmt):
+    return posixpath.join(derivative_dir(name), f'{width}w.{FORMATS[fmt]["ext"]}')
+
+
+# ============================================================================
+# MANIFESTS
+# ============================================================================
+
+# Upload names are unique, so a manifest never changes once it has been
+# written and stays cached until evicted. A miss is cached as None for
+# IMAGE_MANIFEST_MISS_TTL seconds, after which other processes notice the
+# manifest the worker has written in the meantime.
+_manifest_cache = OrderedDict()
+_manifest_lock = threading.Lock()
+MANIFEST_CACHE_SIZE = 2048
+
+
+def _miss_ttl():
+    return getattr(settings, 'IMAGE_MANIFEST_MISS_TTL', 30)
+
+
+def get_manifest(name):
+    """``{'width', 'height', 'widths'}`` for an upload, or None if not generated yet"""
+    if not name:
+        return None
+    with _manifest_lock:
+        if name in _manifest_cache:
+            manifest, expires = _manifest_cache[name]
+            if expires is None or time.monotonic() < expires:
+                _manifest_cache.move_to_end(name)
+                return manifest
+
+    path = posixpath.join(derivative_dir(name), 'manifest.json')
+    try:
+        with default_storage.open(path) as f:
+            manifest = json.loads(f.read())
+    except (OSError, ValueError):
+        manifest = None
+
+    expires = time.monotonic() + _miss_ttl() if manifest is None else None
+    with _manifest_lock:
+        _manifest_cache[name] = (manifest, expires)
+        _manifest_cache.move_to_end(name)
+        if len(_manifest_cache) > MANIFEST_CACHE_SIZE:
+            _manifest_cache.popitem(last=False)
+    return manifest
+
+
+def _forget_manifest(name):
+    with _manifest_lock:
+        _manifest_cache.pop(name, None)
+
+
+def srcset(name, fmt='jpeg'):
+    """``srcset`` value for the derivatives of an upload; '' until they exist"""
+    manifest = get_manifest(name)
+    if not manifest:
+        return ''
+    return ', '.join(
+        f'{default_storage.url(derivative_name(name, width, fmt))} {width}w'
+        for width in manifest['widths']
+    )
+
+
+def image_url(name, width, fmt='jpeg'):
+    """URL of the smallest derivative at least ``width`` wide, or the original"""
+    manifest = get_manifest(name)
+    if not manifest:
+        return default_storage.url(name) if name else ''
+    widths = manifest['widths']
+    chosen = next((w for w in widths if w >= width), widths[-1])
+    return default_storage.url(derivative_name(name, chosen, fmt))
+
+
+# ============================================================================
+# GENERATION
+# ============================================================================
+
+def _save(name, data):
+    # Overwrite in place; storage.save would otherwise add a random suffix
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(data))
+
+
+def generate_derivatives(name):
+    """Write all derivatives of one upload and its manifest; returns the manifest"""
+    from PIL import Image, ImageOps
+
+    with default_storage.open(name) as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    rgba = image.convert('RGBA') if has_alpha else image.convert('RGB')
+    if has_alpha:
+        # JPEG has no alpha channel; flatten onto white
+        rgb = Image.new('RGB', rgba.size, (255, 255, 255))
+        rgb.paste(rgba, mask=rgba.getchannel('A'))
+    else:
+        rgb = rgba
+
+    original_width, original_height = image.size
+    widths = [w for w in derivative_widths() if w < original_width]
+    # Always include a full-width re-encode, capped at the largest width
+    widths.append(min(original_width, derivative_widths()[-1]))
+    widths = sorted(set(widths))
+
+    for width in widths:
+        height = max(1, round(original_height * width / original_width))
+        for fmt, spec in FORMATS.items():
+            source = rgba if fmt == 'webp' else rgb
+            resized = source if width == original_width else source.resize((width, height), Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, spec['format'], **spec['options'])
+            _save(derivative_name(name, width, fmt), buffer.getvalue())
+
+    manifest = {'width': original_width, 'height': original_height, 'widths': widths}
+    _save(posixpath.join(derivative_dir(name), 'manifest.json'), json.dumps(manifest).encode('utf-8'))
+    _forget_manifest(name)
+    return manifest
+
+
+def delete_derivatives(name):
+    directory = derivative_dir(name)
+    try:
+        _, files = default_storage.listdir(directory)
+    except (OSError, NotImplementedError):
+        return
+    for filename in files:
+        default_storage.delete(posixpath.join(directory, filename))
+    _forget_manifest(name)
+
+
+# ============================================================================
+# QUEUE
+# ============================================================================
+
+def schedule_derivatives(name):
+    """Queue an upload for processing once the current transaction commits"""
+    if not name:
+        return
+
+    def enqueue():
+        spool.enqueue(name, name.encode('utf-8'))
+        if not getattr(settings, 'IMAGE_DERIVATIVES_BACKGROUND', True):
+            process_queue(keys=[name])
+
+    transaction.on_commit(enqueue)
+
+
+def process_queue(batch_size=20, keys=None):
+    """Generate derivatives for queued uploads; returns the number processed"""
+    rows = spool.fetch(batch_size, keys=keys)
+    done = 0
+    for key, _ in rows:
+        try:
+            if default_storage.exists(key):
+                generate_derivatives(key)
+            spool.ack([key])
+            done += 1
+        except Exception as e:
+            logger.exception('Generating derivatives for %s failed', key)
+            spool.fail(key, e)
+    return done
+
+
+def iter_uploaded_names():
+    """Names of every upload in ``IMAGE_FIELDS``"""
+    from django.apps import apps
+
+    for model_name, field_name in IMAGE_FIELDS:
+        model = apps.get_model('tracker', model_name)
+        names = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+        yield from names.values_list(field_name, flat=True).iterator()
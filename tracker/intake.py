@@ -0,0 +1,187 @@
+"""Write-behind intake queue for contact and service-request submissions.
+
+Submissions are appended to a local SQLite spool (separate from the main
+database, in WAL mode) and acknowledged immediately, so a campaign burst never
+queues up on the main database's write lock. ``drain_intake`` (or the scheduler
+job) turns spooled entries into ``ServiceRequest`` rows with ``bulk_create``.
+
+Every entry carries an idempotency key, stored as ``ServiceRequest.intake_key``
+(unique), so a re-submitted form, a double click or a retried batch can never
+create the same request twice.
+"""
+import hashlib
+import json
+import logging
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .attachments import link_attachments
+from .customers import customer_for_user, upsert_customer
+from .models import ResearchService, ServiceRequest
+from .spool import SQLiteSpool
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+# Identical content within this window is treated as the same submission
+DEDUP_WINDOW_SECONDS = 600
+
+
+def make_intake_key(payload, client_key=''):
+    """Idempotency key for a submission.
+
+    A client-supplied key (form field or ``Idempotency-Key`` header) wins;
+    otherwise identical content within ``DEDUP_WINDOW_SECONDS`` maps to the
+    same key, which absorbs double clicks and browser re-posts.
+    """
+    if client_key:
+        source = f'client:{client_key}'
+    else:
+        window = int(time.time() // DEDUP_WINDOW_SECONDS)
+        source = f'content:{window}:' + json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+spool = SQLiteSpool(
+    getattr(settings, 'INTAKE_SPOOL_PATH', settings.BASE_DIR / 'intake_spool.sqlite3'),
+    table='intake',
+    max_attempts=MAX_ATTEMPTS,
+)
+
+
+def validate_request_payload(payload):
+    """Check a submission up front, since the worker can't report back to the user.
+
+    Returns an error message, or None when the payload can be spooled. A
+    signed-in user's email comes from their account rather than the form, so
+    it isn't checked (and may be blank); their customer is found by user.
+    """
+    if not payload.get('user_id'):
+        try:
+            validate_email(payload.get('email') or '')
+        except ValidationError:
+            return 'Please enter a valid email address.'
+    if not payload.get('title') or not payload.get('description'):
+        return 'Please provide a title and description.'
+    if len(payload['title']) > 255 or len(payload.get('full_name') or '') > 255:
+        return 'Title and name must be at most 255 characters.'
+    if len(payload.get('phone') or '') > 20:
+        return 'Phone number must be at most 20 characters.'
+    if payload.get('deadline') and parse_datetime(payload['deadline']) is None:
+        return 'Please enter a valid deadline.'
+    if payload.get('budget'):
+        try:
+            Decimal(payload['budget'])
+        except InvalidOperation:
+            return 'Please enter a valid budget.'
+    return None
+
+
+def submit_request(payload, client_key=''):
+    """Spool a service request submission and return its idempotency key.
+
+    ``payload`` holds ``email``, ``full_name``, ``phone``, ``service_id``
+    (int or None), ``title``, ``description``, ``deadline``, ``budget`` and
+    ``user_id``.
+    With ``INTAKE_WRITE_BEHIND`` off the entry is drained straight away, so
+    development setups without a worker behave as before.
+    """
+    key = make_intake_key(payload, client_key)
+    spool.enqueue(key, json.dumps(payload, default=str))
+    if not getattr(settings, 'INTAKE_WRITE_BEHIND', True):
+        drain(keys=[key])
+    return key
+
+
+def _customer_key(payload):
+    if payload.get('user_id'):
+        return ('user', payload['user_id'])
+    return ('email', payload['email'].strip().lower())
+
+
+def _customer_for(payload):
+    user = _user_or_none(payload.get('user_id'))
+    if user is not None:
+        # A signed-in user's request goes to their own customer, never to
+        # whichever customer happens to share (or lack) their address
+        return customer_for_user(
+            user,
+            email=payload.get('email') or '',
+            full_name=payload.get('full_name', ''),
+            phone=payload.get('phone', ''),
+        )
+    return upsert_customer(
+        email=payload.get('email') or '',
+        full_name=payload.get('full_name', ''),
+        phone=payload.get('phone', ''),
+    )
+
+
+def _build_requests(entries):
+    customers = {}
+    for _, payload in entries:
+        customer_key = _customer_key(payload)
+        if customer_key not in customers:
+            customers[customer_key] = _customer_for(payload)
+
+    services = ResearchService.objects.in_bulk(
+        {payload['service_id'] for _, payload in entries if payload.get('service_id')}
+    )
+
+    return [
+        ServiceRequest(
+            intake_key=key,
+            customer=customers[_customer_key(payload)],
+            service=services.get(payload.get('service_id')),
+            title=payload['title'],
+            description=payload['description'],
+            deadline=payload.get('deadline') or None,
+            budget=payload.get('budget') or None,
+            status='pending',
+        )
+        for key, payload in entries
+    ]
+
+
+def _user_or_none(user_id):
+    return User.objects.filter(pk=user_id).first() if user_id else None
+
+
+def _write(entries):
+    with transaction.atomic():
+        ServiceRequest.objects.bulk_create(_build_requests(entries), ignore_conflicts=True)
+        link_attachments([key for key, _ in entries])
+
+
+def drain(batch_size=200, keys=None):
+    """Move spooled submissions into the database; returns the number written"""
+    entries = [(key, json.loads(payload)) for key, payload in spool.fetch(batch_size, keys=keys)]
+    if not entries:
+        return 0
+
+    try:
+        _write(entries)
+        spool.ack([key for key, _ in entries])
+        return len(entries)
+    except Exception:
+        logger.exception('Intake batch of %d failed, retrying entries one by one', len(entries))
+
+    # Isolate the bad entries so one malformed submission can't block the queue
+    written = 0
+    for entry in entries:
+        try:
+            _write([entry])
+            spool.ack([entry[0]])
+            written += 1
+        except Exception as e:
+            logger.exception('Intake entry %s failed', entry[0])
+            spool.fail(entry[0], e)
+    return written
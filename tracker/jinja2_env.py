@@ -0,0 +1,88 @@
+"""Jinja2 environment for the high-traffic public pages.
+
+``home.html``, ``services.html`` and ``service_detail.html`` (plus
+``base.html`` and the components they include) have Jinja2 copies in
+``tracker/jinja2``. ``settings.JINJA2_HOT_PAGES`` makes their views render with
+the ``jinja2`` engine, which compiles each template to Python once and
+keeps the bytecode in ``JINJA2_BYTECODE_CACHE_DIR`` across restarts.
+
+The copies must be kept in step with the Django templates;
+``tracker/tests/test_jinja2_templates.py`` renders the pages with both engines
+and fails when they differ. The globals and filters below stand in for the
+Django tags and filters they use.
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.template import defaultfilters
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.timezone import template_localtime
+from jinja2 import ChainableUndefined, Environment, FileSystemBytecodeCache, pass_context, pass_environment
+from markupsafe import Markup
+
+from .templatetags import assets, custom_filters
+
+
+def url(viewname, *args, **kwargs):
+    """``{% url %}``"""
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def date(value, arg=None):
+    """``|date``, converting to the current time zone like Django templates do"""
+    return defaultfilters.date(template_localtime(value), arg)
+
+
+@pass_context
+def critical_css(context):
+    return assets.critical_css(context)
+
+
+@pass_context
+def stylesheet(context, href):
+    return assets.stylesheet(context, href)
+
+
+@pass_context
+def css_bundle(context, group, fallback_href):
+    return assets.css_bundle(context, group, fallback_href)
+
+
+@pass_environment
+def responsive_image(env, image, **kwargs):
+    """``{% responsive_image %}``, rendering the Jinja2 copy of its component"""
+    context = custom_filters.responsive_image(image, **kwargs)
+    return Markup(env.get_template('components/responsive_image.html').render(context))
+
+
+def environment(**options):
+    cache_dir = Path(getattr(settings, 'JINJA2_BYTECODE_CACHE_DIR', settings.BASE_DIR / 'build' / 'jinja2'))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    options.setdefault('bytecode_cache', FileSystemBytecodeCache(str(cache_dir)))
+    # Missing variables render as '' like in Django templates, including
+    # attribute lookups on them
+    options['undefined'] = ChainableUndefined
+    # Templates aren't stat()ed on every render; in development
+    # tracker.template_cache clears the cache when runserver sees a change
+    options['auto_reload'] = False
+
+    env = Environment(**options)
+    env.globals.update({
+        'url': url,
+        'static': static,
+        'critical_css': critical_css,
+        'stylesheet': stylesheet,
+        'css_bundle': css_bundle,
+        'responsive_image': responsive_image,
+    })
+    env.filters.update({
+        'get_item': custom_filters.get_item,
+        'image_url': custom_filters.image_url,
+        'srcset': custom_filters.srcset,
+        'date': date,
+        'escapejs': defaultfilters.escapejs_filter,
+        'truncatechars': defaultfilters.truncatechars,
+        'truncatewords': defaultfilters.truncatewords,
+    })
+    return env
@@ -0,0 +1,148 @@
+"""Outbound mail spool and pre-inlined email templates.
+
+``SpoolEmailBackend`` is the project's ``EMAIL_BACKEND``: ``send_mail`` and
+friends (including Django's password reset view) only append the message to a
+local spool and return. ``send_queued_mail`` drains the spool through the real
+backend (``MAIL_SPOOL_BACKEND``), reusing one SMTP connection per batch and
+retrying failed messages with exponential backoff. Each batch is claimed for
+``MAIL_SEND_LEASE`` seconds first, so concurrent senders never send the same
+message. With ``MAIL_BACKGROUND`` off (the default in DEBUG) messages are sent
+as soon as they are spooled.
+
+HTML email templates live in ``tracker/email_templates`` with plain ``<style>``
+blocks. ``build_email_templates`` runs them through premailer, from the
+management command (a deploy step) or the mail worker, and writes the
+CSS-inlined copies to ``EMAIL_TEMPLATE_BUILD_DIR``, which is searched first by
+the template loader. Until they are built the plain sources are used.
+"""
+import logging
+import pickle
+import re
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .spool import SQLiteSpool
+
+logger = logging.getLogger(__name__)
+
+EMAIL_TEMPLATE_SOURCE_DIR = Path(__file__).resolve().parent / 'email_templates'
+
+spool = SQLiteSpool(
+    getattr(settings, 'MAIL_SPOOL_PATH', settings.BASE_DIR / 'mail_spool.sqlite3'),
+    table='mail',
+    max_attempts=6,
+    backoff=60,
+)
+
+
+class SpoolEmailBackend(BaseEmailBackend):
+    """Email backend that queues messages for the mail worker"""
+
+    def send_messages(self, email_messages):
+        keys = []
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            message.connection = None
+            key = uuid.uuid4().hex
+            try:
+                spool.enqueue(key, pickle.dumps(message))
+                keys.append(key)
+            except Exception:
+                if not self.fail_silently:
+                    raise
+                logger.exception('Could not spool email to %s', message.recipients())
+        if keys and not getattr(settings, 'MAIL_BACKGROUND', True):
+            # Failures stay spooled for the worker to retry
+            send_queued_mail(batch_size=len(keys), keys=keys)
+        return len(keys)
+
+
+def send_queued_mail(batch_size=50, keys=None):
+    """Send one batch of spooled messages (or exactly ``keys``) over a single
+    connection.
+
+    Returns the number of messages sent.
+    """
+    rows = spool.claim(batch_size, getattr(settings, 'MAIL_SEND_LEASE', 900), keys=keys)
+    if not rows:
+        return 0
+
+    connection = get_connection(getattr(settings, 'MAIL_SPOOL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend'))
+    try:
+        connection.open()
+    except Exception as e:
+        logger.exception('Could not open mail connection')
+        for key, _ in rows:
+            spool.fail(key, e)
+        return 0
+
+    sent = 0
+    try:
+        for key, payload in rows:
+            try:
+                message = pickle.loads(payload)
+                # The backend keeps the open connection across calls
+                connection.send_messages([message])
+                spool.ack([key])
+                sent += 1
+            except Exception as e:
+                logger.exception('Sending spooled email %s failed', key)
+                spool.fail(key, e)
+    finally:
+        connection.close()
+    return sent
+
+
+# ============================================================================
+# TEMPLATE INLINING
+# ============================================================================
+
+# Template tags are swapped for inert placeholders while premailer runs, so the
+# HTML parser doesn't URL-encode them inside attributes like href.
+_TEMPLATE_TAG_RE = re.compile(r'{{.*?}}|{%.*?%}', re.DOTALL)
+
+
+def inline_css(html):
+    """Inline the <style> rules of a Django template's HTML into style attributes"""
+    from premailer import transform
+
+    tags = []
+
+    def stash(match):
+        tags.append(match.group(0))
+        return f'DJTPLTAG{len(tags) - 1}X'
+
+    protected = _TEMPLATE_TAG_RE.sub(stash, html)
+    inlined = transform(
+        protected,
+        disable_validation=True,
+        remove_classes=False,
+        keep_style_tags=False,
+        cssutils_logging_level=logging.CRITICAL,
+    )
+    return re.sub(r'DJTPLTAG(\d+)X', lambda m: tags[int(m.group(1))], inlined)
+
+
+def build_email_templates(force=False):
+    """Write CSS-inlined copies of the email templates; returns the files built"""
+    build_dir = Path(getattr(settings, 'EMAIL_TEMPLATE_BUILD_DIR', settings.BASE_DIR / 'build' / 'email_templates'))
+    built = []
+    for source in EMAIL_TEMPLATE_SOURCE_DIR.rglob('*'):
+        if not source.is_file():
+            continue
+        target = build_dir / source.relative_to(EMAIL_TEMPLATE_SOURCE_DIR)
+        if not force and target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+            continue
+
+        content = source.read_text(encoding='utf-8')
+        if source.suffix == '.html':
+            content = inline_css(content)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(content, encoding='utf-8')
+        built.append(target)
+    return built
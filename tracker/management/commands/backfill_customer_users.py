@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from tracker.models import Customer
+
+
+class Command(BaseCommand):
+    help = 'Link existing customers to user accounts by email (one-time backfill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report matches without saving')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        linked_user_ids = set(
+            Customer.objects.filter(user__isnull=False).values_list('user_id', flat=True)
+        )
+        users_by_email = {}
+        for user_id, email in User.objects.exclude(email='').values_list('id', 'email').iterator():
+            if user_id not in linked_user_ids:
+                users_by_email.setdefault(email.strip().lower(), user_id)
+
+        to_update = []
+        unlinked = Customer.objects.filter(user__isnull=True, email__isnull=False).only('id', 'email')
+        for customer in unlinked.iterator():
+            user_id = users_by_email.pop(customer.email.strip().lower(), None)
+            if user_id is not None:
+                customer.user_id = user_id
+                to_update.append(customer)
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(to_update)} customers would be linked to users')
+            return
+
+        Customer.objects.bulk_update(to_update, ['user'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Linked {len(to_update)} customers to users'))
@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from tracker.middleware import _compress_stream
+from tracker.storage import brotli
+
+GZIP_LEVELS = (1, 4, 6, 9)
+BROTLI_QUALITIES = (1, 3, 4, 5, 6, 8, 11)
+
+
+def _kb(size):
+    return f'{size / 1024:.1f} KB'
+
+
+class Command(BaseCommand):
+    help = 'Measure size and CPU time per compression level for rendered pages (to tune COMPRESS_* settings)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='URL paths to render, e.g. /tracker/services/')
+        parser.add_argument('--user', help='Username to log in as (for admin pages)')
+        parser.add_argument('--repeat', type=int, default=20, help='Compressions per level (default: 20)')
+
+    def handle(self, *args, **options):
+        hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host not in ('*', '')]
+        client = Client(HTTP_HOST=hosts[0] if hosts else 'localhost')
+        if options['user']:
+            try:
+                client.force_login(get_user_model().objects.get(username=options['user']))
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user named {options["user"]}')
+
+        levels = [('gzip', level) for level in GZIP_LEVELS]
+        if brotli is not None:
+            levels += [('br', quality) for quality in BROTLI_QUALITIES]
+
+        for path in options['paths']:
+            response = client.get(path)
+            if response.status_code != 200:
+                self.stdout.write(self.style.WARNING(f'{path}: HTTP {response.status_code}, skipped'))
+                continue
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            self.stdout.write(self.style.SUCCESS(f'✓ {path}: {_kb(len(body))} uncompressed'))
+            self.stdout.write(f'  {"Encoding":<10} {"Level":>5} {"Size":>10} {"Ratio":>7} {"ms/response":>12}')
+            for encoding, level in levels:
+                setting = 'COMPRESS_BROTLI_QUALITY' if encoding == 'br' else 'COMPRESS_GZIP_LEVEL'
+                with override_settings(**{setting: level}):
+                    started = time.perf_counter()
+                    for _ in range(options['repeat']):
+                        size = sum(len(chunk) for chunk in _compress_stream([body], encoding))
+                    elapsed = (time.perf_counter() - started) / options['repeat'] * 1000
+                self.stdout.write(
+                    f'  {encoding:<10} {level:>5} {_kb(size):>10} {size / len(body):>7.1%} {elapsed:>12.2f}'
+                )
+
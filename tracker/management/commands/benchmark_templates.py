@@ -0,0 +1,165 @@
+import sys
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory
+from django.utils import timezone
+from tracker import views_frontend
+from tracker.patches import django_compat
+from tracker.models import (
+    ClientTestimonial, ConsultancySubService, Customer, ResearchService, ServiceFAQ, TutorialVideo, Workshop,
+)
+
+CATEGORIES = ('concept_proposal', 'thesis', 'articles', 'data_analysis', 'research_design', 'training_capacity')
+CONSULTANCY_TYPES = ('business_tax', 'business_strategy', 'investment', 'proposal_support')
+LOREM = (
+    'We guide you from the first outline to the final submission, with regular check-ins, '
+    'transparent pricing and revisions until the work meets your institution\'s standards. '
+)
+
+
+def _create_catalog(services):
+    now = timezone.now()
+    for i in range(services):
+        service = ResearchService.objects.create(
+            name=f'Benchmark service {i}',
+            category=CATEGORIES[i % len(CATEGORIES)],
+            description=LOREM * 2,
+            detailed_description=f'<p>{LOREM * 4}</p>',
+            price_from=100 + i,
+            turnaround_time='7-14 days',
+            display_order=i,
+        )
+        for j in range(4):
+            ServiceFAQ.objects.create(service=service, question=f'Question {j}?', answer=LOREM, display_order=j)
+        for j in range(2):
+            TutorialVideo.objects.create(
+                service=service, title=f'Walkthrough {j}', video_url=f'https://www.youtube.com/watch?v=bench{i}x{j}',
+                duration='12:30', description=LOREM, display_order=j,
+            )
+    for i in range(8):
+        ConsultancySubService.objects.create(
+            name=f'Benchmark consultancy {i}', consultancy_type=CONSULTANCY_TYPES[i % len(CONSULTANCY_TYPES)],
+            description=LOREM, hourly_rate=50, features='Kick-off call\nWritten report\nFollow-up session',
+            display_order=i,
+        )
+    for i in range(6):
+        Workshop.objects.create(
+            title=f'Benchmark workshop {i}', description=LOREM, date=now + timedelta(days=i + 1),
+            max_participants=30, price=25,
+        )
+    for i in range(8):
+        customer = Customer.objects.create(email=f'bench{i}@example.com', full_name=f'Bench Client {i}')
+        ClientTestimonial.objects.create(
+            customer=customer, service=ResearchService.objects.first(), rating=4 + i % 2, quote=LOREM,
+            is_published=True,
+        )
+
+
+def _page_context(view, request, *args):
+    """``(template name, context)`` a view renders, with querysets evaluated"""
+    captured = {}
+
+    def capture(request, template_name, context=None, **kwargs):
+        captured.update(template_name=template_name, context=context)
+        return HttpResponse()
+
+    with mock.patch.object(views_frontend, 'render', capture):
+        view(request, *args)
+
+    context = captured['context']
+    for value in context.values():
+        for item in (value.values() if isinstance(value, dict) else [value]):
+            if isinstance(item, QuerySet):
+                len(item)  # fills the result cache, so rendering runs no queries
+    return captured['template_name'], context
+
+
+def _time(template, context, request, repeat):
+    template.render(dict(context), request)  # compile/warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        html = template.render(dict(context), request)
+    return (time.perf_counter() - started) / repeat * 1000, len(html)
+
+
+def _reset(backend):
+    if backend.name == 'jinja2':
+        backend.env.cache.clear()
+    else:
+        for loader in backend.engine.template_loaders:
+            loader.reset()
+
+
+def _cold(backend, template_name, context, request):
+    """First render after a restart: load, parse/compile, render"""
+    _reset(backend)
+    started = time.perf_counter()
+    backend.get_template(template_name).render(dict(context), request)
+    return (time.perf_counter() - started) * 1000
+
+
+class Command(BaseCommand):
+    help = 'Compare Django and Jinja2 render times of the hot public pages on a generated catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--services', type=int, default=30, help='Research services to generate (default: 30)')
+        parser.add_argument('--repeat', type=int, default=30, help='Renders per engine and page (default: 30)')
+
+    def handle(self, *args, **options):
+        # The catalog only exists inside this transaction
+        with transaction.atomic():
+            _create_catalog(options['services'])
+            self._run(options['repeat'])
+            transaction.set_rollback(True)
+
+    def _run(self, repeat):
+        request = RequestFactory().get('/', HTTP_HOST='localhost')
+        request.user = AnonymousUser()
+        request.session = {}
+        service = ResearchService.objects.filter(name__startswith='Benchmark').order_by('display_order').first()
+
+        pages = []
+        for name, view, view_args in (
+            ('home', views_frontend.home, ()),
+            ('services', views_frontend.services, ()),
+            ('service_detail', views_frontend.service_detail, (service.pk,)),
+        ):
+            pages.append((name, *_page_context(view, request, *view_args)))
+
+        django, jinja = engines['django'], engines['jinja2']
+        self.stdout.write(
+            f'{"Page":<16} {"Django 1st":>11} {"Django":>10} {"Jinja2 1st":>11} {"Jinja2":>10} {"Speedup":>8} {"HTML":>9}'
+        )
+        for name, template_name, context in pages:
+            django_cold = _cold(django, template_name, context, request)
+            jinja_cold = _cold(jinja, template_name, context, request)
+            django_ms, size = _time(django.get_template(template_name), context, request, repeat)
+            jinja_ms, _ = _time(jinja.get_template(template_name), context, request, repeat)
+            self.stdout.write(
+                f'{name:<16} {django_cold:>8.2f} ms {django_ms:>7.2f} ms {jinja_cold:>8.2f} ms {jinja_ms:>7.2f} ms '
+                f'{django_ms / jinja_ms:>7.1f}x {size / 1024:>6.1f} KB'
+            )
+
+        # Context.__copy__ runs for every inclusion tag and {% include %}
+        self.stdout.write(f'\n{"Page":<16} {"Stock copy":>11} {"Compat copy":>12}')
+        for name, template_name, context in pages:
+            template = django.get_template(template_name)
+            django_compat.restore()
+            stock_ms, _ = _time(template, context, request, repeat)
+            django_compat.apply()
+            patched_ms, _ = _time(template, context, request, repeat)
+            self.stdout.write(f'{name:<16} {stock_ms:>8.2f} ms {patched_ms:>9.2f} ms')
+        if sys.version_info < (3, 14):
+            django_compat.restore()
+
+        self.stdout.write(self.style.SUCCESS(
+            '✓ "1st" is the first render with an empty template cache (what precompile_templates saves)'
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from tracker.critical_css import build_critical_css, build_dir
+
+
+def _kb(size):
+    return f'{size / 1024:.1f} KB'
+
+
+class Command(BaseCommand):
+    help = 'Extract and store the above-the-fold CSS of the public landing pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--report-only', action='store_true', help='Print the savings without writing files')
+
+    def handle(self, *args, **options):
+        report = build_critical_css(write=not options['report_only'])
+
+        for row in report:
+            deferred_size = sum(size for _, (size, _) in row['deferred'])
+            deferred_gz = sum(gz for _, (_, gz) in row['deferred'])
+            critical, critical_gz = row['critical']
+            before = len(row['deferred']) + len(row['blocking'])
+            self.stdout.write(self.style.SUCCESS(f'✓ {row["page"]} ({row["url"]})'))
+            self.stdout.write(
+                f'  - Render-blocking stylesheets: {before} -> {len(row["blocking"])} '
+                f'({_kb(deferred_size)} / {_kb(deferred_gz)} gz now loaded asynchronously)'
+            )
+            self.stdout.write(f'  - Inlined critical CSS: {_kb(critical)} / {_kb(critical_gz)} gz')
+            for href, _ in row['blocking']:
+                self.stdout.write(self.style.WARNING(f'  - Still blocking (could not be read): {href}'))
+
+        if not report:
+            self.stdout.write(self.style.WARNING('No pages rendered; nothing built'))
+        elif not options['report_only']:
+            self.stdout.write(f'  - Critical CSS written to {build_dir()}')
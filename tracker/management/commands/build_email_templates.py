@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from tracker.mail import build_email_templates
+
+
+class Command(BaseCommand):
+    help = 'Build CSS-inlined copies of the email templates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild even if up to date')
+
+    def handle(self, *args, **options):
+        built = build_email_templates(force=options['force'])
+        for path in built:
+            self.stdout.write(f'  - {path}')
+        self.stdout.write(self.style.SUCCESS(f'✓ Built {len(built)} email templates'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from tracker.intake import MAX_ATTEMPTS, drain, spool
+
+
+class Command(BaseCommand):
+    help = 'Write spooled contact/service-request submissions to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--once', action='store_true', help='Drain what is queued and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            written = drain(batch_size=options['batch_size'])
+            total += written
+            if written:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+        stats = spool.stats()
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {total} submissions'))
+        if stats['dead']:
+            self.stdout.write(self.style.WARNING(f'  - {stats["dead"]} submissions failed {MAX_ATTEMPTS} times and need attention'))
@@ -0,0 +1,45 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from tracker.certificates import attendees, certificates_filename, merged_pdf, stream_zip
+from tracker.models import Workshop
+
+
+class Command(BaseCommand):
+    help = 'Render attendance certificates for the attendees of one or more workshops'
+
+    def add_arguments(self, parser):
+        parser.add_argument('workshop_ids', nargs='+', type=int, help='Workshop ids')
+        parser.add_argument('--zip', action='store_true', help='One PDF per attendee in a ZIP instead of a merged PDF')
+        parser.add_argument('--output', help='Output file (default: certificates-<workshop>.pdf/.zip)')
+        parser.add_argument('--workers', type=int, help='Worker processes (default: CERTIFICATE_WORKERS or CPU count)')
+
+    def handle(self, *args, **options):
+        workshops = list(Workshop.objects.filter(pk__in=options['workshop_ids']).select_related('facilitator'))
+        missing = set(options['workshop_ids']) - {workshop.pk for workshop in workshops}
+        if missing:
+            raise CommandError(f'No workshop with id {", ".join(map(str, sorted(missing)))}')
+
+        total = 0
+        for workshop in workshops:
+            count = len(attendees(workshop))
+            total += count
+            self.stdout.write(f'  - {workshop.title}: {count} attendees')
+        if not total:
+            raise CommandError('No attendees marked as attended')
+
+        extension = 'zip' if options['zip'] else 'pdf'
+        output = Path(options['output'] or certificates_filename(workshops, extension))
+        started = time.perf_counter()
+        if options['zip']:
+            with output.open('wb') as f:
+                for piece in stream_zip(workshops, options['workers']):
+                    f.write(piece)
+        else:
+            output.write_bytes(merged_pdf(workshops, options['workers']))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Wrote {total} certificates to {output} ({output.stat().st_size / 1024:.0f} KB) in {elapsed:.2f}s'
+        ))
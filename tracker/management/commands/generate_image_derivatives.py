@@ -0,0 +1,42 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from tracker.images import generate_derivatives, get_manifest, iter_uploaded_names, process_queue
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG variants of uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Backfill every existing upload, not just the queue')
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that already exist')
+
+    def handle(self, *args, **options):
+        if not options['all']:
+            total = 0
+            while True:
+                done = process_queue()
+                if not done:
+                    break
+                total += done
+            self.stdout.write(self.style.SUCCESS(f'✓ Processed {total} queued images'))
+            return
+
+        generated = skipped = failed = 0
+        for name in iter_uploaded_names():
+            if not options['force'] and get_manifest(name) is not None:
+                skipped += 1
+                continue
+            if not default_storage.exists(name):
+                self.stdout.write(self.style.WARNING(f'  - Missing file: {name}'))
+                failed += 1
+                continue
+            try:
+                manifest = generate_derivatives(name)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f'  - {name}: {e}'))
+                failed += 1
+                continue
+            generated += 1
+            self.stdout.write(f'  - {name}: {", ".join(str(w) for w in manifest["widths"])}')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Generated variants for {generated} images ({skipped} already done, {failed} failed)'))
@@ -0,0 +1,93 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a worker does before serving its first request
+BOOT_CODE = '''
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+import pos_tracker.wsgi
+'''
+
+_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def _ms(us):
+    return f'{us / 1000:.1f} ms'
+
+
+def parse_importtime(stderr):
+    """``[(module, self_us, cumulative_us, depth, parent)]`` from ``-X importtime`` output"""
+    rows, stack = [], []
+    for line in stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        depth = len(indent) // 2
+        # Children are printed before their parent, one level deeper
+        rows.append([module, int(self_us), int(cumulative_us), depth, None])
+        while stack and stack[-1][3] > depth:
+            stack.pop()[4] = module
+        stack.append(rows[-1])
+    return [tuple(row) for row in rows]
+
+
+def import_chain(rows, module):
+    parents = {name: parent for name, _, _, _, parent in rows}
+    chain = [module]
+    while parents.get(chain[-1]):
+        chain.append(parents[chain[-1]])
+    return ' <- '.join(chain)
+
+
+class Command(BaseCommand):
+    help = 'Profile the imports a worker performs at startup (python -X importtime) and flag heavy libraries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Modules/packages to list (default: 25)')
+        parser.add_argument('--check', action='store_true', help='Exit with an error if a HEAVY_MODULES library is imported')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'pos_tracker.settings'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_CODE],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Startup failed:\n{result.stderr[-2000:]}')
+
+        rows = parse_importtime(result.stderr)
+        total = sum(cumulative for _, _, cumulative, depth, _ in rows if depth == 0)
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(rows)} modules imported at startup in {_ms(total)}'))
+
+        by_package = defaultdict(int)
+        for module, self_us, _, _, _ in rows:
+            by_package[module.split('.')[0]] += self_us
+        self.stdout.write(f'\n{"Package":<32} {"Import time":>12} {"Share":>7}')
+        for package, us in sorted(by_package.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'{package:<32} {_ms(us):>12} {us / total:>7.1%}')
+
+        self.stdout.write(f'\n{"Module":<48} {"Cumulative":>12} {"Self":>10}')
+        for module, self_us, cumulative, _, _ in sorted(rows, key=lambda row: -row[2])[:options['top']]:
+            self.stdout.write(f'{module:<48} {_ms(cumulative):>12} {_ms(self_us):>10}')
+
+        heavy = [
+            (module, cumulative) for module, _, cumulative, _, _ in rows
+            if module in getattr(settings, 'HEAVY_MODULES', ())
+        ]
+        for module, cumulative in heavy:
+            self.stdout.write(self.style.ERROR(
+                f'  - {module} loaded at startup ({_ms(cumulative)}): {import_chain(rows, module)}'
+            ))
+        if not heavy:
+            self.stdout.write(self.style.SUCCESS('✓ No HEAVY_MODULES library is imported at startup'))
+        elif options['check']:
+            raise CommandError(f'{len(heavy)} heavy libraries imported at startup')
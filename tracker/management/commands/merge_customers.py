@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from tracker.customers import find_duplicate_clusters, choose_survivor, merge_customers
+from tracker.models import Customer
+
+
+class Command(BaseCommand):
+    help = 'Find duplicate customers by normalized email (optionally phone) and merge them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report clusters without merging')
+        parser.add_argument(
+            '--match-phone', action='store_true',
+            help='Also match on phone number (shared office or family numbers join different people)',
+        )
+
+    def handle(self, *args, **options):
+        clusters = find_duplicate_clusters(match_phone=options['match_phone'])
+        self.stdout.write(f'Found {len(clusters)} duplicate clusters')
+
+        merged = skipped = 0
+        for ids in clusters:
+            customers = list(Customer.objects.filter(pk__in=ids))
+            user_ids = {c.user_id for c in customers if c.user_id}
+            if len(user_ids) > 1:
+                # Two accounts can't share one customer row; leave for manual review
+                skipped += 1
+                self.stdout.write(self.style.WARNING(
+                    f'  - Skipping {ids}: linked to {len(user_ids)} different users'
+                ))
+                continue
+
+            survivor = choose_survivor(customers)
+            duplicates = [c for c in customers if c.pk != survivor.pk]
+            self.stdout.write(
+                f'  - Keep #{survivor.pk} {survivor.email}, merge '
+                + ', '.join(f'#{c.pk} {c.email}' for c in duplicates)
+            )
+            if not options['dry_run']:
+                merge_customers(survivor, duplicates)
+            merged += len(duplicates)
+
+        verb = 'Would merge' if options['dry_run'] else 'Merged'
+        self.stdout.write(self.style.SUCCESS(f'✓ {verb} {merged} customers ({skipped} clusters skipped)'))
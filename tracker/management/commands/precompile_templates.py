@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from tracker.template_cache import precompile_templates
+
+
+class Command(BaseCommand):
+    help = 'Parse and compile every project template, reporting errors and the time taken'
+
+    def handle(self, *args, **options):
+        failed = False
+        for engine, (compiled, errors, seconds) in precompile_templates().items():
+            self.stdout.write(self.style.SUCCESS(f'✓ {engine}: {compiled} templates in {seconds * 1000:.0f} ms'))
+            for name, error in errors:
+                failed = True
+                self.stdout.write(self.style.ERROR(f'  - {name}: {error}'))
+        if failed:
+            self.stdout.write(self.style.WARNING('Some templates could not be compiled'))
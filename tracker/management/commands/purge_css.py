@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from tracker.css_purge import build_bundles, bundle_dir
+
+
+def _kb(size):
+    return f'{size / 1024:.1f} KB'
+
+
+class Command(BaseCommand):
+    help = 'Build per-page-group CSS bundles without the rules templates never use'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--report-only', action='store_true', help='Print the savings without writing bundles')
+
+    def handle(self, *args, **options):
+        bundles, pages = build_bundles(write=not options['report_only'])
+
+        self.stdout.write(f'{"Page":<36} {"Group":<8} {"Full CSS":>20} {"Bundle":>20} {"Saved":>10}')
+        for row in pages:
+            (original, original_gz), (bundle, bundle_gz) = row['original'], row['bundle']
+            self.stdout.write(
+                f'{row["page"]:<36} {row["group"]:<8} '
+                f'{_kb(original) + " / " + _kb(original_gz) + " gz":>20} '
+                f'{_kb(bundle) + " / " + _kb(bundle_gz) + " gz":>20} '
+                f'{_kb(original - bundle):>10}'
+            )
+            page_only = row['page_only'][0]
+            if bundle - page_only > 1024:
+                self.stdout.write(f'{"":<36} {"":<8} {"(page alone would need " + _kb(page_only) + ")":>20}')
+
+        for group, sizes in bundles.items():
+            (original, original_gz), (purged, purged_gz) = sizes['original'], sizes['purged']
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {group}: {_kb(original)} -> {_kb(purged)} ({_kb(original_gz)} -> {_kb(purged_gz)} gzipped)'
+            ))
+        if not options['report_only']:
+            self.stdout.write(f'  - Bundles written to {bundle_dir()}; run collectstatic to publish them')
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from tracker.mail import build_email_templates, send_queued_mail, spool
+
+
+class Command(BaseCommand):
+    help = 'Send spooled outbound email in batches over a single connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--once', action='store_true', help='Send what is due and exit')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when nothing is due')
+
+    def handle(self, *args, **options):
+        # Messages rendered from now on use the CSS-inlined templates
+        built = build_email_templates()
+        if built:
+            self.stdout.write(f'  - Built {len(built)} email templates')
+
+        total = 0
+        while True:
+            sent = send_queued_mail(batch_size=options['batch_size'])
+            total += sent
+            if sent:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+        stats = spool.stats()
+        self.stdout.write(self.style.SUCCESS(f'✓ Sent {total} emails ({stats["pending"]} still queued)'))
+        if stats['dead']:
+            self.stdout.write(self.style.WARNING(f'  - {stats["dead"]} emails exhausted their retries'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from tracker.models import RequestAttachment
+from tracker.similarity import index_path, rebuild, similar_attachments
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the attachment similarity (MinHash) index, or list the documents most like one attachment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Rewrite the index from every analyzed attachment')
+        parser.add_argument('--query', metavar='UPLOAD_ID', help='List the documents most similar to this attachment')
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            indexed = rebuild()
+            self.stdout.write(self.style.SUCCESS(f'✓ Indexed {indexed} attachments in {index_path()}'))
+
+        if options['query']:
+            attachment = RequestAttachment.objects.filter(upload_id=options['query']).first()
+            if attachment is None:
+                raise CommandError(f'No attachment {options["query"]}')
+            matches = similar_attachments(attachment, limit=options['limit'])
+            self.stdout.write(self.style.SUCCESS(f'✓ {len(matches)} documents similar to {attachment.original_name}'))
+            for match, score in matches:
+                self.stdout.write(f'  - {score:.0%} {match.original_name} ({match.upload_id})')
+        elif not options['rebuild']:
+            raise CommandError('Pass --rebuild and/or --query UPLOAD_ID')
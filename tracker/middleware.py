@@ -1,6 +1,16 @@
+import secrets
+import struct
+import zlib
+
+from django.conf import settings
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import SimpleLazyObject
 import pytz
 
+from .fileserver import accepted_encodings
+from .storage import brotli
+
 
 class TimezoneMiddleware:
     """Middleware to set timezone based on user preferences"""
@@ -27,3 +37,155 @@ class AutoProgressOrdersMiddleware:
         # This can be expanded to automatically update order statuses
         response = self.get_response(request)
         return response
+
+
+class CustomerMiddleware:
+    """Attach lazy ``request.customer`` and ``request.user_profile`` objects"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from .customers import resolve_account
+
+        # Nothing is queried until a view or template touches these
+        request.customer = SimpleLazyObject(lambda: resolve_account(request)[0])
+        request.user_profile = SimpleLazyObject(lambda: resolve_account(request)[1])
+        response = self.get_response(request)
+        return response
+
+
+class CompressionMiddleware:
+    """Brotli/gzip compression of HTML, JSON and other text responses.
+
+    Streaming responses are compressed chunk by chunk as they are produced.
+    Responses under ``COMPRESS_MIN_SIZE`` bytes, non-text content types and
+    bodies that already have a ``Content-Encoding`` are left alone. Like
+    Django's ``GZipMiddleware``, output carries random-length padding to
+    blunt BREACH-style length attacks: a header field for gzip, a metadata
+    block (which decoders skip) for brotli.
+    """
+
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.has_header('Content-Encoding') or not _compressible(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESS_MIN_SIZE', 500):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = _negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _compress_async(response.streaming_content, encoding)
+            else:
+                response.streaming_content = _compress_stream(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            compressed = b''.join(_compress_stream([response.content], encoding))
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+# Content types worth compressing; images, PDFs, archives and fonts like
+# woff2 are compressed already
+_COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml',
+    'application/xhtml+xml', 'application/ld+json', 'image/svg+xml',
+)
+
+
+def _compressible(content_type):
+    return content_type.lower().startswith(_COMPRESSIBLE_TYPES)
+
+
+def _negotiate(accept_encoding):
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def _brotli_padding(length):
+    """A brotli metadata meta-block skipping ``length`` (< 256) zero bytes"""
+    if not length:
+        return b''
+    # ISLAST=0, MNIBBLES=0 (metadata), reserved bit, MSKIPBYTES=1, MSKIPLEN-1
+    bits = 0b010110 | (length - 1) << 6
+    return bits.to_bytes(2, 'little') + bytes(length)
+
+
+class _Compressor:
+    """Incremental compressor with ``compress(chunk)``/``finish()``"""
+
+    def __init__(self, encoding):
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(
+                mode=brotli.MODE_TEXT, quality=getattr(settings, 'COMPRESS_BROTLI_QUALITY', 5),
+            )
+            self.header = b''
+            self._padding = _brotli_padding(secrets.randbelow(CompressionMiddleware.max_random_bytes))
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(getattr(settings, 'COMPRESS_GZIP_LEVEL', 6), zlib.DEFLATED, -zlib.MAX_WBITS)
+            self._crc = zlib.crc32(b'')
+            self._size = 0
+            # gzip header with FNAME set and a random-length name (see
+            # django.utils.text.compress_string)
+            padding = b'a' * secrets.randbelow(CompressionMiddleware.max_random_bytes)
+            self.header = b'\x1f\x8b\x08\x08\x00\x00\x00\x00\x00\xff' + padding + b'\x00'
+
+    def compress(self, chunk):
+        if self._brotli is not None:
+            return self._brotli.process(chunk)
+        self._crc = zlib.crc32(chunk, self._crc)
+        self._size += len(chunk)
+        return self._zlib.compress(chunk)
+
+    def finish(self):
+        if self._brotli is not None:
+            # flush() leaves the stream byte-aligned between meta-blocks,
+            # where the padding block can go
+            return self._brotli.flush() + self._padding + self._brotli.finish()
+        return self._zlib.flush() + struct.pack('<II', self._crc & 0xffffffff, self._size & 0xffffffff)
+
+
+def _compress_stream(chunks, encoding):
+    compressor = _Compressor(encoding)
+    if compressor.header:
+        yield compressor.header
+    for chunk in chunks:
+        data = compressor.compress(bytes(chunk))
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _compress_async(chunks, encoding):
+    compressor = _Compressor(encoding)
+    if compressor.header:
+        yield compressor.header
+    async for chunk in chunks:
+        data = compressor.compress(bytes(chunk))
+        if data:
+            yield data
+    yield compressor.finish()
@@ -0,0 +1,51 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+
+INDEX_NAME = 'auth_user_email_lower_uniq'
+
+
+def check_email_conflicts(apps, schema_editor):
+    """Refuse to build the index over emails that differ only in case"""
+    User = apps.get_model('auth', 'User')
+    accounts = defaultdict(list)
+    for pk, username, email in User.objects.exclude(email='').values_list('pk', 'username', 'email').order_by('pk'):
+        accounts[email.lower()].append(f'#{pk} {username} <{email}>')
+    conflicts = [rows for rows in accounts.values() if len(rows) > 1]
+    if conflicts:
+        listing = '\n'.join('  ' + ', '.join(rows) for rows in conflicts)
+        raise RuntimeError(
+            'Email addresses must be unique regardless of case, but these user accounts share one:\n'
+            f'{listing}\n'
+            'Give each account its own address (or merge the accounts), then run migrate again.'
+        )
+
+
+def create_email_lower_index(apps, schema_editor):
+    # Must stay in sync with tracker.backends.EmailKey so lookups can use it
+    if schema_editor.connection.vendor == 'mysql':
+        expression = "((NULLIF(LOWER(email), '')))"
+    else:
+        expression = "(NULLIF(LOWER(email), ''))"
+    schema_editor.execute(f"CREATE UNIQUE INDEX {INDEX_NAME} ON auth_user {expression}")
+
+
+def drop_email_lower_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(f"DROP INDEX {INDEX_NAME} ON auth_user")
+    else:
+        schema_editor.execute(f"DROP INDEX {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tracker', '0002_zoomappointment'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_email_conflicts, migrations.RunPython.noop),
+        migrations.RunPython(create_email_lower_index, drop_email_lower_index),
+    ]
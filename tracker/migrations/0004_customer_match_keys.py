@@ -0,0 +1,154 @@
+# Generated by Django 4.2.11 on 2026-10-19 00:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_customer_keys(apps, schema_editor):
+    from tracker.models import normalize_email_key, normalize_phone_key
+
+    Customer = apps.get_model('tracker', 'Customer')
+    customers = list(Customer.objects.only('id', 'email', 'phone'))
+    for customer in customers:
+        customer.email_key = normalize_email_key(customer.email)
+        customer.phone_key = normalize_phone_key(customer.phone)
+    Customer.objects.bulk_update(customers, ['email_key', 'phone_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0003_auth_user_email_lower_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Leadership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('title', models.CharField(max_length=255)),
+                ('affiliation', models.CharField(blank=True, max_length=255)),
+                ('bio', models.TextField(blank=True, help_text='Brief biography or description')),
+                ('photo', models.ImageField(blank=True, help_text='Profile photo - recommended size: 400x500px', null=True, upload_to='leadership/')),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('phone', models.CharField(blank=True, max_length=20)),
+                ('facebook', models.URLField(blank=True)),
+                ('twitter', models.URLField(blank=True)),
+                ('linkedin', models.URLField(blank=True)),
+                ('instagram', models.URLField(blank=True)),
+                ('display_order', models.IntegerField(default=0, help_text='Order of appearance on the website')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['display_order', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ServiceFAQ',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question', models.CharField(max_length=500)),
+                ('answer', models.TextField()),
+                ('display_order', models.IntegerField(default=0)),
+                ('is_published', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Service FAQ',
+                'verbose_name_plural': 'Service FAQs',
+                'ordering': ['display_order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ServiceImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('image', models.ImageField(help_text='Service/category image - recommended size: 600x400px', upload_to='services/')),
+                ('description', models.TextField(blank=True)),
+                ('display_order', models.IntegerField(default=0)),
+                ('is_featured', models.BooleanField(default=False, help_text='Show as main image for this service')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['display_order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TutorialVideo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('video_url', models.URLField(help_text='YouTube video URL or embedded video link')),
+                ('duration', models.CharField(blank=True, help_text='e.g., 5:30', max_length=20)),
+                ('thumbnail', models.ImageField(blank=True, help_text='Video thumbnail - recommended size: 640x360px', null=True, upload_to='tutorials/')),
+                ('display_order', models.IntegerField(default=0)),
+                ('is_published', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['display_order'],
+            },
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='email_key',
+            field=models.CharField(blank=True, editable=False, help_text='Normalized email for matching', max_length=254),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_key',
+            field=models.CharField(blank=True, editable=False, help_text='Digits-only phone for matching', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['email_key'], name='tracker_cus_email_k_7130b1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['phone_key'], name='tracker_cus_phone_k_bf4f5a_idx'),
+        ),
+        migrations.AddField(
+            model_name='tutorialvideo',
+            name='service',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tutorial_videos', to='tracker.researchservice'),
+        ),
+        migrations.AddField(
+            model_name='serviceimage',
+            name='service',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='tracker.researchservice'),
+        ),
+        migrations.AddField(
+            model_name='servicefaq',
+            name='service',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='faqs', to='tracker.researchservice'),
+        ),
+        migrations.AddIndex(
+            model_name='leadership',
+            index=models.Index(fields=['is_active'], name='tracker_lea_is_acti_639a35_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leadership',
+            index=models.Index(fields=['display_order'], name='tracker_lea_display_e72fc4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutorialvideo',
+            index=models.Index(fields=['service', 'is_published'], name='tracker_tut_service_2bea6c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceimage',
+            index=models.Index(fields=['service', 'is_featured'], name='tracker_ser_service_3de210_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicefaq',
+            index=models.Index(fields=['service', 'is_published'], name='tracker_ser_service_ad33d0_idx'),
+        ),
+        migrations.RunPython(populate_customer_keys, migrations.RunPython.noop),
+    ]
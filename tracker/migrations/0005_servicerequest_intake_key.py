@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-19 00:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0004_customer_match_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='intake_key',
+            field=models.CharField(blank=True, editable=False, help_text='Idempotency key from the intake queue', max_length=64, null=True, unique=True),
+        ),
+    ]
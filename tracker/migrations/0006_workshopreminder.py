@@ -0,0 +1,28 @@
+# Generated by Django 4.2.11 on 2026-10-19 00:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0005_servicerequest_intake_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkshopReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(help_text="Reminder window key, e.g. '24h'", max_length=20)),
+                ('recipient_count', models.IntegerField(default=0)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('workshop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='tracker.workshop')),
+            ],
+            options={
+                'ordering': ['-sent_at'],
+                'unique_together': {('workshop', 'window')},
+            },
+        ),
+    ]
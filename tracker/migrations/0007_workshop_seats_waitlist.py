@@ -0,0 +1,53 @@
+# Generated by Django 4.2.11 on 2026-10-19 00:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_seats_left(apps, schema_editor):
+    Workshop = apps.get_model('tracker', 'Workshop')
+    WorkshopRegistration = apps.get_model('tracker', 'WorkshopRegistration')
+    held = WorkshopRegistration.objects.filter(
+        workshop=models.OuterRef('pk'), status__in=('registered', 'attended'),
+    ).order_by().values('workshop').annotate(count=models.Count('pk')).values('count')
+    Workshop.objects.filter(max_participants__gt=0).update(
+        seats_left=models.functions.Greatest(
+            models.F('max_participants') - models.functions.Coalesce(models.Subquery(held), models.Value(0)),
+            models.Value(0),
+        )
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0006_workshopreminder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workshop',
+            name='seats_left',
+            field=models.IntegerField(blank=True, editable=False, help_text='Remaining seats; empty when unlimited', null=True),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('service_update', 'Service Update'), ('workshop_reminder', 'Workshop Reminder'), ('workshop_update', 'Workshop Update'), ('message', 'Message'), ('system', 'System')], max_length=50),
+        ),
+        migrations.CreateModel(
+            name='WorkshopWaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('special_requirements', models.TextField(blank=True)),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='workshop_waitlist', to='tracker.customer')),
+                ('workshop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='tracker.workshop')),
+            ],
+            options={
+                'verbose_name_plural': 'Workshop waitlist entries',
+                'ordering': ['joined_at', 'id'],
+                'unique_together': {('workshop', 'customer')},
+            },
+        ),
+        migrations.RunPython(populate_seats_left, migrations.RunPython.noop),
+    ]
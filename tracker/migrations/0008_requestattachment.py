@@ -0,0 +1,44 @@
+# Generated by Django 4.2.11 on 2026-10-19 01:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import tracker.models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracker', '0007_workshop_seats_waitlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestAttachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('intake_key', models.CharField(blank=True, db_index=True, help_text='Intake key of the submission, until its request is written', max_length=64)),
+                ('file', models.FileField(blank=True, max_length=255, storage=tracker.models.attachment_storage, upload_to='attachments/')),
+                ('original_name', models.CharField(max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('size', models.BigIntegerField(help_text='Size in bytes')),
+                ('checksum', models.CharField(blank=True, help_text='SHA-256 declared by the client, if any', max_length=64)),
+                ('sha256', models.CharField(blank=True, editable=False, max_length=64)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('complete', 'Complete'), ('failed', 'Failed')], default='uploading', max_length=20)),
+                ('page_count', models.IntegerField(blank=True, null=True)),
+                ('word_count', models.IntegerField(blank=True, null=True)),
+                ('analyzed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('service_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='tracker.servicerequest')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_attachments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='tracker_req_status_0b1bcc_idx')],
+            },
+        ),
+    ]
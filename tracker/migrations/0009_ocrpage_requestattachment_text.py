@@ -0,0 +1,32 @@
+# Generated by Django 4.2.11 on 2026-10-19 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0008_requestattachment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcrPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('text', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='requestattachment',
+            name='extracted_text',
+            field=models.TextField(blank=True, help_text='Document text, pages separated by form feeds'),
+        ),
+        migrations.AddField(
+            model_name='requestattachment',
+            name='ocr_pages',
+            field=models.IntegerField(blank=True, help_text='Pages whose text was recognized from scans', null=True),
+        ),
+    ]
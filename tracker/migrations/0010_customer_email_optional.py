@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-19 02:03
+
+from django.db import migrations, models
+
+
+def blank_emails_to_null(apps, schema_editor):
+    Customer = apps.get_model('tracker', 'Customer')
+    Customer.objects.filter(email='').update(email=None)
+
+
+def null_emails_to_blank(apps, schema_editor):
+    Customer = apps.get_model('tracker', 'Customer')
+    Customer.objects.filter(email__isnull=True).update(email='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0009_ocrpage_requestattachment_text'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='email',
+            field=models.EmailField(blank=True, max_length=254, null=True, unique=True),
+        ),
+        migrations.RunPython(blank_emails_to_null, null_emails_to_blank),
+    ]
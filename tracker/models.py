@@ -1,3 +1,7 @@
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -5,6 +9,16 @@ from django.core.validators import URLValidator, EmailValidator
 from django.db.models import Q
 
 
+def normalize_email_key(email):
+    """Lower-cased, trimmed email used for customer matching"""
+    return (email or '').strip().lower()
+
+
+def normalize_phone_key(phone):
+    """Digits-only phone number used for customer matching"""
+    return ''.join(ch for ch in (phone or '') if ch.isdigit())
+
+
 class Customer(models.Model):
     """Customer/Client model"""
     CUSTOMER_TYPE_CHOICES = (
@@ -13,9 +27,12 @@ class Customer(models.Model):
     )
     
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='customer_profile')
-    email = models.EmailField(unique=True)
+    # NULL rather than blank when unknown, so any number of customers can lack one
+    email = models.EmailField(unique=True, null=True, blank=True)
+    email_key = models.CharField(max_length=254, blank=True, editable=False, help_text="Normalized email for matching")
     full_name = models.CharField(max_length=255)
     phone = models.CharField(max_length=20, blank=True)
+    phone_key = models.CharField(max_length=20, blank=True, editable=False, help_text="Digits-only phone for matching")
     organization = models.CharField(max_length=255, blank=True)
     customer_type = models.CharField(max_length=20, choices=CUSTOMER_TYPE_CHOICES, default='individual')
     registration_date = models.DateTimeField(auto_now_add=True)
@@ -28,10 +45,26 @@ class Customer(models.Model):
         indexes = [
             models.Index(fields=['email']),
             models.Index(fields=['is_active']),
+            models.Index(fields=['email_key']),
+            models.Index(fields=['phone_key']),
         ]
     
     def __str__(self):
-        return f"{self.full_name} ({self.email})"
+        return f"{self.full_name} ({self.email})" if self.email else self.full_name
+
+    def save(self, *args, **kwargs):
+        self.email = self.email or None
+        self.email_key = normalize_email_key(self.email)
+        self.phone_key = normalize_phone_key(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'email' in update_fields:
+                update_fields.add('email_key')
+            if 'phone' in update_fields:
+                update_fields.add('phone_key')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
     
     def get_total_requests(self):
         return self.service_requests.count()
@@ -145,6 +178,7 @@ class ServiceRequest(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_requests')
+    intake_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False, help_text="Idempotency key from the intake queue")
     
     class Meta:
         ordering = ['-created_at']
@@ -168,6 +202,58 @@ class ServiceRequest(models.Model):
         return False
 
 
+def attachment_storage():
+    """Client documents live outside MEDIA_ROOT, so they are never served publicly"""
+    return FileSystemStorage(location=settings.ATTACHMENT_ROOT)
+
+
+class RequestAttachment(models.Model):
+    """Document uploaded for a service request (manuscript, dataset, ...)"""
+    STATUS_CHOICES = (
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    )
+
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE, null=True, blank=True, related_name='attachments')
+    intake_key = models.CharField(max_length=64, blank=True, db_index=True, help_text="Intake key of the submission, until its request is written")
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='request_attachments')
+    file = models.FileField(storage=attachment_storage, upload_to='attachments/', max_length=255, blank=True)
+    original_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField(help_text="Size in bytes")
+    checksum = models.CharField(max_length=64, blank=True, help_text="SHA-256 declared by the client, if any")
+    sha256 = models.CharField(max_length=64, blank=True, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    page_count = models.IntegerField(null=True, blank=True)
+    word_count = models.IntegerField(null=True, blank=True)
+    extracted_text = models.TextField(blank=True, help_text="Document text, pages separated by form feeds")
+    ocr_pages = models.IntegerField(null=True, blank=True, help_text="Pages whose text was recognized from scans")
+    analyzed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return self.original_name
+
+
+class OcrPage(models.Model):
+    """Recognized text of a rasterized page, keyed by the image's content hash"""
+    content_hash = models.CharField(max_length=64, unique=True)
+    text = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.content_hash
+
+
 class Workshop(models.Model):
     """Workshops and training sessions"""
     title = models.CharField(max_length=255)
@@ -179,6 +265,7 @@ class Workshop(models.Model):
     is_online = models.BooleanField(default=False)
     meeting_url = models.URLField(blank=True, help_text="Zoom/Teams link for online workshops")
     max_participants = models.IntegerField(null=True, blank=True)
+    seats_left = models.IntegerField(null=True, blank=True, editable=False, help_text="Remaining seats; empty when unlimited")
     facilitator = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='workshops')
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, default=0)
     is_active = models.BooleanField(default=True)
@@ -200,8 +287,16 @@ class Workshop(models.Model):
     
     def is_full(self):
         if self.max_participants:
-            return self.get_registration_count() >= self.max_participants
+            return self.seats_left is not None and self.seats_left <= 0
         return False
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'max_participants' in update_fields:
+            from .workshops import sync_seats
+            sync_seats([self.pk])
+            self.refresh_from_db(fields=['seats_left'])
     
     def is_upcoming(self):
         return self.date > timezone.now()
@@ -234,6 +329,37 @@ class WorkshopRegistration(models.Model):
         return f"{self.customer.full_name} - {self.workshop.title}"
 
 
+class WorkshopWaitlistEntry(models.Model):
+    """Customer waiting for a seat in a full workshop"""
+    workshop = models.ForeignKey(Workshop, on_delete=models.CASCADE, related_name='waitlist')
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='workshop_waitlist')
+    special_requirements = models.TextField(blank=True)
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('workshop', 'customer')
+        ordering = ['joined_at', 'id']
+        verbose_name_plural = "Workshop waitlist entries"
+
+    def __str__(self):
+        return f"{self.customer.full_name} - {self.workshop.title} (waitlist)"
+
+
+class WorkshopReminder(models.Model):
+    """Record of a reminder window already sent for a workshop"""
+    workshop = models.ForeignKey(Workshop, on_delete=models.CASCADE, related_name='reminders')
+    window = models.CharField(max_length=20, help_text="Reminder window key, e.g. '24h'")
+    recipient_count = models.IntegerField(default=0)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('workshop', 'window')
+        ordering = ['-sent_at']
+
+    def __str__(self):
+        return f"{self.workshop.title} - {self.window} reminder"
+
+
 class ZoomAppointment(models.Model):
     """Zoom appointment for workshops/trainings"""
     workshop = models.OneToOneField(Workshop, on_delete=models.CASCADE, related_name='zoom_appointment', null=True, blank=True)
@@ -299,6 +425,7 @@ class Notification(models.Model):
     NOTIFICATION_TYPES = (
         ('service_update', 'Service Update'),
         ('workshop_reminder', 'Workshop Reminder'),
+        ('workshop_update', 'Workshop Update'),
         ('message', 'Message'),
         ('system', 'System'),
     )
@@ -0,0 +1,218 @@
+"""OCR of scanned PDF attachments.
+
+PDF pages with (next to) no text layer are rasterized with PyMuPDF at
+``OCR_DPI`` and recognized by tesseract (pytesseract) in a
+``ProcessPoolExecutor`` of ``OCR_WORKERS`` processes. Pages are rendered
+lazily, and at most ``OCR_MAX_PENDING`` page images are waiting for a worker
+at any time, so a 500-page scan costs a few images' worth of memory.
+
+Recognized text is cached per page in ``OcrPage``, keyed by the SHA-256 of the
+rendered image (and the tesseract languages), so a re-uploaded document or
+repeated pages are only recognized once. The result replaces the text of
+those pages in ``RequestAttachment.extracted_text`` and the word count.
+
+Runs from the OCR spool's scheduler job, or right after analysis with
+``OCR_BACKGROUND`` off. The workers import this module without setting up
+Django, so models are only imported inside the functions that use them.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import transaction
+
+from .spool import SQLiteSpool
+
+logger = logging.getLogger(__name__)
+
+spool = SQLiteSpool(
+    getattr(settings, 'OCR_SPOOL_PATH', settings.BASE_DIR / 'ocr_spool.sqlite3'),
+    table='ocr',
+    max_attempts=3,
+    backoff=300,
+)
+
+
+def _min_words():
+    return getattr(settings, 'OCR_MIN_WORDS', 10)
+
+
+def needs_ocr(text):
+    """Whether any page of an extracted PDF text looks scanned"""
+    from .attachments import PAGE_BREAK, count_words
+
+    return any(count_words(page) < _min_words() for page in text.split(PAGE_BREAK))
+
+
+def schedule(attachment):
+    key = str(attachment.upload_id)
+
+    def enqueue():
+        spool.enqueue(key, key.encode('utf-8'))
+        if not getattr(settings, 'OCR_BACKGROUND', True):
+            process_queue(keys=[key])
+
+    transaction.on_commit(enqueue)
+
+
+# ============================================================================
+# RECOGNITION (runs in the worker processes)
+# ============================================================================
+
+def _init_worker():
+    # One tesseract thread per worker; the pool is the parallelism
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+
+def recognize(png, languages):
+    import pytesseract
+    from io import BytesIO
+    from PIL import Image
+
+    with Image.open(BytesIO(png)) as image:
+        return pytesseract.image_to_string(image, lang=languages)
+
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+_pool = None
+
+
+def _workers():
+    return getattr(settings, 'OCR_WORKERS', None) or os.cpu_count() or 1
+
+
+def _executor():
+    """Process pool shared by every document this process recognizes"""
+    global _pool
+    if _pool is None:
+        # Fresh interpreters rather than forks of a (possibly threaded) web worker
+        _pool = ProcessPoolExecutor(
+            _workers(), mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker,
+        )
+    return _pool
+
+
+def _recognized(images, languages):
+    """``(key, text)`` for each ``(key, png)`` in ``images``, in completion
+    order, with at most ``OCR_MAX_PENDING`` images queued
+    """
+    if _workers() <= 1:
+        for key, png in images:
+            yield key, recognize(png, languages)
+        return
+
+    pool = _executor()
+    max_pending = getattr(settings, 'OCR_MAX_PENDING', None) or 2 * _workers()
+    pending = {}
+    for key, png in images:
+        if len(pending) >= max_pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+        pending[pool.submit(recognize, png, languages)] = key
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future.result()
+
+
+# ============================================================================
+# DOCUMENTS
+# ============================================================================
+
+def page_hash(png, languages):
+    return hashlib.sha256(languages.encode('utf-8') + b'\0' + png).hexdigest()
+
+
+def ocr_pdf(path, pages):
+    """Text of ``pages`` (page indexes) of the PDF at ``path``, recognized or
+    from the cache; returns ``({index: text}, number of images recognized)``
+    """
+    import fitz
+
+    from .models import OcrPage
+
+    languages = getattr(settings, 'OCR_LANGUAGES', 'eng')
+    dpi = getattr(settings, 'OCR_DPI', 300)
+    texts = {}
+    # Pages waiting for their first recognition, by image hash; identical
+    # pages in one document (blank or repeated forms) are recognized once
+    recognizing = {}
+
+    with fitz.open(str(path)) as document:
+        def images():
+            for index in pages:
+                png = document[index].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY).tobytes('png')
+                digest = page_hash(png, languages)
+                if digest in recognizing:
+                    recognizing[digest].append(index)
+                    continue
+                cached = OcrPage.objects.filter(content_hash=digest).values_list('text', flat=True).first()
+                if cached is not None:
+                    texts[index] = cached
+                    continue
+                recognizing[digest] = [index]
+                yield digest, png
+
+        recognized = dict(_recognized(images(), languages))
+
+    OcrPage.objects.bulk_create(
+        [OcrPage(content_hash=digest, text=text) for digest, text in recognized.items()],
+        ignore_conflicts=True,
+    )
+    for digest, text in recognized.items():
+        for index in recognizing[digest]:
+            texts[index] = text
+    return texts, len(recognized)
+
+
+def ocr_attachment(attachment):
+    """Replace the text of the scanned pages of ``attachment`` with OCR output
+    and add the document to the similarity index
+    """
+    from . import similarity
+    from .attachments import PAGE_BREAK, count_words
+
+    page_texts = attachment.extracted_text.split(PAGE_BREAK)
+    scanned = [index for index, text in enumerate(page_texts) if count_words(text) < _min_words()]
+    texts, recognized = ocr_pdf(attachment.file.path, scanned)
+    for index, text in texts.items():
+        page_texts[index] = text.strip()
+
+    attachment.extracted_text = PAGE_BREAK.join(page_texts).replace('\x00', '')
+    attachment.word_count = count_words(attachment.extracted_text)
+    attachment.ocr_pages = len(scanned)
+    attachment.save(update_fields=['extracted_text', 'word_count', 'ocr_pages'])
+    logger.info('OCR of %s: %d scanned pages, %d recognized', attachment.upload_id, len(scanned), recognized)
+    similarity.add(attachment)
+
+
+def process_queue(batch_size=5, keys=None):
+    """OCR queued attachments; returns the number processed"""
+    global _pool
+    from .models import RequestAttachment
+
+    done = 0
+    for key, _ in spool.fetch(batch_size, keys=keys):
+        try:
+            attachment = RequestAttachment.objects.filter(
+                upload_id=key, status='complete', analyzed_at__isnull=False,
+            ).first()
+            if attachment is not None:
+                ocr_attachment(attachment)
+            spool.ack([key])
+            done += 1
+        except Exception as e:
+            logger.exception('OCR of attachment %s failed', key)
+            spool.fail(key, e)
+            if isinstance(e, BrokenProcessPool):
+                # A worker died; start a fresh pool for the next document
+                _pool = None
+    return done
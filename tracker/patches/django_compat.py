@@ -1,62 +1,49 @@
 """Compatibility monkeypatch for Django template Context __copy__ on Python 3.14+
 This module is intentionally imported early (from settings) to apply a safe __copy__
-implementation that avoids assigning attributes on a 'super' proxy object which
-is incompatible with some CPython 3.14 behavior.
+implementation that avoids calling copy() on a 'super' proxy object, which
+is incompatible with CPython 3.14.
+The replacement matches the one Django itself adopted: only BaseContext is
+patched, so Context.__copy__ still copies render_context on top of it. On older
+Pythons the stock implementation works and is left alone; ``apply()`` and
+``restore()`` exist for benchmarking the two against each other.
 The implementation is defensive and will silently no-op if Django isn't present.
 """
+import sys
+from copy import copy
 
 try:
     from django.template import context as dj_context
 except Exception:
     dj_context = None
 
+_stock_copy = getattr(getattr(dj_context, "BaseContext", None), "__copy__", None)
+
 
 def _safe_copy(self):
-    """Return a shallow copy of the context instance in a way that is safe
-    across Django and Python versions.
+    """Shallow copy of a context: the same attributes and a new list of the
+    same dicts (pushes and pops on the copy don't affect the original).
     """
-    cls = self.__class__
-    # Create a blank instance without calling __init__
-    try:
-        new = object.__new__(cls)
-    except Exception:
-        # Fallback: use a plain object if class can't be instantiated this way
-        new = {}
-
-    # Copy attributes from __dict__ if available
-    if hasattr(self, "__dict__") and isinstance(new, object):
-        try:
-            new.__dict__.update(self.__dict__.copy())
-        except Exception:
-            # As a last resort, shallow copy attribute by attribute
-            for k, v in list(getattr(self, "__dict__", {}).items()):
-                try:
-                    setattr(new, k, v)
-                except Exception:
-                    pass
-
-    # Ensure a safe shallow copy of the 'dicts' attribute if present
-    if hasattr(self, "dicts"):
-        try:
-            new.dicts = [d.copy() if hasattr(d, "copy") else d for d in self.dicts]
-        except Exception:
-            try:
-                new.dicts = list(self.dicts)
-            except Exception:
-                # ignore if not copyable
-                pass
+    duplicate = dj_context.BaseContext()
+    duplicate.__class__ = self.__class__
+    duplicate.__dict__ = copy(self.__dict__)
+    duplicate.dicts = self.dicts[:]
+    return duplicate
 
-    return new
 
-
-# Apply monkeypatch if Django is available
-if dj_context is not None:
-    for name in ("BaseContext", "Context"):
+def apply():
+    if dj_context is not None:
         try:
-            cls = getattr(dj_context, name, None)
-            if cls is not None:
-                # Replace or set a safe __copy__ implementation
-                cls.__copy__ = _safe_copy
+            dj_context.BaseContext.__copy__ = _safe_copy
         except Exception:
             # Do not fail import if patching isn't possible
             pass
+
+
+def restore():
+    if dj_context is not None and _stock_copy is not None:
+        dj_context.BaseContext.__copy__ = _stock_copy
+
+
+# Apply monkeypatch if Django is available and the stock version is broken
+if sys.version_info >= (3, 14):
+    apply()
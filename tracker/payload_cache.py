@@ -0,0 +1,163 @@
+"""Precomputed JSON payloads for the public catalog API endpoints.
+
+Each registered endpoint declares the filter variants it can be asked for and a
+builder that produces the response body from ``values()`` queries. Built bodies
+are stored in the ``PAYLOAD_CACHE_ALIAS`` cache as ready-to-send bytes
+(identity and gzip, each with its own ETag), so a hit is a single cache read
+with no model instantiation and no ``json.dumps``. That cache must be shared
+by all worker processes (see the tracker.W002 check).
+
+The catalog version is bumped by the signal handlers in ``tracker.signals``
+whenever catalog data changes; every stored variant is dropped at that point
+and rebuilt lazily on the next request.
+"""
+import gzip
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .models import ResearchService
+
+
+CATALOG_VERSION_KEY = 'catalog:version'
+PAYLOAD_KEY_PREFIX = 'api-payload'
+PAYLOAD_TIMEOUT = 60 * 60 * 24
+
+_endpoints = {}
+
+
+def payload_cache():
+    return caches[getattr(settings, 'PAYLOAD_CACHE_ALIAS', 'payloads')]
+
+
+def register_endpoint(name, variants):
+    """Register a payload builder under ``name``.
+
+    ``variants`` is a callable returning every filter value the endpoint can be
+    asked for (``''`` meaning "no filter"); it is used to invalidate all stored
+    payloads of the endpoint at once.
+    """
+    def decorator(builder):
+        _endpoints[name] = {'builder': builder, 'variants': variants}
+        return builder
+    return decorator
+
+
+def _payload_key(name, variant):
+    return f'{PAYLOAD_KEY_PREFIX}:{name}:{variant or "-"}'
+
+
+def get_catalog_version():
+    cache = payload_cache()
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every stored catalog payload."""
+    cache = payload_cache()
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 2, timeout=None)
+
+    keys = []
+    for name, endpoint in _endpoints.items():
+        keys.extend(_payload_key(name, variant) for variant in endpoint['variants']())
+    cache.delete_many(keys)
+
+
+def _build_entry(name, variant, store=True):
+    version = get_catalog_version()
+    payload = _endpoints[name]['builder'](variant)
+    body = json.dumps(payload, cls=DjangoJSONEncoder).encode('utf-8')
+    digest = hashlib.md5(body).hexdigest()
+    entry = {
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+        # Different bytes, so a different strong validator
+        'etag': f'"{digest}"',
+        'gzip_etag': f'"{digest}-gzip"',
+    }
+    if not store:
+        return entry
+
+    cache = payload_cache()
+    key = _payload_key(name, variant)
+    cache.set(key, entry, timeout=PAYLOAD_TIMEOUT)
+
+    # Catalog changed while we were building: don't leave a stale payload behind.
+    if get_catalog_version() != version:
+        cache.delete(key)
+    return entry
+
+
+def _etags(header):
+    return {etag.strip() for etag in header.split(',')} if header else set()
+
+
+def payload_response(request, name, variant=''):
+    """Return the stored payload for ``name``/``variant`` as an HttpResponse."""
+    # Unknown filter values are answered but never stored, so arbitrary query
+    # strings cannot fill the cache.
+    known = variant in _endpoints[name]['variants']()
+    entry = payload_cache().get(_payload_key(name, variant)) if known else None
+    if entry is None:
+        entry = _build_entry(name, variant, store=known)
+
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    etag = entry['gzip_etag'] if use_gzip else entry['etag']
+    if etag in _etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponse(status=304)
+    elif use_gzip:
+        response = HttpResponse(entry['gzip'], content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(entry['identity'], content_type='application/json')
+
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+# ============================================================================
+# CATALOG ENDPOINTS
+# ============================================================================
+
+def _service_categories():
+    return [''] + [value for value, _ in ResearchService.CATEGORY_CHOICES]
+
+
+@register_endpoint('services', variants=_service_categories)
+def build_services_payload(category):
+    """Payload for ``get_services_json``"""
+    services = ResearchService.objects.filter(is_active=True)
+    if category:
+        services = services.filter(category=category)
+
+    rows = services.values(
+        'id', 'name', 'category', 'description', 'icon',
+        'price_from', 'price_to', 'turnaround_time',
+    )
+    services_list = [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'category': row['category'],
+            'description': row['description'],
+            'icon': row['icon'],
+            'price_from': str(row['price_from']) if row['price_from'] else None,
+            'price_to': str(row['price_to']) if row['price_to'] else None,
+            'turnaround_time': row['turnaround_time'],
+        }
+        for row in rows
+    ]
+    return {'services': services_list}
@@ -0,0 +1,92 @@
+"""Workshop reminder fan-out.
+
+For every configured window (``WORKSHOP_REMINDER_WINDOWS``, minutes before the
+start) each workshop starting within that window gets one ``Notification`` per
+registered attendee, written with a single ``bulk_create``. A
+``WorkshopReminder`` row marks the (workshop, window) pair as sent in the same
+transaction, so overlapping runs never notify twice.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Exists, OuterRef, When
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Notification, Workshop, WorkshopRegistration, WorkshopReminder
+
+DEFAULT_REMINDER_WINDOWS = {'24h': 24 * 60, '1h': 60}
+
+
+def _window_label(minutes):
+    if minutes % (24 * 60) == 0:
+        days = minutes // (24 * 60)
+        return f'in {days} day{"s" if days != 1 else ""}'
+    if minutes % 60 == 0:
+        hours = minutes // 60
+        return f'in {hours} hour{"s" if hours != 1 else ""}'
+    return f'in {minutes} minutes'
+
+
+def _workshops_due(window, minutes, floor_minutes, now):
+    # An active Zoom appointment carries the actual start time
+    start = Coalesce(
+        Case(When(zoom_appointment__is_active=True, then='zoom_appointment__start_time')),
+        'date',
+    )
+    return Workshop.objects.filter(is_active=True).annotate(starts_at=start).filter(
+        starts_at__gt=now + timedelta(minutes=floor_minutes),
+        starts_at__lte=now + timedelta(minutes=minutes),
+    ).exclude(
+        Exists(WorkshopReminder.objects.filter(workshop=OuterRef('pk'), window=window))
+    ).only('id', 'title')
+
+
+def _remind(workshop, window, minutes):
+    user_ids = WorkshopRegistration.objects.filter(
+        workshop=workshop,
+        status='registered',
+        customer__user__isnull=False,
+    ).values_list('customer__user_id', flat=True).distinct()
+
+    title = f'Reminder: {workshop.title} starts {_window_label(minutes)}'
+    message = f'"{workshop.title}" starts {_window_label(minutes)} ({timezone.localtime(workshop.starts_at):%b %d, %Y %H:%M}).'
+    link = reverse('workshop_detail', args=[workshop.pk])
+
+    try:
+        with transaction.atomic():
+            marker = WorkshopReminder.objects.create(workshop=workshop, window=window)
+            notifications = [
+                Notification(
+                    user_id=user_id,
+                    notification_type='workshop_reminder',
+                    title=title,
+                    message=message,
+                    link=link,
+                )
+                for user_id in user_ids.iterator(chunk_size=2000)
+            ]
+            Notification.objects.bulk_create(notifications, batch_size=1000)
+            marker.recipient_count = len(notifications)
+            marker.save(update_fields=['recipient_count'])
+    except IntegrityError:
+        # Another run already sent this window
+        return 0
+    return len(notifications)
+
+
+def send_workshop_reminders(now=None):
+    """Create due reminder notifications; returns the number created"""
+    now = now or timezone.now()
+    windows = getattr(settings, 'WORKSHOP_REMINDER_WINDOWS', DEFAULT_REMINDER_WINDOWS)
+    created = 0
+    # Each window only covers starts beyond the next shorter window, so a
+    # workshop that is already close gets the nearer reminder, not both.
+    floor_minutes = 0
+    for window, minutes in sorted(windows.items(), key=lambda item: item[1]):
+        for workshop in _workshops_due(window, minutes, floor_minutes, now):
+            created += _remind(workshop, window, minutes)
+        floor_minutes = minutes
+    return created
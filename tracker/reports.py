@@ -0,0 +1,377 @@
+"""Admin report data and its PDF rendering.
+
+``report_data(period)`` runs the aggregate queries behind the admin reports
+page. The result is plain JSON data, and its hash is the report's data
+version: a report is identified by ``<period>-<version>``, so identical data
+always maps to the same PDF, and any change to the numbers gives a new key.
+
+PDFs (reportlab, with charts) are rendered off the request path. Asking for
+one spools its data under the report key, and the worker renders it into
+``REPORT_PDF_DIR``. The worker is ``runapscheduler``, or the request itself
+when background rendering is off (the default in DEBUG). The admin page polls
+``report_status`` until the file exists. A key that is already rendered or
+queued is never rendered twice.
+"""
+import calendar
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncMonth
+from django.utils import timezone
+
+from .models import Customer, ResearchService, ServiceRequest, WorkshopRegistration
+from .spool import SQLiteSpool
+
+logger = logging.getLogger(__name__)
+
+# period -> (label, months covered; 0 = the current month to date)
+PERIODS = {
+    '1m': ('This month', 0),
+    '3m': ('Last 3 months', 3),
+    '6m': ('Last 6 months', 6),
+    '12m': ('Last 12 months', 12),
+}
+DEFAULT_PERIOD = '1m'
+
+# PDFs kept per period (the newest data versions)
+KEEP_PER_PERIOD = 2
+
+QUEUED, READY, FAILED = 'queued', 'ready', 'failed'
+
+spool = SQLiteSpool(
+    getattr(settings, 'REPORT_SPOOL_PATH', settings.BASE_DIR / 'report_spool.sqlite3'),
+    max_attempts=3,
+    backoff=10,
+)
+
+
+# ============================================================================
+# DATA
+# ============================================================================
+
+def _months_back(day, months):
+    """First day of the month ``months`` before ``day``'s month"""
+    month_index = day.year * 12 + day.month - 1 - months
+    return day.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def period_bounds(period, now=None):
+    """``(start, end, previous_start)`` as aware datetimes; the previous
+    window is the same number of months before ``start``
+    """
+    now = timezone.localtime(now)
+    months = PERIODS[period][1]
+    first = _months_back(now.date(), max(months - 1, 0))
+    previous_first = _months_back(first, max(months, 1))
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(first, time.min), tz)
+    previous_start = timezone.make_aware(datetime.combine(previous_first, time.min), tz)
+    return start, now, previous_start
+
+
+def _change(current, previous):
+    if previous > 0:
+        return round((current - previous) / previous * 100, 1)
+    return 100 if current > 0 else 0
+
+
+def _series(queryset, field, trunc, buckets):
+    counts = dict(
+        queryset.annotate(bucket=trunc(field)).values('bucket').annotate(n=Count('id')).values_list('bucket', 'n')
+    )
+    counts = {timezone.localtime(bucket).date() if isinstance(bucket, datetime) else bucket: n
+              for bucket, n in counts.items() if bucket is not None}
+    return [counts.get(bucket, 0) for bucket in buckets]
+
+
+def report_data(period=DEFAULT_PERIOD, now=None):
+    """Everything the report shows for ``period``, as JSON-serialisable data"""
+    start, end, previous_start = period_bounds(period, now)
+
+    def window(queryset, field, since, until):
+        return queryset.filter(**{f'{field}__gte': since, f'{field}__lt': until})
+
+    requests = ServiceRequest.objects.all()
+    completed = requests.filter(status='completed')
+    attended = WorkshopRegistration.objects.filter(status='attended')
+    metrics = []
+    for label, queryset, field in (
+        ('New clients', Customer.objects.all(), 'registration_date'),
+        ('Service requests', requests, 'created_at'),
+        ('Completed services', completed, 'completed_at'),
+        ('Workshop attendance', attended, 'attended_at'),
+    ):
+        current = window(queryset, field, start, end).count()
+        previous = window(queryset, field, previous_start, start).count()
+        metrics.append({'label': label, 'value': current, 'previous': previous, 'change': _change(current, previous)})
+
+    in_period = window(requests, 'created_at', start, end)
+    top_services = (
+        ResearchService.objects.filter(service_requests__in=in_period)
+        .annotate(request_count=Count('service_requests')).order_by('-request_count', 'name')[:5]
+    )
+    statuses = dict(in_period.values('status').annotate(n=Count('id')).values_list('status', 'n'))
+    segments = dict(Customer.objects.values('customer_type').annotate(n=Count('id')).values_list('customer_type', 'n'))
+
+    # Daily buckets for the current month, monthly ones otherwise
+    if PERIODS[period][1] == 0:
+        trunc = TruncDay
+        buckets = [start.date() + timedelta(days=i) for i in range((end.date() - start.date()).days + 1)]
+        labels = [f'{day.day}' for day in buckets]
+    else:
+        trunc = TruncMonth
+        buckets = [_months_back(end.date().replace(day=1), n) for n in reversed(range(PERIODS[period][1]))]
+        labels = [f'{calendar.month_abbr[day.month]} {day:%y}' for day in buckets]
+
+    return {
+        'period': period,
+        'label': PERIODS[period][0],
+        'start': start.date().isoformat(),
+        'end': end.date().isoformat(),
+        'metrics': metrics,
+        'totals': {
+            'clients': Customer.objects.count(),
+            'service_requests': requests.count(),
+            'completed_services': completed.count(),
+            'workshop_attendees': attended.count(),
+        },
+        'top_services': [[service.name, service.request_count] for service in top_services],
+        'statuses': [[label, statuses.get(value, 0)] for value, label in ServiceRequest.STATUS_CHOICES],
+        'segments': [[label, segments.get(value, 0)] for value, label in Customer.CUSTOMER_TYPE_CHOICES],
+        'series': {
+            'labels': labels,
+            'requests': _series(in_period, 'created_at', trunc, buckets),
+            'completed': _series(window(completed, 'completed_at', start, end), 'completed_at', trunc, buckets),
+            'clients': _series(window(Customer.objects.all(), 'registration_date', start, end),
+                               'registration_date', trunc, buckets),
+        },
+    }
+
+
+def report_key(data):
+    """``<period>-<data version>``"""
+    version = hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return f"{data['period']}-{version}"
+
+
+def _valid_key(key):
+    period, _, version = key.partition('-')
+    return period in PERIODS and len(version) == 16 and all(c in '0123456789abcdef' for c in version)
+
+
+def report_path(key):
+    if not _valid_key(key):
+        raise ValueError(f'Invalid report key: {key!r}')
+    return Path(getattr(settings, 'REPORT_PDF_DIR', settings.BASE_DIR / 'build' / 'reports')) / f'report-{key}.pdf'
+
+
+# ============================================================================
+# QUEUE
+# ============================================================================
+
+def request_report(period=DEFAULT_PERIOD):
+    """Queue the PDF of ``period``'s current data; returns ``(key, status)``"""
+    data = report_data(period)
+    key = report_key(data)
+    if report_path(key).exists():
+        return key, READY
+    entry = spool.status(key)
+    if entry is not None and entry[0] >= spool.max_attempts:
+        # Asked again after giving up: start over
+        spool.ack([key])
+    spool.enqueue(key, json.dumps(data).encode('utf-8'))
+    if not getattr(settings, 'REPORT_PDF_BACKGROUND', True):
+        process_queue(keys=[key])
+    return key, report_status(key)[0]
+
+
+def report_status(key):
+    """``(status, error)`` of a report; status is None for unknown keys"""
+    if report_path(key).exists():
+        return READY, ''
+    entry = spool.status(key)
+    if entry is None:
+        return None, ''
+    attempts, error = entry
+    return (FAILED if attempts >= spool.max_attempts else QUEUED), error
+
+
+def process_queue(batch_size=5, keys=None):
+    """Render queued reports; returns the number rendered"""
+    done = 0
+    for key, payload in spool.fetch(batch_size, keys=keys):
+        try:
+            path = report_path(key)
+            if not path.exists():
+                render_pdf(json.loads(payload), path)
+                _prune(key)
+            spool.ack([key])
+            done += 1
+        except Exception as e:
+            logger.exception('Rendering report %s failed', key)
+            spool.fail(key, e)
+    return done
+
+
+def _prune(key):
+    period = key.partition('-')[0]
+    pdfs = sorted(report_path(key).parent.glob(f'report-{period}-*.pdf'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in pdfs[KEEP_PER_PERIOD:]:
+        old.unlink(missing_ok=True)
+
+
+# ============================================================================
+# PDF
+# ============================================================================
+
+PRIMARY = '#1a3a52'
+ACCENT = '#f39c12'
+SUCCESS = '#27ae60'
+DANGER = '#e74c3c'
+
+
+def _bar_chart(labels, series, colors, width, height):
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.charts.legends import Legend
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib.colors import HexColor
+
+    drawing = Drawing(width, height)
+    chart = VerticalBarChart()
+    chart.x, chart.y, chart.width, chart.height = 30, 35, width - 40, height - 60
+    chart.data = [values for _, values in series]
+    chart.categoryAxis.categoryNames = labels
+    chart.categoryAxis.labels.fontSize = 6 if len(labels) > 12 else 8
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 8
+    chart.barSpacing = 1
+    for index, color in enumerate(colors):
+        chart.bars[index].fillColor = HexColor(color)
+        chart.bars[index].strokeColor = None
+    drawing.add(chart)
+
+    legend = Legend()
+    legend.x, legend.y = 30, height - 8
+    legend.columnMaximum = 1
+    legend.fontSize = 8
+    legend.alignment = 'right'
+    legend.colorNamePairs = [(HexColor(color), name) for (name, _), color in zip(series, colors)]
+    drawing.add(legend)
+    return drawing
+
+
+def _pie_chart(pairs, colors, width, height):
+    from reportlab.graphics.charts.piecharts import Pie
+    from reportlab.graphics.shapes import Drawing, String
+    from reportlab.lib.colors import HexColor
+
+    drawing = Drawing(width, height)
+    if not any(value for _, value in pairs):
+        drawing.add(String(width / 2, height / 2, 'No data', textAnchor='middle', fontSize=9))
+        return drawing
+    pie = Pie()
+    pie.width = pie.height = min(width, height) - 30
+    pie.x, pie.y = (width - pie.width) / 2, 15
+    pie.data = [value for _, value in pairs]
+    pie.labels = [f'{label} ({value})' if value else '' for label, value in pairs]
+    pie.sideLabels = True
+    pie.slices.strokeWidth = 0.5
+    pie.slices.fontSize = 8
+    for index, color in enumerate(colors):
+        pie.slices[index].fillColor = HexColor(color)
+    drawing.add(pie)
+    return drawing
+
+
+def _table(rows, widths, header=True):
+    from reportlab.lib.colors import HexColor
+    from reportlab.platypus import Table, TableStyle
+
+    table = Table(rows, colWidths=widths)
+    style = [
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('LINEBELOW', (0, 0), (-1, -1), 0.25, HexColor('#dddddd')),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+    ]
+    if header:
+        style += [
+            ('BACKGROUND', (0, 0), (-1, 0), HexColor(PRIMARY)),
+            ('TEXTCOLOR', (0, 0), (-1, 0), HexColor('#ffffff')),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ]
+    table.setStyle(TableStyle(style))
+    return table
+
+
+def render_pdf(data, path):
+    """Write the report for ``data`` (from ``report_data``) to ``path``"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    styles = getSampleStyleSheet()
+    width = A4[0] - 36 * mm
+    story = [
+        Paragraph('Reports &amp; Analytics', styles['Title']),
+        Paragraph(f"{data['label']}: {data['start']} to {data['end']}", styles['Normal']),
+        Spacer(1, 6 * mm),
+        Paragraph('Key metrics', styles['Heading2']),
+        _table(
+            [['', 'This period', 'Previous period', 'Change']] + [
+                [metric['label'], metric['value'], metric['previous'], f"{metric['change']:+.1f}%"]
+                for metric in data['metrics']
+            ],
+            [width * 0.4, width * 0.2, width * 0.2, width * 0.2],
+        ),
+        Spacer(1, 6 * mm),
+        Paragraph('Activity', styles['Heading2']),
+        _bar_chart(
+            data['series']['labels'],
+            [('Requests', data['series']['requests']), ('Completed', data['series']['completed']),
+             ('New clients', data['series']['clients'])],
+            [PRIMARY, SUCCESS, ACCENT], width, 70 * mm,
+        ),
+        Spacer(1, 4 * mm),
+        Paragraph('Request status (requests created in this period)', styles['Heading2']),
+        _pie_chart(data['statuses'], [ACCENT, '#3498db', '#17a2b8', SUCCESS, DANGER], width / 2, 55 * mm),
+        Paragraph('Top services', styles['Heading2']),
+        _table([['Service', 'Requests']] + (data['top_services'] or [['No requests in this period', '']]),
+               [width * 0.8, width * 0.2]),
+        Spacer(1, 4 * mm),
+        Paragraph('Customer segments (all clients)', styles['Heading2']),
+        _pie_chart(data['segments'], [PRIMARY, ACCENT], width / 2, 50 * mm),
+        Paragraph('All-time totals', styles['Heading2']),
+        _table(
+            [['Clients', data['totals']['clients']],
+             ['Service requests', data['totals']['service_requests']],
+             ['Completed services', data['totals']['completed_services']],
+             ['Workshop attendees', data['totals']['workshop_attendees']]],
+            [width * 0.8, width * 0.2], header=False,
+        ),
+    ]
+
+    generated = timezone.localtime().strftime('%Y-%m-%d %H:%M')
+
+    def footer(canvas, doc):
+        canvas.saveState()
+        canvas.setFont('Helvetica', 8)
+        canvas.drawString(18 * mm, 10 * mm, f'Generated {generated}')
+        canvas.drawRightString(A4[0] - 18 * mm, 10 * mm, f'Page {doc.page}')
+        canvas.restoreState()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(f'.{os.getpid()}.part')
+    SimpleDocTemplate(
+        str(partial), pagesize=A4, title='Reports & Analytics',
+        leftMargin=18 * mm, rightMargin=18 * mm, topMargin=18 * mm, bottomMargin=18 * mm,
+    ).build(story, onFirstPage=footer, onLaterPages=footer)
+    os.replace(partial, path)
+    return path
@@ -0,0 +1,143 @@
+"""Background jobs run by ``manage.py runapscheduler``"""
+import logging
+
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from django_apscheduler import util
+from django_apscheduler.models import DjangoJobExecution
+
+logger = logging.getLogger(__name__)
+
+
+@util.close_old_connections
+def workshop_reminders_job():
+    from .reminders import send_workshop_reminders
+    created = send_workshop_reminders()
+    if created:
+        logger.info('Created %d workshop reminder notifications', created)
+
+
+@util.close_old_connections
+def drain_intake_job():
+    from .intake import drain
+    while drain():
+        pass
+
+
+@util.close_old_connections
+def send_mail_job():
+    from .mail import build_email_templates, send_queued_mail
+    # Rebuilds only templates whose sources changed since the last build
+    try:
+        build_email_templates()
+    except Exception:
+        logger.exception('Could not build email templates')
+    while send_queued_mail():
+        pass
+
+
+@util.close_old_connections
+def image_derivatives_job():
+    from .images import process_queue
+    while process_queue():
+        pass
+
+
+@util.close_old_connections
+def report_pdfs_job():
+    from .reports import process_queue
+    while process_queue():
+        pass
+
+
+@util.close_old_connections
+def attachment_analysis_job():
+    from .attachments import process_queue
+    while process_queue():
+        pass
+
+
+@util.close_old_connections
+def attachment_ocr_job():
+    from .ocr import process_queue
+    while process_queue():
+        pass
+
+
+@util.close_old_connections
+def delete_stale_uploads_job():
+    from .attachments import delete_stale_uploads
+    removed = delete_stale_uploads()
+    if removed:
+        logger.info('Deleted %d stale attachment uploads', removed)
+
+
+@util.close_old_connections
+def delete_old_job_executions(max_age=7 * 24 * 60 * 60):
+    DjangoJobExecution.objects.delete_old_job_executions(max_age)
+
+
+def register_jobs(scheduler):
+    scheduler.add_job(
+        workshop_reminders_job,
+        trigger=IntervalTrigger(minutes=5),
+        id='workshop_reminders',
+        max_instances=1,
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        drain_intake_job,
+        trigger=IntervalTrigger(seconds=10),
+        id='drain_intake',
+        max_instances=1,
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        send_mail_job,
+        trigger=IntervalTrigger(seconds=30),
+        id='send_queued_mail',
+        max_instances=1,
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        image_derivatives_job,
+        trigger=IntervalTrigger(seconds=15),
+        id='image_derivatives',
+        max_instances=1,
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        report_pdfs_job,
+        trigger=IntervalTrigger(seconds=5),
+        id='report_pdfs',
+        max_instances=1,
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        attachment_analysis_job,
+        trigger=IntervalTrigger(seconds=10),
+        id='attachment_analysis',
+        max_instances=1,
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        attachment_ocr_job,
+        trigger=IntervalTrigger(seconds=30),
+        id='attachment_ocr',
+        max_instances=1,
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        delete_stale_uploads_job,
+        trigger=IntervalTrigger(hours=1),
+        id='delete_stale_uploads',
+        max_instances=1,
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        delete_old_job_executions,
+        trigger=CronTrigger(day_of_week='mon', hour='00', minute='00'),
+        id='delete_old_job_executions',
+        max_instances=1,
+        replace_existing=True,
+    )
@@ -0,0 +1,64 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .availability import availability_index
+from .images import IMAGE_FIELDS, delete_derivatives, get_manifest, schedule_derivatives
+from .models import (
+    Customer, ResearchService, WorkshopRegistration,
+    ServiceImage, Leadership, UserProfile, TutorialVideo,
+)
+from .payload_cache import bump_catalog_version
+from .workshops import SEAT_HOLDING_STATUSES, sync_seats
+
+
+@receiver(post_save, sender=ResearchService)
+@receiver(post_delete, sender=ResearchService)
+def invalidate_catalog_payloads(sender, **kwargs):
+    """Drop precomputed catalog API payloads when a service changes"""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=User)
+def track_taken_username(sender, instance, **kwargs):
+    """Keep the availability filters in step with new/renamed users"""
+    availability_index.add_username(instance.username)
+    availability_index.add_email(instance.email)
+
+
+@receiver(post_save, sender=Customer)
+def track_taken_customer_email(sender, instance, **kwargs):
+    availability_index.add_email(instance.email)
+
+
+@receiver(post_delete, sender=WorkshopRegistration)
+def release_deleted_registration_seat(sender, instance, **kwargs):
+    """Recount seats when a seat-holding registration is deleted (e.g. with its customer)"""
+    if instance.status in SEAT_HOLDING_STATUSES:
+        # No waitlist promotion here: the workshop itself may be mid-delete
+        sync_seats([instance.workshop_id], promote=False)
+
+
+_IMAGE_FIELD_NAMES = dict(IMAGE_FIELDS)
+
+
+@receiver(post_save, sender=ServiceImage)
+@receiver(post_save, sender=Leadership)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=TutorialVideo)
+def queue_image_derivatives(sender, instance, **kwargs):
+    """Generate resized variants of a new upload off the request path"""
+    name = getattr(instance, _IMAGE_FIELD_NAMES[sender.__name__]).name
+    if name and get_manifest(name) is None:
+        schedule_derivatives(name)
+
+
+@receiver(post_delete, sender=ServiceImage)
+@receiver(post_delete, sender=Leadership)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_delete, sender=TutorialVideo)
+def remove_image_derivatives(sender, instance, **kwargs):
+    name = getattr(instance, _IMAGE_FIELD_NAMES[sender.__name__]).name
+    if name:
+        transaction.on_commit(lambda: delete_derivatives(name))
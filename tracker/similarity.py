@@ -0,0 +1,274 @@
+"""Near-duplicate detection for attachment texts (MinHash + LSH).
+
+A document's text is cut into overlapping word shingles
+(``SIMILARITY_SHINGLE_SIZE`` words) and summarized by a MinHash signature of
+``SIMILARITY_PERMUTATIONS`` 32-bit values, computed with numpy a block of
+shingles at a time. The share of equal values between two signatures
+estimates the Jaccard similarity of their shingle sets.
+
+Signatures are appended to a flat binary file of fixed-size records
+(attachment id + signature, about 520 bytes a document) as each attachment's
+text becomes final. Every process keeps the records in memory and only reads
+the bytes appended since its last query. A re-indexed attachment's newer
+record replaces the old one; ``manage.py similarity_index --rebuild``
+rewrites the file without stale or deleted entries.
+
+Queries use LSH banding: the signature is split into ``SIMILARITY_BANDS``
+bands, each reduced to one 64-bit key, and only documents that agree with the
+query on a whole band are scored. Finding them is a single vectorized
+comparison of the key matrix, and it reliably catches pairs above roughly
+(1/bands)^(1/rows) similarity.
+"""
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Fixed so signatures stay comparable across processes and restarts
+SEED = 20240601
+# Shingles hashed at a time, bounding memory to BLOCK x permutations values
+BLOCK = 4096
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def _shingle_size():
+    return getattr(settings, 'SIMILARITY_SHINGLE_SIZE', 5)
+
+
+def _permutations():
+    return getattr(settings, 'SIMILARITY_PERMUTATIONS', 128)
+
+
+def _bands():
+    return getattr(settings, 'SIMILARITY_BANDS', 64)
+
+
+def index_path():
+    directory = Path(getattr(settings, 'SIMILARITY_INDEX_DIR', settings.BASE_DIR / 'similarity'))
+    # Signatures made with other parameters are not comparable, so they get their own file
+    return directory / f'minhash-{_permutations()}x{_shingle_size()}.bin'
+
+
+# ============================================================================
+# SIGNATURES
+# ============================================================================
+
+def _record_dtype():
+    import numpy as np
+
+    return np.dtype([('id', '<i8'), ('signature', '<u4', (_permutations(),))])
+
+
+def _hash_functions():
+    import numpy as np
+
+    rng = np.random.default_rng(SEED)
+    maximum = np.iinfo(np.uint64).max
+    # Multiply-shift hashing: odd multipliers, top 32 bits of the product
+    a = rng.integers(1, maximum, _permutations(), dtype=np.uint64, endpoint=True) | np.uint64(1)
+    b = rng.integers(0, maximum, _permutations(), dtype=np.uint64, endpoint=True)
+    return a, b
+
+
+def shingles(text):
+    """32-bit hashes of the distinct word shingles of ``text``"""
+    import numpy as np
+
+    words = _TOKEN_RE.findall(text.lower())
+    size = _shingle_size()
+    if len(words) < size:
+        return np.empty(0, dtype=np.uint64)
+
+    vocabulary, positions = np.unique(np.array(words), return_inverse=True)
+    ids = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in vocabulary), np.uint64, len(vocabulary))[positions]
+    count = len(words) - size + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * np.uint64(1000003) + ids[offset:offset + count]
+    return np.unique((hashes ^ (hashes >> np.uint64(32))) & np.uint64(0xFFFFFFFF))
+
+
+def signature(text):
+    """MinHash signature of ``text``, or None if it is shorter than a shingle"""
+    import numpy as np
+
+    values = shingles(text)
+    if not len(values):
+        return None
+    a, b = _hash_functions()
+    result = np.full(_permutations(), np.iinfo(np.uint32).max, dtype=np.uint64)
+    for start in range(0, len(values), BLOCK):
+        block = values[start:start + BLOCK, None]
+        np.minimum(result, ((block * a + b) >> np.uint64(32)).min(axis=0), out=result)
+    return result.astype(np.uint32)
+
+
+def _band_keys(signatures):
+    """One 64-bit key per band of each signature (``(n, bands)``)"""
+    import numpy as np
+
+    bands = _bands()
+    rows = signatures.reshape(len(signatures), bands, -1).astype(np.uint64)
+    multipliers = np.uint64(0x9E3779B97F4A7C15) ** np.arange(1, rows.shape[2] + 1, dtype=np.uint64)
+    return (rows * multipliers).sum(axis=2, dtype=np.uint64)
+
+
+# ============================================================================
+# INDEX
+# ============================================================================
+
+class _Index:
+    """In-memory copy of the index file, refreshed with what was appended since"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path = None
+        self.inode = None
+        # Loaded on the first query, so importing this module stays cheap
+        self.ids = None
+
+    def reset(self):
+        import numpy as np
+
+        self.offset = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.signatures = np.empty((0, _permutations()), dtype=np.uint32)
+        self.keys = np.empty((0, _bands()), dtype=np.uint64)
+        self.live = np.empty(0, dtype=bool)
+        self.rows = {}
+
+    def refresh(self):
+        import numpy as np
+
+        path = index_path()
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self.reset()
+            return
+        if self.ids is None or path != self.path or stat.st_ino != self.inode or stat.st_size < self.offset:
+            # Rebuilt (or first use): read it all again
+            self.reset()
+            self.path, self.inode = path, stat.st_ino
+
+        dtype = _record_dtype()
+        count = (stat.st_size - self.offset) // dtype.itemsize
+        if not count:
+            return
+        records = np.fromfile(path, dtype=dtype, count=count, offset=self.offset)
+        self.offset += count * dtype.itemsize
+
+        first = len(self.ids)
+        self.ids = np.concatenate([self.ids, records['id']])
+        self.signatures = np.concatenate([self.signatures, records['signature']])
+        self.keys = np.concatenate([self.keys, _band_keys(records['signature'])])
+        self.live = np.concatenate([self.live, np.ones(count, dtype=bool)])
+        for row, attachment_id in enumerate(records['id'].tolist(), start=first):
+            previous = self.rows.get(attachment_id)
+            if previous is not None:
+                self.live[previous] = False
+            self.rows[attachment_id] = row
+
+    def query(self, query, limit, min_score, exclude=None):
+        import numpy as np
+
+        with self.lock:
+            self.refresh()
+            candidates = np.flatnonzero(
+                self.live & (self.keys == _band_keys(query[None, :])).any(axis=1)
+            )
+            if exclude is not None:
+                candidates = candidates[self.ids[candidates] != exclude]
+            scores = (self.signatures[candidates] == query).mean(axis=1)
+            order = np.argsort(-scores, kind='stable')[:limit]
+            return [
+                (int(self.ids[candidates[i]]), float(scores[i]))
+                for i in order if scores[i] >= min_score
+            ]
+
+
+_index = _Index()
+
+
+def _append(records):
+    path = index_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'ab') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(records.tobytes())
+
+
+def add(attachment):
+    """Index the extracted text of ``attachment``; returns False if it is too short"""
+    import numpy as np
+
+    values = signature(attachment.extracted_text)
+    if values is None:
+        return False
+    record = np.zeros(1, dtype=_record_dtype())
+    record['id'], record['signature'] = attachment.pk, values
+    _append(record)
+    return True
+
+
+def similar(attachment, limit=5, min_score=None):
+    """``[(attachment id, estimated similarity)]`` of the documents most like
+    ``attachment``, best first
+    """
+    if min_score is None:
+        min_score = getattr(settings, 'SIMILARITY_MIN_SCORE', 0.2)
+    values = signature(attachment.extracted_text)
+    if values is None:
+        return []
+    return _index.query(values, limit, min_score, exclude=attachment.pk)
+
+
+def similar_attachments(attachment, limit=5):
+    """``[(RequestAttachment, estimated similarity)]`` for ``similar()``"""
+    from .models import RequestAttachment
+
+    matches = similar(attachment, limit)
+    found = RequestAttachment.objects.select_related('service_request__customer').in_bulk(
+        [attachment_id for attachment_id, _ in matches]
+    )
+    # Entries of deleted attachments stay in the file until the next rebuild
+    return [(found[attachment_id], score) for attachment_id, score in matches if attachment_id in found]
+
+
+def rebuild():
+    """Rewrite the index from every analyzed attachment; returns the number indexed"""
+    import numpy as np
+
+    from .models import RequestAttachment
+
+    path = index_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix('.part')
+    indexed = 0
+    with open(partial, 'wb') as f:
+        rows = (
+            RequestAttachment.objects.filter(status='complete', analyzed_at__isnull=False)
+            .exclude(extracted_text='').values_list('pk', 'extracted_text')
+        )
+        for attachment_id, text in rows.iterator(chunk_size=200):
+            values = signature(text)
+            if values is None:
+                continue
+            record = np.zeros(1, dtype=_record_dtype())
+            record['id'], record['signature'] = attachment_id, values
+            f.write(record.tobytes())
+            indexed += 1
+    # A new inode makes every process reload. Documents added to the old file
+    # while this ran are picked up by the next rebuild.
+    os.replace(partial, path)
+    return indexed
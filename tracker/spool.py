@@ -0,0 +1,127 @@
+"""Durable local work queues backed by SQLite files.
+
+Used for work that should be acknowledged on the request thread and done later
+by a worker (intake submissions, outbound mail). Each spool is a separate SQLite
+file in WAL mode, so enqueueing never contends with the main database.
+"""
+import sqlite3
+import threading
+import time
+
+
+class SQLiteSpool:
+    """Append-only queue of ``(key, payload bytes)`` entries with retry backoff"""
+
+    def __init__(self, path, table='spool', max_attempts=5, backoff=30):
+        self.path = str(path)
+        self.table = table
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'path', None) != self.path:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                ' key TEXT PRIMARY KEY,'
+                ' payload BLOB NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' next_attempt_at REAL NOT NULL DEFAULT 0,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' last_error TEXT NOT NULL DEFAULT \'\''
+                ')'
+            )
+            self._local.conn, self._local.path = conn, self.path
+        return conn
+
+    def enqueue(self, key, payload):
+        """Append an entry; returns False if ``key`` is already spooled"""
+        cursor = self._connection().execute(
+            f'INSERT OR IGNORE INTO {self.table} (key, payload, created_at) VALUES (?, ?, ?)',
+            (key, payload, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def fetch(self, limit, keys=None):
+        """Oldest entries that are due for an attempt, or exactly ``keys``"""
+        if keys is not None:
+            placeholders = ','.join('?' * len(keys))
+            rows = self._connection().execute(
+                f'SELECT key, payload FROM {self.table} WHERE key IN ({placeholders})', list(keys),
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                f'SELECT key, payload FROM {self.table} '
+                'WHERE attempts < ? AND next_attempt_at <= ? ORDER BY created_at LIMIT ?',
+                (self.max_attempts, time.time(), limit),
+            ).fetchall()
+        return rows
+
+    def claim(self, limit, lease, keys=None):
+        """Like ``fetch``, but hide the returned entries from other claimers for
+        ``lease`` seconds, so concurrent workers never take the same entry.
+
+        An entry that is neither acked nor failed within the lease (its worker
+        died) becomes due again.
+        """
+        conn = self._connection()
+        now = time.time()
+        query = (
+            f'SELECT key, payload FROM {self.table} '
+            'WHERE attempts < ? AND next_attempt_at <= ?'
+        )
+        params = [self.max_attempts, now]
+        if keys is not None:
+            query += f' AND key IN ({",".join("?" * len(keys))})'
+            params.extend(keys)
+        query += ' ORDER BY created_at LIMIT ?'
+        params.append(limit)
+
+        # Take the write lock before reading, so no other claimer can read the
+        # same entries in between
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(query, params).fetchall()
+            conn.executemany(
+                f'UPDATE {self.table} SET next_attempt_at = ? WHERE key = ?',
+                [(now + lease, key) for key, _ in rows],
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return rows
+
+    def ack(self, keys):
+        if keys:
+            self._connection().executemany(
+                f'DELETE FROM {self.table} WHERE key = ?', [(k,) for k in keys]
+            )
+
+    def fail(self, key, error):
+        """Record a failed attempt and push the entry back exponentially"""
+        row = self._connection().execute(
+            f'SELECT attempts FROM {self.table} WHERE key = ?', (key,)
+        ).fetchone()
+        attempts = (row[0] if row else 0) + 1
+        self._connection().execute(
+            f'UPDATE {self.table} SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE key = ?',
+            (attempts, time.time() + self.backoff * 2 ** (attempts - 1), str(error)[:1000], key),
+        )
+
+    def status(self, key):
+        """``(attempts, last_error)`` of a spooled entry, or None if it isn't spooled"""
+        return self._connection().execute(
+            f'SELECT attempts, last_error FROM {self.table} WHERE key = ?', (key,)
+        ).fetchone()
+
+    def stats(self):
+        pending, dead = self._connection().execute(
+            f'SELECT COALESCE(SUM(attempts < ?), 0), COALESCE(SUM(attempts >= ?), 0) FROM {self.table}',
+            (self.max_attempts, self.max_attempts),
+        ).fetchone()
+        return {'pending': pending, 'dead': dead}
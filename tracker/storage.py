@@ -0,0 +1,195 @@
+"""Static file storage for ``collectstatic``.
+
+``MinifiedManifestStaticFilesStorage`` extends Django's manifest storage. The
+pipeline per deploy is:
+
+1. CSS is minified in place in ``STATIC_ROOT`` before hashing, so the content
+   hash reflects the bytes that are served.
+2. Django writes content-hashed copies (``style.3f2a91c0.css``), rewrites
+   ``url()`` references and records them in ``staticfiles.json``.
+3. Compressible files get ``.gz`` (and ``.br`` when ``brotli`` is installed)
+   siblings so the server can send them without compressing per request.
+
+Hashed names never change content, so they can be served with a far-future
+``Cache-Control: immutable`` header.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Text formats worth compressing; images and fonts like woff2 already are
+COMPRESS_EXTENSIONS = (
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.html', '.txt', '.xml',
+    '.ico', '.ttf', '.otf', '.eot',
+)
+MIN_COMPRESS_SIZE = 1024
+
+_WHITESPACE_AROUND_PUNCTUATION_RE = re.compile(r'\s*([{};])\s*')
+
+
+def minify_css(css):
+    """Conservative CSS minification using the css-html-js-minify passes.
+
+    The library's full ``css_minify`` also strips units from zeros (breaking
+    ``calc()`` and ``0s`` durations), unquotes urls containing spaces and glues
+    ``and (`` in media queries, so only the passes that are safe for arbitrary
+    vendor CSS are applied.
+    """
+    from css_html_js_minify.css_minifier import (
+        condense_semicolons, condense_whitespace, remove_comments, remove_unnecessary_semicolons,
+    )
+
+    css = remove_comments(css)
+    css = condense_whitespace(css)
+    css = _WHITESPACE_AROUND_PUNCTUATION_RE.sub(r'\1', css)
+    css = remove_unnecessary_semicolons(css)
+    css = condense_semicolons(css)
+    return css.strip()
+
+
+def _compressors():
+    """``(suffix, compress, decompress)`` for each available encoding"""
+    compressors = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0), gzip.decompress)]
+    if brotli is not None:
+        compressors.append(('.br', lambda data: brotli.compress(data, quality=11), brotli.decompress))
+    return compressors
+
+
+def _is_current(sibling, content, decompress):
+    # collectstatic re-saves post-processed files on every run, so compare
+    # contents rather than mtimes
+    try:
+        return decompress(sibling.read_bytes()) == content
+    except (OSError, ValueError, EOFError) + ((brotli.error,) if brotli else ()):
+        return False
+
+
+def _compress(content):
+    """``{suffix: bytes}`` for the encodings that are worth keeping"""
+    encoded = {}
+    for suffix, compress, _ in _compressors():
+        data = compress(content)
+        # Not worth a separate file (and a Vary round-trip) for a few bytes
+        if len(data) < len(content) * 0.95:
+            encoded[suffix] = data
+    return encoded
+
+
+def compress_files(paths, workers=1):
+    """Write ``.gz``/``.br`` siblings next to each of ``paths``.
+
+    Files whose siblings are already current are skipped, and identical
+    contents (a hashed copy and its original) are only compressed once. Returns the number
+    of files compressed.
+    """
+    compressors = _compressors()
+    suffixes = [suffix for suffix, _, _ in compressors]
+    by_content = {}
+    for path in map(Path, paths):
+        content = path.read_bytes()
+        if all(
+            _is_current(path.with_name(path.name + suffix), content, decompress)
+            for suffix, _, decompress in compressors
+        ):
+            continue
+        by_content.setdefault(hashlib.sha1(content).digest(), (content, []))[1].append(path)
+
+    groups = list(by_content.values())
+    # zlib and brotli release the GIL, so threads compress in parallel
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_compress, [content for content, _ in groups])
+        for (_, group_paths), encoded in zip(groups, results):
+            for path in group_paths:
+                for suffix in suffixes:
+                    target = path.with_name(path.name + suffix)
+                    if suffix in encoded:
+                        target.write_bytes(encoded[suffix])
+                    elif target.exists():
+                        target.unlink()
+    return sum(len(group_paths) for _, group_paths in groups)
+
+
+class MinifiedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also minifies CSS and precompresses text assets"""
+
+    # Templates keep working (unhashed URL) for files added after the last
+    # collectstatic instead of raising
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not collected yet (tests, or DEBUG off before collectstatic)
+            return name
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def tolerant_converter(matchobj):
+            # Vendor CSS/JS reference fonts, images and source maps that were
+            # never checked in; leave those references untouched
+            try:
+                return converter(matchobj)
+            except ValueError as e:
+                logger.debug('Not rewriting reference in %s: %s', name, e)
+                return matchobj.group(0)
+
+        return tolerant_converter
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+
+        for name in paths:
+            if name.endswith('.css') and not name.endswith('.min.css'):
+                self._minify(name)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        names = set(paths) | set(self.hashed_files.values())
+        candidates = [
+            self.path(name) for name in names
+            if name and name.endswith(COMPRESS_EXTENSIONS)
+        ]
+        candidates = [path for path in candidates if os.path.getsize(path) >= MIN_COMPRESS_SIZE]
+        workers = getattr(settings, 'STATIC_COMPRESS_WORKERS', None) or os.cpu_count() or 1
+        compressed = compress_files(candidates, workers=workers)
+        logger.info('Precompressed %d static files', compressed)
+
+    def _minify(self, name):
+        path = Path(self.path(name))
+        original = path.read_bytes()
+        digest = hashlib.sha1(original).hexdigest()
+        cache_dir = Path(getattr(settings, 'STATIC_BUILD_CACHE_DIR', settings.BASE_DIR / 'build' / 'static'))
+        cached = cache_dir / f'{digest}.css'
+
+        if cached.exists():
+            minified = cached.read_bytes()
+        else:
+            try:
+                minified = minify_css(original.decode('utf-8')).encode('utf-8')
+            except (UnicodeDecodeError, ValueError):
+                logger.warning('Could not minify %s; keeping it as is', name)
+                minified = original
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            cached.write_bytes(minified)
+            # The minified output of already-minified content is itself
+            (cache_dir / f'{hashlib.sha1(minified).hexdigest()}.css').write_bytes(minified)
+
+        if minified != original:
+            path.write_bytes(minified)
@@ -0,0 +1,102 @@
+"""Template compilation caching for both template engines.
+
+Django templates go through the cached loader in every environment, and the
+Jinja2 environment keeps compiled templates in memory without checking the
+files for changes. Neither re-reads or re-parses a template once it has been
+loaded.
+
+In development, ``runserver``'s autoreloader already resets Django's cached
+loader when a template changes; ``connect_dev_invalidation`` does the same for
+the Jinja2 templates.
+
+``precompile_templates`` loads every project template through its engine, so
+the parse/compile cost is paid when a worker starts rather than by the first
+requests after a deploy. The WSGI/ASGI entry points call it when
+``TEMPLATE_PRECOMPILE`` is on, and ``manage.py precompile_templates`` runs it
+by hand, which also reports syntax errors.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.jinja2 import Jinja2
+from django.utils.autoreload import autoreload_started, file_changed, is_django_path
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_SUFFIXES = ('.html', '.txt', '.xml')
+
+
+def template_dirs(backend):
+    """Project (non-Django) template directories searched by a backend"""
+    if isinstance(backend, DjangoTemplates):
+        dirs = list(backend.engine.dirs)
+        for loader in backend.engine.template_loaders:
+            if hasattr(loader, 'get_dirs'):
+                dirs.extend(loader.get_dirs())
+    else:
+        dirs = list(backend.template_dirs)
+    return [Path(d) for d in dict.fromkeys(dirs) if d and not is_django_path(d) and Path(d).is_dir()]
+
+
+def template_names(backend):
+    names = set()
+    for directory in template_dirs(backend):
+        for path in directory.rglob('*'):
+            if path.is_file() and path.suffix in TEMPLATE_SUFFIXES:
+                names.add(path.relative_to(directory).as_posix())
+    return sorted(names)
+
+
+def precompile_templates():
+    """Load every project template into its engine's cache.
+
+    Returns ``{engine alias: (templates compiled, [(name, error)], seconds)}``.
+    """
+    results = {}
+    for backend in engines.all():
+        started = time.perf_counter()
+        compiled, errors = 0, []
+        for name in template_names(backend):
+            try:
+                backend.get_template(name)
+                compiled += 1
+            except (TemplateSyntaxError, TemplateDoesNotExist) as e:
+                errors.append((name, e))
+                logger.warning('Could not precompile %s template %s: %s', backend.name, name, e)
+        results[backend.name] = (compiled, errors, time.perf_counter() - started)
+    return results
+
+
+# ============================================================================
+# DEVELOPMENT INVALIDATION
+# ============================================================================
+
+def _jinja2_backends():
+    return [backend for backend in engines.all() if isinstance(backend, Jinja2)]
+
+
+def _watch_jinja2_templates(sender, **kwargs):
+    for backend in _jinja2_backends():
+        for directory in template_dirs(backend):
+            sender.watch_dir(directory, '**/*')
+
+
+def _jinja2_template_changed(sender, file_path, **kwargs):
+    if file_path.suffix == '.py':
+        return None
+    for backend in _jinja2_backends():
+        if any(directory in file_path.parents for directory in template_dirs(backend)):
+            if backend.env.cache is not None:
+                backend.env.cache.clear()
+            # Handled; no need to restart the server
+            return True
+    return None
+
+
+def connect_dev_invalidation():
+    """Clear the Jinja2 template cache when ``runserver`` sees a template change"""
+    autoreload_started.connect(_watch_jinja2_templates, dispatch_uid='jinja2_templates_watch_changes')
+    file_changed.connect(_jinja2_template_changed, dispatch_uid='jinja2_templates_file_changed')
@@ -0,0 +1,89 @@
+import json
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from tracker.critical_css import build_dir
+
+register = template.Library()
+
+_available = {}
+_critical = {}
+
+
+def bundle_available(group):
+    """Whether ``manage.py purge_css`` has built (and, outside DEBUG, collected) the bundle"""
+    path = f'bundles/{group}.css'
+    if settings.DEBUG:
+        return finders.find(path) is not None
+    if path not in _available:
+        _available[path] = staticfiles_storage.exists(path)
+    return _available[path]
+
+
+def critical_css_for(page):
+    """``(css, deferred hrefs)`` built by ``manage.py build_critical_css`` for a page"""
+    if settings.DEBUG or '__manifest__' not in _critical:
+        try:
+            manifest = json.loads((build_dir() / 'manifest.json').read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            manifest = {}
+        _critical.clear()
+        _critical['__manifest__'] = manifest
+
+    if page not in _critical:
+        entry = _critical['__manifest__'].get(page)
+        css = None
+        if entry:
+            try:
+                css = (build_dir() / entry['css']).read_text(encoding='utf-8')
+            except OSError:
+                css = None
+        _critical[page] = (css, frozenset(entry['deferred'])) if css else (None, frozenset())
+    return _critical[page]
+
+
+def _page(context):
+    request = context.get('request')
+    match = getattr(request, 'resolver_match', None)
+    return match.url_name if match else None
+
+
+def _stylesheet_link(context, href):
+    _, deferred = critical_css_for(_page(context))
+    if href not in deferred:
+        return format_html('<link href="{}" rel="stylesheet">', href)
+    # The critical rules are inlined, so the full sheet can load without
+    # blocking first paint
+    return format_html(
+        '<link href="{0}" rel="preload" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+        '<noscript><link href="{0}" rel="stylesheet"></noscript>',
+        href,
+    )
+
+
+@register.simple_tag(takes_context=True)
+def critical_css(context):
+    """Inline <style> with the page's above-the-fold rules, if they were built"""
+    css, _ = critical_css_for(_page(context))
+    if not css:
+        return ''
+    return format_html('<style>{}</style>', mark_safe(css.replace('</', '<\\/')))
+
+
+@register.simple_tag(takes_context=True)
+def stylesheet(context, href):
+    """Stylesheet link, loaded asynchronously when the page has critical CSS"""
+    return _stylesheet_link(context, href)
+
+
+@register.simple_tag(takes_context=True)
+def css_bundle(context, group, fallback_href):
+    """Stylesheet link to the purged bundle for ``group``, or ``fallback_href``"""
+    href = static(f'bundles/{group}.css') if bundle_available(group) else fallback_href
+    return _stylesheet_link(context, href)
@@ -1,5 +1,7 @@
 from django import template
 
+from tracker import images
+
 register = template.Library()
 
 
@@ -9,3 +11,35 @@ def get_item(dictionary, key):
     if isinstance(dictionary, dict):
         return dictionary.get(key)
     return None
+
+
+def _file_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+@register.filter
+def srcset(image, fmt='jpeg'):
+    """srcset of an image field's resized variants ('' until generated)"""
+    return images.srcset(_file_name(image), fmt)
+
+
+@register.filter
+def image_url(image, width):
+    """URL of an image field's variant closest to ``width`` pixels"""
+    return images.image_url(_file_name(image), int(width))
+
+
+@register.inclusion_tag('components/responsive_image.html')
+def responsive_image(image, alt='', sizes='100vw', width=640, css_class='', style='', **attrs):
+    """<picture> with WebP and JPEG srcsets, or a plain <img> before variants exist"""
+    name = _file_name(image)
+    return {
+        'src': images.image_url(name, int(width)),
+        'webp_srcset': images.srcset(name, 'webp'),
+        'jpeg_srcset': images.srcset(name, 'jpeg'),
+        'alt': alt,
+        'sizes': sizes,
+        'css_class': css_class,
+        'style': style,
+        'attrs': [(key.replace('_', '-'), value) for key, value in attrs.items()],
+    }
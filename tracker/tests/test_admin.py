@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from tracker.forms import AdminUserChangeForm, CustomUserCreationForm
+from tracker.models import (
+    ClientTestimonial, CompanyProfile, ConsultancySubService, Customer, Leadership, Notification,
+    ResearchService, ServiceFAQ, ServiceImage, ServiceRequest, TutorialVideo, UserProfile, Workshop,
+    WorkshopRegistration, WorkshopWaitlistEntry,
+)
+
+
+class ChangelistQueryCountTests(TestCase):
+    """Every tracker changelist runs the same number of queries however many rows it shows"""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin_user)
+        CompanyProfile.objects.create()
+        self.created = 0
+
+    def add_rows(self, count):
+        """``count`` more rows for every model, each with its related rows"""
+        for _ in range(count):
+            n = self.created = self.created + 1
+            user = User.objects.create_user(f'user{n}', f'user{n}@example.com', 'pw')
+            customer = Customer.objects.create(full_name=f'Customer {n}', email=f'customer{n}@example.com', user=user)
+            service = ResearchService.objects.create(name=f'Service {n}', category='thesis', description='Service')
+            workshop = Workshop.objects.create(
+                title=f'Workshop {n}', description='Workshop', date=timezone.now() + timedelta(days=n),
+                max_participants=10, facilitator=self.admin_user,
+            )
+            ConsultancySubService.objects.create(name=f'Consultancy {n}', consultancy_type='research', description='Help')
+            ServiceRequest.objects.create(
+                customer=customer, service=service, title=f'Request {n}', description='Details',
+                assigned_to=self.admin_user,
+            )
+            WorkshopRegistration.objects.create(workshop=workshop, customer=customer)
+            WorkshopWaitlistEntry.objects.create(workshop=workshop, customer=customer)
+            ClientTestimonial.objects.create(customer=customer, service=service, quote='Great')
+            UserProfile.objects.get_or_create(user=user)
+            Notification.objects.create(user=user, title='Update', message='Message')
+            Leadership.objects.create(name=f'Leader {n}', title='Director')
+            ServiceImage.objects.create(service=service, title='Image', image='services/image.png')
+            TutorialVideo.objects.create(service=service, title='Video', video_url='https://example.com/video')
+            ServiceFAQ.objects.create(service=service, question='Question?', answer='Answer')
+
+    def changelist_urls(self):
+        return {
+            model: reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+            for model in admin.site._registry if model._meta.app_label == 'tracker'
+        }
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        urls = self.changelist_urls()
+        self.add_rows(2)
+        for url in urls.values():
+            # First request warms per-process caches (content types, templates)
+            self.client.get(url)
+        baseline = {model: self.count_queries(url) for model, url in urls.items()}
+
+        self.add_rows(12)
+        for model, url in urls.items():
+            with self.subTest(model=model.__name__):
+                self.assertTrue(model._default_manager.exists(), f'No {model.__name__} rows to list')
+                with self.assertNumQueries(baseline[model]):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class UserEmailUniquenessTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin_user)
+        self.amina = User.objects.create_user('amina', 'Amina@Example.com', 'pw')
+
+    def test_adding_a_user_with_a_case_variant_email_is_a_form_error(self):
+        response = self.client.post(reverse('admin:auth_user_add'), {
+            'username': 'amina2', 'email': 'amina@example.COM',
+            'password1': 'a-long-password-1', 'password2': 'a-long-password-1',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['adminform'].form, 'email', 'A user with this email address already exists.')
+        self.assertFalse(User.objects.filter(username='amina2').exists())
+
+    def test_changing_email_to_a_case_variant_is_a_form_error(self):
+        other = User.objects.create_user('other', 'other@example.com', 'pw')
+        response = self.client.post(reverse('admin:auth_user_change', args=[other.pk]), {
+            'username': 'other', 'email': 'AMINA@example.com', 'is_active': 'on',
+            'date_joined_0': '2024-01-01', 'date_joined_1': '00:00:00',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['adminform'].form, 'email', 'A user with this email address already exists.')
+
+    def test_keeping_ones_own_email_is_fine(self):
+        form = AdminUserChangeForm(instance=self.amina, data={
+            'username': 'amina', 'email': 'amina@example.com', 'date_joined': '2024-01-01 00:00',
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_registration_rejects_a_case_variant_email(self):
+        form = CustomUserCreationForm(data={
+            'email': 'AMINA@example.com', 'password1': 'a-long-password-1', 'password2': 'a-long-password-1',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
@@ -0,0 +1,28 @@
+import uuid
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from tracker.attachments import claim_uploads
+from tracker.models import RequestAttachment
+
+
+class ClaimUploadsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('uploader', 'uploader@example.com', 'pw')
+        self.attachment = RequestAttachment.objects.create(
+            uploaded_by=self.user, original_name='report.pdf', size=10, status='complete',
+        )
+
+    def test_malformed_ids_are_ignored(self):
+        claimed = claim_uploads(self.user, ['not-a-uuid', '', str(self.attachment.upload_id)], 'key-1')
+        self.assertEqual(claimed, 1)
+        self.attachment.refresh_from_db()
+        self.assertEqual(self.attachment.intake_key, 'key-1')
+
+    def test_only_malformed_ids_claims_nothing(self):
+        self.assertEqual(claim_uploads(self.user, ['1', 'x' * 40], 'key-1'), 0)
+
+    def test_other_users_uploads_are_not_claimed(self):
+        other = User.objects.create_user('other', 'other@example.com', 'pw')
+        self.assertEqual(claim_uploads(other, [str(self.attachment.upload_id), str(uuid.uuid4())], 'key-1'), 0)
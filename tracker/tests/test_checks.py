@@ -0,0 +1,20 @@
+import sys
+import types
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from tracker import checks
+
+
+@override_settings(HEAVY_MODULES=('tracker_fake_heavy',))
+class HeavyImportCheckTests(SimpleTestCase):
+    def test_modules_imported_after_startup_are_not_reported(self):
+        with mock.patch.object(checks, '_startup_modules', frozenset(sys.modules)), \
+                mock.patch.dict(sys.modules, {'tracker_fake_heavy': types.ModuleType('tracker_fake_heavy')}):
+            self.assertEqual(checks.check_heavy_imports(None), [])
+
+    def test_modules_imported_during_startup_are_reported(self):
+        startup = frozenset(sys.modules) | {'tracker_fake_heavy'}
+        with mock.patch.object(checks, '_startup_modules', startup):
+            self.assertEqual([warning.id for warning in checks.check_heavy_imports(None)], ['tracker.W001'])
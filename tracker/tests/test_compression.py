@@ -0,0 +1,111 @@
+import asyncio
+import gzip
+import unittest
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from tracker.middleware import CompressionMiddleware
+from tracker.storage import brotli
+
+BODY = b'<p>Job card 1042: brake pads, oil change</p>\n' * 40
+
+
+def _response(content=BODY, content_type='text/html; charset=utf-8'):
+    return HttpResponse(content, content_type=content_type)
+
+
+@override_settings(COMPRESS_MIN_SIZE=500)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def process(self, response, accept_encoding='gzip, deflate, br'):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    @unittest.skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli_is_preferred(self):
+        response = self.process(_response())
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), BODY)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+    def test_gzip_when_brotli_is_not_accepted(self):
+        response = self.process(_response(), 'gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_no_acceptable_encoding(self):
+        for accept_encoding in ('', 'identity', 'gzip;q=0, br;q=0', 'deflate'):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.process(_response(), accept_encoding)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(response.content, BODY)
+                # The cached copy still depends on the header
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_vary_is_added_to_existing_header(self):
+        response = _response()
+        response['Vary'] = 'Cookie'
+        response = self.process(response)
+        self.assertEqual(response['Vary'], 'Cookie, Accept-Encoding')
+
+    def test_small_responses_are_left_alone(self):
+        response = self.process(_response(BODY[:499]))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+        self.assertEqual(response.content, BODY[:499])
+
+    @override_settings(COMPRESS_MIN_SIZE=300)
+    def test_threshold_is_configurable(self):
+        response = self.process(_response(BODY[:300]), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_non_text_and_encoded_responses_are_left_alone(self):
+        response = self.process(_response(content_type='application/pdf'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        encoded = _response()
+        encoded['Content-Encoding'] = 'identity'
+        self.assertEqual(self.process(encoded).content, BODY)
+
+    def test_strong_etag_is_weakened(self):
+        response = _response()
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.process(response, 'gzip')['ETag'], 'W/"abc"')
+
+    def test_streaming_response(self):
+        response = self.process(StreamingHttpResponse(iter([BODY[:10], BODY[10:]]), content_type='text/html'), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), BODY)
+
+    def test_short_streaming_response_is_still_compressed(self):
+        # The length of a stream isn't known up front
+        response = self.process(StreamingHttpResponse(iter([b'ok']), content_type='text/plain'), 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'ok')
+
+    def test_async_streaming_response(self):
+        async def chunks():
+            yield BODY[:10]
+            yield BODY[10:]
+
+        async def collect(content):
+            return b''.join([chunk async for chunk in content])
+
+        response = self.process(StreamingHttpResponse(chunks(), content_type='text/html'), 'gzip')
+        self.assertEqual(gzip.decompress(asyncio.run(collect(response.streaming_content))), BODY)
+
+    def test_gzip_length_is_padded(self):
+        lengths = {len(self.process(_response(), 'gzip').content) for _ in range(20)}
+        self.assertGreater(len(lengths), 1)
+
+    @unittest.skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli_length_is_padded(self):
+        lengths = set()
+        for _ in range(20):
+            content = self.process(_response(), 'br').content
+            self.assertEqual(brotli.decompress(content), BODY)
+            lengths.add(len(content))
+        self.assertGreater(len(lengths), 1)
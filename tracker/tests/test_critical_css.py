@@ -0,0 +1,70 @@
+from django.test import SimpleTestCase
+from lxml import html
+
+from tracker.critical_css import _stylesheet_hrefs, extract_critical, fold_elements
+
+PAGE = """
+<html><head>
+  <link rel="stylesheet" href="/static/css/app.css">
+  <link rel="preload" as="style" href="https://cdn.example.com/bootstrap.css">
+  <noscript><link rel="stylesheet" href="https://cdn.example.com/bootstrap.css"></noscript>
+  <link rel="icon" href="/favicon.ico">
+</head><body>
+  <script>var ignored = true;</script>
+  <nav class="navbar"><a class="brand" href="/">Tracker</a></nav>
+  <section class="hero"><h1>Research services</h1></section>
+  <p>One</p><p>Two</p><p>Three</p>
+  <footer class="site-footer">Contact</footer>
+</body></html>
+"""
+
+CSS = """
+@font-face { font-family: "Brand"; src: url(fonts/brand.woff2); }
+@font-face { font-family: "Footer"; src: url(fonts/footer.woff2); }
+.navbar { display: flex; background: url(img/bg.png); }
+.brand:hover { color: red; font-family: "Brand"; }
+.navbar > ::before { content: ""; }
+.site-footer { color: gray; font-family: "Footer"; }
+@media (min-width: 768px) { .hero { padding: 4rem; } .site-footer { padding: 0; } }
+@media print { .site-footer { display: none; } }
+"""
+
+
+class CriticalCssTests(SimpleTestCase):
+    def setUp(self):
+        self.doc = html.fromstring(PAGE)
+        # navbar, brand link, hero and its heading; the footer is below the fold
+        self.fold = fold_elements(self.doc, 4)
+        self.critical = extract_critical(CSS, 'https://cdn.example.com/css/app.css', self.doc, self.fold)
+
+    def test_fold_skips_non_rendering_elements(self):
+        self.assertEqual(sorted(el.tag for el in self.fold), ['a', 'body', 'h1', 'html', 'nav', 'section'])
+
+    def test_rules_above_the_fold_are_kept(self):
+        self.assertIn('.navbar{', self.critical)
+        self.assertIn('.brand:hover{', self.critical)
+        self.assertIn('.navbar > ::before{', self.critical)
+
+    def test_rules_below_the_fold_are_dropped(self):
+        self.assertNotIn('site-footer', self.critical)
+
+    def test_media_rules_keep_only_critical_children(self):
+        self.assertIn('@media (min-width: 768px){.hero{padding: 4rem}}', self.critical)
+        self.assertNotIn('@media print', self.critical)
+
+    def test_only_used_font_faces_are_kept(self):
+        self.assertIn('fonts/brand.woff2', self.critical)
+        self.assertNotIn('fonts/footer.woff2', self.critical)
+
+    def test_urls_are_made_absolute(self):
+        self.assertIn('url(https://cdn.example.com/css/img/bg.png)', self.critical)
+        self.assertIn('url(https://cdn.example.com/css/fonts/brand.woff2)', self.critical)
+
+    def test_stylesheet_hrefs(self):
+        self.assertEqual(
+            _stylesheet_hrefs(self.doc),
+            ['/static/css/app.css', 'https://cdn.example.com/bootstrap.css'],
+        )
+
+    def test_page_without_body(self):
+        self.assertEqual(fold_elements(html.fromstring('<html><head></head></html>'), 10), set())
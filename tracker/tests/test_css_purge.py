@@ -0,0 +1,115 @@
+from django.test import SimpleTestCase, override_settings
+
+from tracker.css_purge import UsedSelectors, purge_css, scan_template, selector_is_used
+
+CSS = """
+.btn { padding: 1rem; }
+.card-title { font-weight: bold; }
+.unused-widget { color: red; }
+#sidebar, #missing { width: 10rem; }
+@media (min-width: 768px) { .unused-widget { color: blue; } .btn { margin: 0; } }
+@font-face { font-family: "Icons"; src: url(icons.woff2); }
+.show { display: block; }
+.modal-backdrop.fade { opacity: 0; }
+.bs-tooltip-top .tooltip-arrow { bottom: 0; }
+.badge-pending, .badge-archived { color: gray; }
+/* .commented-out { color: red; } */
+"""
+
+TEMPLATE = """
+{% extends "base.html" %}
+{% block content %}
+<div id="sidebar" class="card">
+  <h5 class="card-title {% if urgent %}text-danger{% endif %}">{{ title }}</h5>
+  <span class="badge-{{ request.status }}">{{ request.get_status_display }}</span>
+  <button class="btn" onclick="this.classList.toggle('is-open')">Open</button>
+</div>
+<script>
+  document.getElementById('sidebar').classList.add('js-loaded');
+  list.innerHTML = '<li class="result-item">' + name + '</li>';
+</script>
+{% endblock %}
+"""
+
+
+class ScanTemplateTests(SimpleTestCase):
+    def setUp(self):
+        self.used = scan_template(TEMPLATE)
+
+    def test_markup(self):
+        self.assertTrue({'div', 'h5', 'span', 'button'} <= self.used.tags)
+        self.assertIn('sidebar', self.used.ids)
+        self.assertTrue({'card', 'card-title', 'btn'} <= self.used.classes)
+
+    def test_template_tags_inside_class_attributes(self):
+        self.assertIn('text-danger', self.used.classes)
+
+    def test_variable_classes_keep_their_prefix(self):
+        self.assertIn('badge-', self.used.class_prefixes)
+        self.assertTrue(self.used.has_class('badge-archived'))
+
+    def test_classes_and_tags_from_scripts(self):
+        self.assertTrue({'is-open', 'js-loaded', 'result-item'} <= self.used.classes)
+        self.assertIn('li', self.used.tags)
+
+    def test_empty_template(self):
+        self.assertEqual(scan_template('{% extends "base.html" %}').ids, set())
+
+
+class PurgeCssTests(SimpleTestCase):
+    def purge(self):
+        return purge_css(CSS, scan_template(TEMPLATE))
+
+    def test_unused_rules_are_removed(self):
+        purged = self.purge()
+        self.assertIn('.btn{padding: 1rem;}', purged)
+        self.assertIn('.card-title{', purged)
+        self.assertNotIn('unused-widget', purged)
+        self.assertNotIn('commented-out', purged)
+
+    def test_only_used_selectors_of_a_rule_are_kept(self):
+        self.assertIn('#sidebar{width: 10rem;}', self.purge())
+
+    def test_media_blocks_are_purged_inside(self):
+        purged = self.purge()
+        self.assertIn('@media (min-width: 768px){.btn{margin: 0;}}', purged)
+
+    def test_other_at_rules_are_kept(self):
+        self.assertIn('@font-face', self.purge())
+
+    def test_dynamic_classes_are_kept(self):
+        purged = self.purge()
+        self.assertIn('.badge-pending,.badge-archived{', purged)
+
+    def test_safelisted_runtime_classes_are_kept(self):
+        purged = self.purge()
+        self.assertIn('.show{', purged)
+        self.assertIn('.modal-backdrop.fade{', purged)
+        self.assertIn('.bs-tooltip-top .tooltip-arrow{', purged)
+
+    @override_settings(CSS_PURGE_SAFELIST={'fade'}, CSS_PURGE_SAFELIST_PREFIXES=())
+    def test_safelist_is_configurable(self):
+        purged = purge_css(CSS, UsedSelectors())
+        self.assertNotIn('.show{', purged)
+        self.assertNotIn('bs-tooltip-top', purged)
+        self.assertNotIn('modal-backdrop', purged)
+
+
+class SelectorIsUsedTests(SimpleTestCase):
+    def setUp(self):
+        self.used = UsedSelectors()
+        self.used.tags.add('a')
+        self.used.classes.add('nav-link')
+
+    def test_pseudo_classes_and_attributes_need_only_their_subject(self):
+        self.assertTrue(selector_is_used('a.nav-link:hover', self.used))
+        self.assertTrue(selector_is_used('.nav-link[aria-current="page"]', self.used))
+        self.assertTrue(selector_is_used('[hidden]', self.used))
+
+    def test_every_part_of_a_combinator_is_required(self):
+        self.assertTrue(selector_is_used('body > a .nav-link', self.used))
+        self.assertFalse(selector_is_used('.navbar .nav-link', self.used))
+        self.assertFalse(selector_is_used('table a', self.used))
+
+    def test_unparseable_selectors_are_kept(self):
+        self.assertTrue(selector_is_used('.nav-link:::weird(', self.used))
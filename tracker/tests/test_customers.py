@@ -0,0 +1,154 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from tracker.customers import (
+    ensure_customer, find_duplicate_clusters, merge_customers, resolve_account, upsert_customer,
+)
+from tracker.models import Customer, Workshop, WorkshopRegistration, WorkshopWaitlistEntry
+from tracker.workshops import sync_seats
+
+
+class UpsertCustomerTests(TestCase):
+    def test_address_variants_resolve_to_one_customer(self):
+        first = upsert_customer('Amina@Example.com', full_name='Amina')
+        second = upsert_customer('  amina@example.COM ', phone='0712 345 678')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(second.phone, '0712 345 678')
+
+    def test_blank_addresses_never_match(self):
+        first = upsert_customer('', full_name='First')
+        second = upsert_customer('', full_name='Second')
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertIsNone(first.email)
+        self.assertIsNone(second.email)
+
+    def test_blank_address_is_not_linked_to_another_users_customer(self):
+        alice = User.objects.create_user('alice', '', 'pw')
+        bob = User.objects.create_user('bob', '', 'pw')
+        alices = upsert_customer('', full_name='Alice', user=alice)
+        bobs = upsert_customer('', full_name='Bob', user=bob)
+        self.assertNotEqual(alices.pk, bobs.pk)
+        self.assertEqual(bobs.user, bob)
+
+    def test_blank_address_finds_the_users_own_customer(self):
+        alice = User.objects.create_user('alice', '', 'pw')
+        customer = upsert_customer('', full_name='Alice', user=alice)
+        self.assertEqual(upsert_customer('', user=alice).pk, customer.pk)
+        self.assertEqual(Customer.objects.filter(user=alice).count(), 1)
+
+
+class AccountCustomerTests(TestCase):
+    def request_for(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return request
+
+    def test_email_less_users_get_customers_of_their_own(self):
+        Customer.objects.create(full_name='Walk-in', email='')
+        alice = User.objects.create_user('alice', '', 'pw')
+        bob = User.objects.create_user('bob', '', 'pw')
+
+        self.assertIsNone(resolve_account(self.request_for(alice))[0].pk)
+        alices = ensure_customer(self.request_for(alice))
+        bobs = ensure_customer(self.request_for(bob))
+
+        self.assertEqual((alices.user, bobs.user), (alice, bob))
+        self.assertEqual(Customer.objects.filter(user__isnull=True).count(), 1)
+
+    def test_unlinked_customer_with_the_same_address_is_linked(self):
+        customer = Customer.objects.create(full_name='Amina', email='Amina@example.com')
+        amina = User.objects.create_user('amina', 'amina@example.com', 'pw')
+
+        self.assertEqual(resolve_account(self.request_for(amina))[0].pk, customer.pk)
+        self.assertEqual(ensure_customer(self.request_for(amina)).pk, customer.pk)
+        customer.refresh_from_db()
+        self.assertEqual(customer.user, amina)
+
+    def test_another_accounts_customer_is_never_taken(self):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        taken = Customer.objects.create(full_name='Owner', email='shared@example.com', user=owner)
+        other = User.objects.create_user('other', 'SHARED@example.com', 'pw')
+
+        customer = ensure_customer(self.request_for(other))
+
+        self.assertNotEqual(customer.pk, taken.pk)
+        self.assertEqual(customer.user, other)
+        self.assertIsNone(customer.email)
+
+
+class DeduplicationTests(TestCase):
+    def customer(self, email, phone='', **kwargs):
+        return Customer.objects.create(full_name=email.split('@')[0], email=email, phone=phone, **kwargs)
+
+    def workshop(self, seats=5):
+        workshop = Workshop.objects.create(
+            title='Thesis writing', description='Workshop', date=timezone.now() + timedelta(days=7),
+            max_participants=seats,
+        )
+        sync_seats([workshop.pk])
+        return workshop
+
+    def test_shared_phone_only_clusters_when_asked(self):
+        a = self.customer('a@example.com', phone='+255 712 345 678')
+        b = self.customer('b@example.com', phone='0255712345678'[1:])
+        c = self.customer('C@example.com ')
+        d = self.customer('c@example.com')
+        self.assertEqual(find_duplicate_clusters(), [[c.pk, d.pk]])
+        self.assertIn([a.pk, b.pk], find_duplicate_clusters(match_phone=True))
+
+    def test_duplicate_address_is_kept_in_notes(self):
+        survivor = self.customer('amina@example.com')
+        duplicate = self.customer('amina.work@example.com', notes='Prefers phone calls')
+        merge_customers(survivor, [duplicate])
+        survivor.refresh_from_db()
+        self.assertIn('Prefers phone calls', survivor.notes)
+        self.assertIn(f'Merged from customer #{duplicate.pk} (amina.work@example.com)', survivor.notes)
+
+    def test_customers_of_different_users_are_not_merged(self):
+        survivor = self.customer('a@example.com', user=User.objects.create_user('a', 'a@example.com', 'pw'))
+        duplicate = self.customer('b@example.com', user=User.objects.create_user('b', 'b@example.com', 'pw'))
+        with self.assertRaises(ValueError):
+            merge_customers(survivor, [duplicate])
+        self.assertTrue(Customer.objects.filter(pk=duplicate.pk).exists())
+
+    def test_waitlist_places_move_to_the_survivor(self):
+        survivor = self.customer('a@example.com')
+        duplicate = self.customer('b@example.com')
+        only_duplicate, both = self.workshop(seats=1), self.workshop(seats=1)
+        attendee = self.customer('seated@example.com')
+        for workshop in (only_duplicate, both):
+            WorkshopRegistration.objects.create(workshop=workshop, customer=attendee)
+        sync_seats([only_duplicate.pk, both.pk])
+        WorkshopWaitlistEntry.objects.create(workshop=only_duplicate, customer=duplicate)
+        WorkshopWaitlistEntry.objects.create(workshop=both, customer=duplicate)
+        WorkshopWaitlistEntry.objects.create(workshop=both, customer=survivor)
+
+        merge_customers(survivor, [duplicate])
+
+        self.assertEqual(
+            sorted(WorkshopWaitlistEntry.objects.filter(customer=survivor).values_list('workshop_id', flat=True)),
+            sorted([only_duplicate.pk, both.pk]),
+        )
+
+    def test_seat_holding_registration_wins_and_seats_are_recounted(self):
+        survivor = self.customer('a@example.com')
+        duplicate = self.customer('b@example.com')
+        cancelled_then_seated, seated_twice = self.workshop(seats=5), self.workshop(seats=5)
+        WorkshopRegistration.objects.create(workshop=cancelled_then_seated, customer=survivor, status='cancelled')
+        WorkshopRegistration.objects.create(workshop=cancelled_then_seated, customer=duplicate, status='registered')
+        WorkshopRegistration.objects.create(workshop=seated_twice, customer=survivor, status='registered')
+        WorkshopRegistration.objects.create(workshop=seated_twice, customer=duplicate, status='registered')
+        sync_seats([cancelled_then_seated.pk, seated_twice.pk])
+
+        merge_customers(survivor, [duplicate])
+
+        self.assertEqual(
+            WorkshopRegistration.objects.get(workshop=cancelled_then_seated, customer=survivor).status, 'registered',
+        )
+        self.assertEqual(WorkshopRegistration.objects.filter(workshop=seated_twice).count(), 1)
+        cancelled_then_seated.refresh_from_db()
+        seated_twice.refresh_from_db()
+        self.assertEqual((cancelled_then_seated.seats_left, seated_twice.seats_left), (4, 4))
@@ -0,0 +1,195 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from email.utils import formatdate
+
+from django.test import SimpleTestCase, override_settings
+
+from tracker.fileserver import FileServerASGI, FileServerWSGI, parse_range
+
+CONTENT = b'0123456789' * 10
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_closed_range(self):
+        self.assertEqual(parse_range('bytes=10-19', 100), (10, 19))
+
+    def test_end_is_clamped_to_size(self):
+        self.assertEqual(parse_range('bytes=90-500', 100), (90, 99))
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_range('bytes=95-', 100), (95, 99))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-500', 100), (0, 99))
+
+    def test_unsatisfiable_ranges(self):
+        self.assertEqual(parse_range('bytes=100-', 100), 'invalid')
+        self.assertEqual(parse_range('bytes=50-40', 100), 'invalid')
+        self.assertEqual(parse_range('bytes=-0', 100), 'invalid')
+        self.assertEqual(parse_range('bytes=-5', 0), 'invalid')
+
+    def test_ignored_headers(self):
+        for header in ('', None, 'bytes=-', 'items=0-5', 'bytes=0-5,10-15', 'bytes=a-b'):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 100))
+
+
+def _not_found(environ, start_response):
+    start_response('404 Not Found', [('Content-Type', 'text/plain')])
+    return [b'django']
+
+
+async def _not_found_asgi(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'django'})
+
+
+class FileServerTestMixin:
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base)
+        self.static_root = os.path.join(self.base, 'static')
+        os.makedirs(os.path.join(self.static_root, 'css'))
+        with open(os.path.join(self.static_root, 'css', 'app.css'), 'wb') as f:
+            f.write(CONTENT)
+        # Outside STATIC_ROOT, reachable only by escaping it
+        with open(os.path.join(self.base, 'secret.txt'), 'wb') as f:
+            f.write(b'secret')
+        os.symlink(os.path.join(self.base, 'secret.txt'), os.path.join(self.static_root, 'link.txt'))
+
+        settings_override = override_settings(
+            SERVE_FILES=True, STATIC_URL='/static/', STATIC_ROOT=self.static_root,
+            MEDIA_URL='/media/', MEDIA_ROOT=os.path.join(self.base, 'media'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class FileServerWSGITests(FileServerTestMixin, SimpleTestCase):
+    def request(self, path, **headers):
+        app = FileServerWSGI(_not_found)
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path}
+        environ.update({'HTTP_' + name.upper(): value for name, value in headers.items()})
+        captured = {}
+
+        def start_response(status, response_headers):
+            captured['status'] = status
+            captured['headers'] = dict(response_headers)
+
+        body = b''.join(app(environ, start_response))
+        return captured['status'], captured['headers'], body
+
+    def test_whole_file(self):
+        status, headers, body = self.request('/static/css/app.css')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(body, CONTENT)
+        self.assertEqual(headers['Accept-Ranges'], 'bytes')
+
+    def test_suffix_range(self):
+        status, headers, body = self.request('/static/css/app.css', range='bytes=-5')
+        self.assertEqual(status, '206 Partial Content')
+        self.assertEqual(headers['Content-Range'], 'bytes 95-99/100')
+        self.assertEqual(body, CONTENT[-5:])
+
+    def test_open_ended_range(self):
+        status, headers, body = self.request('/static/css/app.css', range='bytes=90-')
+        self.assertEqual(status, '206 Partial Content')
+        self.assertEqual(headers['Content-Length'], '10')
+        self.assertEqual(body, CONTENT[90:])
+
+    def test_multi_range_gets_whole_file(self):
+        status, headers, body = self.request('/static/css/app.css', range='bytes=0-4,10-14')
+        self.assertEqual(status, '200 OK')
+        self.assertNotIn('Content-Range', headers)
+        self.assertEqual(body, CONTENT)
+
+    def test_unsatisfiable_range(self):
+        status, headers, body = self.request('/static/css/app.css', range='bytes=200-')
+        self.assertEqual(status, '416 Range Not Satisfiable')
+        self.assertEqual(headers['Content-Range'], 'bytes */100')
+        self.assertEqual(body, b'')
+
+    def test_if_range_with_current_etag(self):
+        _, headers, _ = self.request('/static/css/app.css')
+        status, _, body = self.request('/static/css/app.css', range='bytes=0-4', if_range=headers['ETag'])
+        self.assertEqual(status, '206 Partial Content')
+        self.assertEqual(body, CONTENT[:5])
+
+    def test_if_range_with_stale_validator_gets_whole_file(self):
+        status, _, body = self.request('/static/css/app.css', range='bytes=0-4', if_range='"stale"')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(body, CONTENT)
+
+        stale_date = formatdate(0, usegmt=True)
+        status, _, body = self.request('/static/css/app.css', range='bytes=0-4', if_range=stale_date)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(body, CONTENT)
+
+    def test_dot_dot_escape_is_refused(self):
+        for path in ('/static/../secret.txt', '/static/css/../../secret.txt'):
+            with self.subTest(path=path):
+                status, _, body = self.request(path)
+                self.assertEqual(status, '404 Not Found')
+                self.assertEqual(body, b'django')
+
+    def test_symlink_escape_is_refused(self):
+        status, _, body = self.request('/static/link.txt')
+        self.assertEqual(status, '404 Not Found')
+        self.assertEqual(body, b'django')
+
+    @override_settings(SERVE_FILES=False)
+    def test_disabled_passes_everything_through(self):
+        status, _, body = self.request('/static/css/app.css')
+        self.assertEqual(status, '404 Not Found')
+        self.assertEqual(body, b'django')
+
+
+class FileServerASGITests(FileServerTestMixin, SimpleTestCase):
+    def request(self, path, **headers):
+        app = FileServerASGI(_not_found_asgi)
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': path,
+            'headers': [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(app(scope, receive, send))
+        start = messages[0]
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        return start['status'], {name.decode(): value.decode() for name, value in start['headers']}, body
+
+    def test_range(self):
+        status, headers, body = self.request('/static/css/app.css', range='bytes=10-19')
+        self.assertEqual(status, 206)
+        self.assertEqual(headers['content-range'], 'bytes 10-19/100')
+        self.assertEqual(body, CONTENT[10:20])
+
+    def test_unsatisfiable_range(self):
+        status, headers, body = self.request('/static/css/app.css', range='bytes=-0')
+        self.assertEqual(status, 416)
+        self.assertEqual(headers['content-range'], 'bytes */100')
+        self.assertEqual(body, b'')
+
+    def test_if_range_with_stale_etag_gets_whole_file(self):
+        status, _, body = self.request('/static/css/app.css', range='bytes=0-4', if_range='"stale"')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, CONTENT)
+
+    def test_dot_dot_escape_is_refused(self):
+        status, _, body = self.request('/static/css/../../secret.txt')
+        self.assertEqual(status, 404)
+        self.assertEqual(body, b'django')
+
+    def test_symlink_escape_is_refused(self):
+        status, _, body = self.request('/static/link.txt')
+        self.assertEqual(status, 404)
+        self.assertEqual(body, b'django')
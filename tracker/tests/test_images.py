@@ -0,0 +1,65 @@
+import json
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, override_settings
+
+from tracker import images
+
+MANIFEST = {'width': 800, 'height': 600, 'widths': [320, 640, 800]}
+
+
+class ManifestCacheTests(SimpleTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_MANIFEST_MISS_TTL=30)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        images._manifest_cache.clear()
+        self.addCleanup(images._manifest_cache.clear)
+
+    def write_manifest(self, name):
+        path = f'{images.derivative_dir(name)}/manifest.json'
+        default_storage.save(path, ContentFile(json.dumps(MANIFEST).encode('utf-8')))
+
+    def test_found_manifest_is_cached(self):
+        self.write_manifest('services/a.jpg')
+        self.assertEqual(images.get_manifest('services/a.jpg'), MANIFEST)
+        with mock.patch.object(default_storage, 'open') as storage_open:
+            self.assertEqual(images.get_manifest('services/a.jpg'), MANIFEST)
+            with mock.patch('tracker.images.time.monotonic', return_value=10 ** 9):
+                self.assertEqual(images.get_manifest('services/a.jpg'), MANIFEST)
+        storage_open.assert_not_called()
+
+    def test_miss_is_cached_until_the_ttl_expires(self):
+        self.assertIsNone(images.get_manifest('services/b.jpg'))
+        self.write_manifest('services/b.jpg')
+        with mock.patch.object(default_storage, 'open') as storage_open:
+            self.assertIsNone(images.get_manifest('services/b.jpg'))
+        storage_open.assert_not_called()
+
+        expired = images.time.monotonic() + 31
+        with mock.patch('tracker.images.time.monotonic', return_value=expired):
+            self.assertEqual(images.get_manifest('services/b.jpg'), MANIFEST)
+
+    def test_generating_derivatives_replaces_a_cached_miss(self):
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new('RGB', (400, 300), (200, 40, 40)).save(buffer, 'PNG')
+        name = default_storage.save('services/c.png', ContentFile(buffer.getvalue()))
+        self.assertIsNone(images.get_manifest(name))
+
+        images.generate_derivatives(name)
+        self.assertEqual(images.get_manifest(name), {'width': 400, 'height': 300, 'widths': [320, 400]})
+
+    def test_cache_is_bounded(self):
+        with mock.patch.object(images, 'MANIFEST_CACHE_SIZE', 3):
+            for i in range(5):
+                images.get_manifest(f'services/{i}.jpg')
+        self.assertEqual(list(images._manifest_cache), [f'services/{i}.jpg' for i in (2, 3, 4)])
@@ -0,0 +1,94 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from tracker import intake
+from tracker.models import Customer, ResearchService, ServiceRequest
+from tracker.spool import SQLiteSpool
+
+
+class IntakeTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        spool = SQLiteSpool(Path(directory.name) / 'intake.sqlite3', table='intake', max_attempts=intake.MAX_ATTEMPTS)
+        patcher = mock.patch.object(intake, 'spool', spool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = ResearchService.objects.create(name='Thesis Writing', category='thesis', description='Help')
+
+    def payload(self, **overrides):
+        payload = {
+            'email': 'amina@example.com', 'full_name': 'Amina', 'phone': '', 'service_id': self.service.pk,
+            'title': 'Chapter 2', 'description': 'Literature review', 'deadline': '', 'budget': '',
+            'user_id': None,
+        }
+        payload.update(overrides)
+        return payload
+
+    @override_settings(INTAKE_WRITE_BEHIND=False)
+    def test_replayed_submission_creates_one_request(self):
+        first = intake.submit_request(self.payload(), client_key='form-1')
+        second = intake.submit_request(self.payload(), client_key='form-1')
+
+        self.assertEqual(first, second)
+        self.assertEqual(ServiceRequest.objects.filter(intake_key=first).count(), 1)
+        self.assertEqual(ServiceRequest.objects.count(), 1)
+
+    @override_settings(INTAKE_WRITE_BEHIND=False)
+    def test_identical_content_without_a_client_key_is_one_submission(self):
+        intake.submit_request(self.payload())
+        intake.submit_request(self.payload())
+        self.assertEqual(ServiceRequest.objects.count(), 1)
+
+    @override_settings(INTAKE_WRITE_BEHIND=True)
+    def test_write_behind_drains_exactly_once(self):
+        key = intake.submit_request(self.payload(), client_key='form-1')
+        intake.submit_request(self.payload(), client_key='form-1')
+        self.assertFalse(ServiceRequest.objects.exists())
+
+        self.assertEqual(intake.drain(), 1)
+        self.assertEqual(intake.drain(), 0)
+        self.assertEqual(intake.spool.stats(), {'pending': 0, 'dead': 0})
+
+        # A batch retried after it was written (e.g. the ack was lost) is absorbed
+        intake.spool.enqueue(key, intake.json.dumps(self.payload()))
+        intake.drain()
+        request = ServiceRequest.objects.get()
+        self.assertEqual((request.intake_key, request.customer.email), (key, 'amina@example.com'))
+
+    @override_settings(INTAKE_WRITE_BEHIND=True)
+    def test_batch_with_one_customer_creates_one_customer(self):
+        intake.submit_request(self.payload(title='First'))
+        intake.submit_request(self.payload(title='Second', email='AMINA@example.com'))
+        self.assertEqual(intake.drain(), 2)
+        self.assertEqual(Customer.objects.count(), 1)
+        self.assertEqual(ServiceRequest.objects.filter(customer__email='amina@example.com').count(), 2)
+
+    @override_settings(INTAKE_WRITE_BEHIND=False)
+    def test_signed_in_users_without_email_get_their_own_customers(self):
+        alice = User.objects.create_user('noemail_a', '', 'pw')
+        bob = User.objects.create_user('noemail_b', '', 'pw')
+        for user in (alice, bob):
+            payload = self.payload(email='', full_name=user.username, user_id=user.pk, title=user.username)
+            self.assertIsNone(intake.validate_request_payload(payload))
+            intake.submit_request(payload)
+
+        self.assertEqual(ServiceRequest.objects.get(title='noemail_a').customer.user, alice)
+        self.assertEqual(ServiceRequest.objects.get(title='noemail_b').customer.user, bob)
+
+    @override_settings(INTAKE_WRITE_BEHIND=False)
+    def test_signed_in_user_keeps_their_linked_customer(self):
+        user = User.objects.create_user('amina', 'amina@example.com', 'pw')
+        linked = Customer.objects.create(user=user, full_name='Amina', email='work@example.com')
+        Customer.objects.create(full_name='Someone', email='other@example.com')
+
+        intake.submit_request(self.payload(email='other@example.com', user_id=user.pk))
+
+        self.assertEqual(ServiceRequest.objects.get().customer, linked)
+
+    def test_anonymous_submissions_need_a_valid_email(self):
+        self.assertEqual(intake.validate_request_payload(self.payload(email='')), 'Please enter a valid email address.')
@@ -0,0 +1,69 @@
+import difflib
+import re
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from tracker.models import (
+    ClientTestimonial, CompanyProfile, Customer, Notification, ResearchService, ServiceFAQ, ServiceImage,
+    TutorialVideo,
+)
+
+_CSRF_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]+"')
+# The engines escape quotes differently (&#x27; vs &#39;, &quot; vs &#34;)
+_ENTITIES = {'&#x27;': "'", '&#39;': "'", '&#34;': '"', '&quot;': '"'}
+
+
+def _normalized(html):
+    html = _CSRF_RE.sub(r'\1"', html)
+    for entity, char in _ENTITIES.items():
+        html = html.replace(entity, char)
+    # Whitespace control differs between the engines; compare the text line by line
+    return [line.strip() for line in html.splitlines() if line.strip()]
+
+
+class Jinja2ParityTests(TestCase):
+    """The Jinja2 copies of the hot pages render what their Django templates do"""
+
+    @classmethod
+    def setUpTestData(cls):
+        CompanyProfile.objects.create(pk=1)
+        cls.service = ResearchService.objects.create(
+            name='Thesis Writing', category='thesis', description='Help with "every" chapter',
+            detailed_description='Topic selection\nLiterature review', price_from=100, price_to=500,
+            turnaround_time='2-3 weeks', display_order=1,
+        )
+        ResearchService.objects.create(name='Thesis Editing', category='thesis', description="Editor's review")
+        customer = Customer.objects.create(full_name='Amina', email='amina@example.com')
+        ClientTestimonial.objects.create(customer=customer, service=cls.service, quote='Very <b>helpful</b>', is_published=True)
+        ServiceImage.objects.create(service=cls.service, title='Cover', image='services/cover.png', is_featured=True)
+        TutorialVideo.objects.create(service=cls.service, title='Getting started', video_url='https://example.com/v')
+        ServiceFAQ.objects.create(service=cls.service, question='How long?', answer='Two weeks & more')
+        cls.user = User.objects.create_user('reader', 'reader@example.com', 'pw', first_name='Reader')
+        Notification.objects.create(user=cls.user, title='Welcome', message='Hello')
+
+    def render(self, url, engine_is_jinja2):
+        with override_settings(JINJA2_HOT_PAGES=engine_is_jinja2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return _normalized(response.content.decode())
+
+    def assertSameOutput(self, url):
+        django_output = self.render(url, False)
+        jinja2_output = self.render(url, True)
+        diff = '\n'.join(difflib.unified_diff(django_output, jinja2_output, 'django', 'jinja2', lineterm='', n=1))
+        if diff:
+            self.fail(f'{url} renders differently under Jinja2:\n{diff[:3000]}')
+
+    def check_pages(self):
+        for url in (reverse('home'), reverse('services'), reverse('service_detail', args=[self.service.pk])):
+            with self.subTest(url=url):
+                self.assertSameOutput(url)
+
+    def test_anonymous(self):
+        self.check_pages()
+
+    def test_signed_in(self):
+        self.client.force_login(self.user)
+        self.check_pages()
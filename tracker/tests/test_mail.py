@@ -0,0 +1,134 @@
+import socketserver
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.core.mail import send_mail
+from django.test import SimpleTestCase, override_settings
+
+from tracker import mail
+from tracker.spool import SQLiteSpool
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for Django's backend: records each message's data"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.reply('220 localhost ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.reply('250-localhost')
+                self.reply('250 8BITMIME')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line == b'.\r\n':
+                        break
+                    data.append(data_line)
+                # Slow enough for concurrent senders to overlap
+                time.sleep(0.01)
+                self.server.messages.append(b''.join(data).decode('utf-8', 'replace'))
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.messages = []
+
+
+class SpooledMailTests(SimpleTestCase):
+    def setUp(self):
+        self.server = _SMTPServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        spool = SQLiteSpool(Path(directory.name) / 'mail.sqlite3', table='mail', max_attempts=6, backoff=60)
+        patcher = mock.patch.object(mail, 'spool', spool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        settings = override_settings(
+            EMAIL_BACKEND='tracker.mail.SpoolEmailBackend',
+            MAIL_SPOOL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.server.server_address[1],
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            EMAIL_USE_TLS=False,
+            MAIL_BACKGROUND=True,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def subjects(self):
+        return sorted(
+            line.split(':', 1)[1].strip()
+            for message in self.server.messages
+            for line in message.splitlines() if line.startswith('Subject:')
+        )
+
+    def test_background_mail_is_spooled_until_sent(self):
+        send_mail('Queued', 'Body', 'from@example.com', ['to@example.com'])
+        self.assertEqual(self.server.messages, [])
+        self.assertEqual(mail.send_queued_mail(), 1)
+        self.assertEqual(self.subjects(), ['Queued'])
+        self.assertEqual(mail.spool.stats(), {'pending': 0, 'dead': 0})
+
+    @override_settings(MAIL_BACKGROUND=False)
+    def test_mail_is_sent_inline_without_background(self):
+        send_mail('Inline', 'Body', 'from@example.com', ['to@example.com'])
+        self.assertEqual(self.subjects(), ['Inline'])
+        self.assertEqual(mail.spool.stats(), {'pending': 0, 'dead': 0})
+
+    def test_concurrent_senders_send_each_message_once(self):
+        expected = [f'Message {i:02d}' for i in range(30)]
+        for subject in expected:
+            send_mail(subject, 'Body', 'from@example.com', ['to@example.com'])
+
+        def sender():
+            while mail.send_queued_mail(batch_size=4):
+                pass
+
+        threads = [threading.Thread(target=sender) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.subjects(), expected)
+        self.assertEqual(mail.spool.stats(), {'pending': 0, 'dead': 0})
+
+    def test_claimed_messages_are_not_handed_out_again(self):
+        send_mail('Claimed', 'Body', 'from@example.com', ['to@example.com'])
+        self.assertEqual(len(mail.spool.claim(10, lease=60)), 1)
+        self.assertEqual(mail.send_queued_mail(), 0)
+        self.assertEqual(self.server.messages, [])
+
+    def test_failed_messages_stay_spooled(self):
+        send_mail('Refused', 'Body', 'from@example.com', ['to@example.com'])
+        self.server.server_close()
+        with override_settings(EMAIL_PORT=1), self.assertLogs('tracker.mail', 'ERROR'):
+            self.assertEqual(mail.send_queued_mail(), 0)
+        self.assertEqual(mail.spool.stats(), {'pending': 1, 'dead': 0})
@@ -0,0 +1,133 @@
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from tracker import ocr
+from tracker.models import OcrPage
+
+
+def _png(shade, size=(40, 20)):
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new('L', size, shade).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _fake_tesseract(image, lang='eng'):
+    """Stands in for tesseract: names the image by its first pixel"""
+    return f'shade {image.getpixel((0, 0))}'
+
+
+@override_settings(OCR_MIN_WORDS=3)
+class NeedsOcrTests(SimpleTestCase):
+    def test_text_on_every_page(self):
+        self.assertFalse(ocr.needs_ocr('one two three\fand four more words'))
+
+    def test_a_page_without_text(self):
+        self.assertTrue(ocr.needs_ocr('one two three\f\fand four more words'))
+
+    def test_a_page_with_too_few_words(self):
+        self.assertTrue(ocr.needs_ocr('one two three\fpage 2'))
+
+    def test_empty_document(self):
+        self.assertTrue(ocr.needs_ocr(''))
+
+
+@override_settings(OCR_WORKERS=1, OCR_DPI=20, OCR_LANGUAGES='eng')
+@mock.patch('pytesseract.image_to_string', side_effect=_fake_tesseract)
+class OcrPdfTests(TestCase):
+    def setUp(self):
+        import fitz
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'scan.pdf'
+        # Pages 0 and 2 are identical, page 1 differs
+        with fitz.open() as document:
+            for shade in (0.2, 0.8, 0.2):
+                page = document.new_page(width=72, height=72)
+                page.draw_rect(page.rect, color=None, fill=(shade, shade, shade))
+            document.save(self.path)
+
+    def test_identical_pages_are_recognized_once(self, image_to_string):
+        texts, recognized = ocr.ocr_pdf(self.path, [0, 1, 2])
+
+        self.assertEqual(recognized, 2)
+        self.assertEqual(image_to_string.call_count, 2)
+        self.assertEqual(sorted(texts), [0, 1, 2])
+        self.assertEqual(texts[0], texts[2])
+        self.assertNotEqual(texts[0], texts[1])
+        self.assertEqual(OcrPage.objects.count(), 2)
+
+    def test_cached_pages_are_not_recognized_again(self, image_to_string):
+        first, _ = ocr.ocr_pdf(self.path, [0, 1, 2])
+        image_to_string.reset_mock()
+
+        texts, recognized = ocr.ocr_pdf(self.path, [0, 1, 2])
+
+        self.assertEqual(recognized, 0)
+        image_to_string.assert_not_called()
+        self.assertEqual(texts, first)
+
+    def test_cached_text_is_used(self, image_to_string):
+        import fitz
+
+        with fitz.open(self.path) as document:
+            png = document[1].get_pixmap(dpi=20, colorspace=fitz.csGRAY).tobytes('png')
+        OcrPage.objects.create(content_hash=ocr.page_hash(png, 'eng'), text='from the cache')
+
+        texts, recognized = ocr.ocr_pdf(self.path, [1])
+
+        self.assertEqual(texts, {1: 'from the cache'})
+        self.assertEqual(recognized, 0)
+        image_to_string.assert_not_called()
+
+    def test_only_requested_pages_are_read(self, image_to_string):
+        texts, _ = ocr.ocr_pdf(self.path, [1])
+        self.assertEqual(list(texts), [1])
+
+
+@override_settings(OCR_WORKERS=2, OCR_MAX_PENDING=3)
+class RecognizedQueueTests(SimpleTestCase):
+    def setUp(self):
+        # Threads instead of spawned processes, so the patched tesseract applies
+        executor = ThreadPoolExecutor(2)
+        self.addCleanup(executor.shutdown)
+        patcher = mock.patch.object(ocr, '_executor', return_value=executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def slow_tesseract(self, image, lang='eng'):
+        time.sleep(0.01)
+        return _fake_tesseract(image, lang)
+
+    def test_images_waiting_for_a_worker_are_bounded(self):
+        received = []
+        queued = []
+
+        def images():
+            for shade in range(12):
+                # Images handed over so far that have no result yet
+                queued.append(shade - len(received))
+                yield shade, _png(shade)
+
+        with mock.patch('pytesseract.image_to_string', side_effect=self.slow_tesseract):
+            for key, text in ocr._recognized(images(), 'eng'):
+                received.append((key, text))
+
+        self.assertEqual(sorted(received), [(shade, f'shade {shade}') for shade in range(12)])
+        # The queue fills up to OCR_MAX_PENDING and no further
+        self.assertEqual(max(queued), 3)
+
+    def test_runs_inline_with_one_worker(self):
+        with override_settings(OCR_WORKERS=1), \
+                mock.patch('pytesseract.image_to_string', side_effect=_fake_tesseract):
+            results = list(ocr._recognized(((shade, _png(shade)) for shade in (10, 20)), 'eng'))
+        self.assertEqual(results, [(10, 'shade 10'), (20, 'shade 20')])
+        ocr._executor.assert_not_called()
@@ -0,0 +1,114 @@
+import random
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tracker import similarity
+from tracker.models import RequestAttachment
+
+WORDS = [f'word{i}' for i in range(2000)]
+
+
+def _text(seed, length=400):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def _edited(text, every):
+    """``text`` with every ``every``-th word replaced"""
+    words = text.split()
+    for i in range(0, len(words), every):
+        words[i] = 'edited'
+    return ' '.join(words)
+
+
+def _doc(pk, text):
+    return SimpleNamespace(pk=pk, extracted_text=text)
+
+
+class SimilarityTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(SIMILARITY_INDEX_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class SignatureTests(SimilarityTestCase):
+    def test_short_text_has_no_signature(self):
+        self.assertIsNone(similarity.signature('too few words'))
+        self.assertFalse(similarity.add(_doc(1, 'too few words')))
+
+    def test_signatures_of_same_and_unrelated_texts(self):
+        text = _text(1)
+        same = similarity.signature(text)
+        self.assertTrue((same == similarity.signature(text.upper())).all())
+        # Unrelated texts share next to no values
+        self.assertLess((same == similarity.signature(_text(2))).mean(), 0.05)
+
+
+class NearDuplicateTests(SimilarityTestCase):
+    def test_near_duplicates_are_found(self):
+        originals = {pk: _text(pk) for pk in range(1, 41)}
+        for pk, text in originals.items():
+            similarity.add(_doc(pk, text))
+
+        # One edit per 10 words leaves half of the 5-word shingles (Jaccard
+        # ~1/3); 64 bands of 2 rows should still recall every one
+        for pk, text in originals.items():
+            matches = similarity.similar(_doc(1000 + pk, _edited(text, 10)))
+            with self.subTest(pk=pk):
+                self.assertTrue(matches)
+                self.assertEqual(matches[0][0], pk)
+
+    def test_unrelated_documents_are_not_matched(self):
+        for pk in range(1, 21):
+            similarity.add(_doc(pk, _text(pk)))
+        self.assertEqual(similarity.similar(_doc(999, _text(999))), [])
+
+    def test_query_excludes_the_attachment_itself(self):
+        text = _text(1)
+        similarity.add(_doc(1, text))
+        similarity.add(_doc(2, text))
+        self.assertEqual(similarity.similar(_doc(1, text)), [(2, 1.0)])
+
+
+class IncrementalRefreshTests(SimilarityTestCase):
+    def test_appended_records_are_picked_up(self):
+        first, second = _text(1), _text(2)
+        similarity.add(_doc(1, first))
+        self.assertEqual(similarity.similar(_doc(99, first)), [(1, 1.0)])
+        offset = similarity._index.offset
+
+        similarity.add(_doc(2, second))
+        self.assertEqual(similarity.similar(_doc(99, second)), [(2, 1.0)])
+        # Only the new record was read
+        self.assertEqual(similarity._index.offset, 2 * offset)
+        self.assertEqual(len(similarity._index.ids), 2)
+
+    def test_reindexed_attachment_replaces_its_old_record(self):
+        old, new = _text(1), _text(2)
+        similarity.add(_doc(1, old))
+        self.assertEqual(similarity.similar(_doc(99, old)), [(1, 1.0)])
+
+        similarity.add(_doc(1, new))
+        self.assertEqual(similarity.similar(_doc(99, old)), [])
+        self.assertEqual(similarity.similar(_doc(99, new)), [(1, 1.0)])
+
+    def test_rebuild_reloads_and_drops_stale_entries(self):
+        kept = RequestAttachment.objects.create(
+            original_name='kept.pdf', size=1, status='complete',
+            extracted_text=_text(1), analyzed_at=timezone.now(),
+        )
+        deleted = _text(2)
+        similarity.add(kept)
+        similarity.add(_doc(kept.pk + 1, deleted))
+        self.assertEqual(len(similarity.similar(_doc(99, deleted))), 1)
+
+        self.assertEqual(similarity.rebuild(), 1)
+        self.assertEqual(similarity.similar(_doc(99, deleted)), [])
+        self.assertEqual(similarity.similar_attachments(_doc(99, kept.extracted_text)), [(kept, 1.0)])
@@ -0,0 +1,80 @@
+import threading
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from tracker.models import Customer, Workshop, WorkshopRegistration, WorkshopWaitlistEntry
+from tracker.workshops import ALREADY_REGISTERED, REGISTERED, WAITLISTED, reserve_seat, sync_seats
+
+
+class ReserveSeatConcurrencyTests(TransactionTestCase):
+    """Reservations made from several threads at once, each on its own connection"""
+
+    def make_workshop(self, seats):
+        workshop = Workshop.objects.create(
+            title='Thesis writing', description='Workshop',
+            date=timezone.now() + timedelta(days=7), max_participants=seats,
+        )
+        sync_seats([workshop.pk])
+        workshop.refresh_from_db()
+        return workshop
+
+    def make_customers(self, count):
+        return [
+            Customer.objects.create(full_name=f'Customer {i}', email=f'customer{i}@example.com')
+            for i in range(count)
+        ]
+
+    def reserve_concurrently(self, workshop, customers):
+        barrier = threading.Barrier(len(customers))
+        outcomes = [None] * len(customers)
+
+        def reserve(index, customer):
+            try:
+                barrier.wait()
+                outcomes[index] = reserve_seat(workshop, customer)[0]
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reserve, args=item) for item in enumerate(customers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_seats_are_not_oversold(self):
+        workshop = self.make_workshop(seats=3)
+        customers = self.make_customers(8)
+
+        outcomes = self.reserve_concurrently(workshop, customers)
+
+        self.assertEqual(outcomes.count(REGISTERED), 3)
+        self.assertEqual(outcomes.count(WAITLISTED), 5)
+        self.assertEqual(WorkshopRegistration.objects.filter(workshop=workshop, status='registered').count(), 3)
+        self.assertEqual(WorkshopWaitlistEntry.objects.filter(workshop=workshop).count(), 5)
+        workshop.refresh_from_db()
+        self.assertEqual(workshop.seats_left, 0)
+
+    def test_same_customer_twice_takes_one_seat(self):
+        workshop = self.make_workshop(seats=3)
+        customer, = self.make_customers(1)
+
+        outcomes = self.reserve_concurrently(workshop, [customer, customer])
+
+        self.assertEqual(sorted(outcomes), sorted([REGISTERED, ALREADY_REGISTERED]))
+        workshop.refresh_from_db()
+        self.assertEqual(workshop.seats_left, 2)
+
+    def test_same_customer_twice_after_cancelling_takes_one_seat(self):
+        workshop = self.make_workshop(seats=3)
+        customer, = self.make_customers(1)
+        WorkshopRegistration.objects.create(workshop=workshop, customer=customer, status='cancelled')
+
+        outcomes = self.reserve_concurrently(workshop, [customer, customer])
+
+        self.assertEqual(sorted(outcomes), sorted([REGISTERED, ALREADY_REGISTERED]))
+        workshop.refresh_from_db()
+        self.assertEqual(workshop.seats_left, 2)
@@ -24,6 +24,7 @@ frontend_patterns = [
     # Workshop URLs
     path('workshop/<int:pk>/', views_frontend.workshop_detail, name='workshop_detail'),
     path('workshop/<int:pk>/register/', views_frontend.register_workshop, name='register_workshop'),
+    path('workshop/<int:pk>/cancel/', views_frontend.cancel_workshop_registration, name='cancel_workshop_registration'),
     
     # Client Dashboard
     path('dashboard/', views_frontend.client_dashboard, name='client_dashboard'),
@@ -36,7 +37,9 @@ auth_patterns = [
     path('logout/', views.logout_view, name='logout'),
     path('password-reset/', PasswordResetView.as_view(
         template_name='password_reset.html',
-        email_template_name='password_reset_email.html'
+        subject_template_name='emails/password_reset_subject.txt',
+        email_template_name='emails/password_reset_email.txt',
+        html_email_template_name='emails/password_reset_email.html'
     ), name='password_reset'),
     path('password-reset/done/', PasswordResetDoneView.as_view(
         template_name='password_reset_done.html'
@@ -65,11 +68,15 @@ admin_patterns = [
     path('admin/consultancy/', views_frontend.admin_consultancy, name='admin_consultancy'),
     path('admin/clients/', views_frontend.admin_clients, name='admin_clients'),
     path('admin/requests/', views_frontend.admin_requests, name='admin_requests'),
+    path('admin/export/<slug:dataset>.<slug:fmt>', views_frontend.admin_export, name='admin_export'),
     path('admin/workshops/', views_frontend.admin_workshops, name='admin_workshops'),
     path('admin/zoom-appointments/', views_frontend.admin_zoom_appointments, name='admin_zoom_appointments'),
     path('admin/testimonials/', views_frontend.admin_testimonials, name='admin_testimonials'),
     path('admin/leadership/', views_frontend.admin_leadership, name='admin_leadership'),
     path('admin/reports/', views_frontend.admin_reports, name='admin_reports'),
+    path('admin/reports/pdf/', views_frontend.admin_report_pdf, name='admin_report_pdf'),
+    path('admin/reports/pdf/<str:key>/', views_frontend.admin_report_pdf_status, name='admin_report_pdf_status'),
+    path('admin/reports/pdf/<str:key>/download/', views_frontend.admin_report_pdf_download, name='admin_report_pdf_download'),
 ]
 
 # API URLs (JSON responses for AJAX)
@@ -80,6 +87,9 @@ api_patterns = [
     path('api/get-testimonials/', views.get_testimonials_json, name='get_testimonials_api'),
     path('api/get-workshops/', views.get_workshops_json, name='get_workshops_api'),
     path('api/submit-contact/', views.submit_contact_ajax, name='submit_contact_ajax'),
+    path('api/uploads/', views.start_attachment_upload, name='start_attachment_upload'),
+    path('api/uploads/<uuid:upload_id>/', views.attachment_upload, name='attachment_upload'),
+    path('api/uploads/<uuid:upload_id>/download/', views.download_attachment, name='download_attachment'),
 ]
 
 urlpatterns = frontend_patterns + auth_patterns + profile_patterns + admin_patterns + api_patterns
@@ -3,10 +3,10 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
 from django.views.decorators.http import require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Q
+from django.db.models import Count, Q
 from django.core.paginator import Paginator
 from django.utils import timezone
 from django.conf import settings
@@ -14,13 +14,19 @@ import json
 
 from .models import (
     Customer, UserProfile, ResearchService, ConsultancySubService,
-    ServiceRequest, Workshop, WorkshopRegistration, ClientTestimonial
+    ServiceRequest, Workshop, WorkshopRegistration, ClientTestimonial,
+    RequestAttachment,
 )
 from .forms import (
     CustomUserCreationForm, CustomUserLoginForm, CustomPasswordChangeForm,
     CustomerProfileForm, UserProfileForm, ServiceRequestForm,
     ContactForm
 )
+from . import attachments
+from .availability import availability_index
+from .customers import ensure_customer, ensure_user_profile, upsert_customer
+from .intake import submit_request
+from .payload_cache import payload_response
 
 
 # ============================================================================
@@ -39,30 +45,18 @@ def user_register(request):
             user = form.save()
             phone = form.cleaned_data.get('phone', '')
             email = form.cleaned_data.get('email')
-            password = form.cleaned_data.get('password1')
-
-            # Create customer profile with phone
-            Customer.objects.get_or_create(
-                email=email,
-                defaults={
-                    'full_name': email.split('@')[0],
-                    'phone': phone,
-                    'user': user
-                }
-            )
+
+            # Create customer profile with phone (or link an existing one)
+            upsert_customer(email=email, full_name=email.split('@')[0], phone=phone, user=user)
 
             # Create user profile
             UserProfile.objects.get_or_create(user=user)
 
-            # Auto-login the user after registration
-            user = authenticate(request, username=email, password=password)
-            if user is not None:
-                login(request, user)
-                messages.success(request, 'Account created successfully!')
-                return redirect('home')
-            else:
-                messages.success(request, 'Account created successfully! Please log in.')
-                return redirect('login')
+            # Auto-login the user after registration. The password was just
+            # hashed by form.save(), so skip authenticate() and its second hash.
+            login(request, user, backend='tracker.backends.EmailBackend')
+            messages.success(request, 'Account created successfully!')
+            return redirect('home')
         else:
             # Add form errors to messages
             for field, errors in form.errors.items():
@@ -91,15 +85,8 @@ def user_login(request):
             password = form.cleaned_data.get('password')
             remember_me = form.cleaned_data.get('remember_me')
 
-            user = None
-            if identifier and '@' in identifier:
-                try:
-                    matched_user = User.objects.get(email__iexact=identifier)
-                    user = authenticate(request, username=matched_user.username, password=password)
-                except User.DoesNotExist:
-                    user = authenticate(request, username=identifier, password=password)
-            else:
-                user = authenticate(request, username=identifier, password=password)
+            # EmailBackend resolves email or username in a single query
+            user = authenticate(request, username=identifier, password=password)
 
             if user is not None:
                 login(request, user)
@@ -143,34 +130,26 @@ def logout_view(request):
 @login_required
 def user_profile(request):
     """View user profile"""
-    user = request.user
-
-    # Get or create customer
-    customer, _ = Customer.objects.get_or_create(
-        email=user.email,
-        defaults={
-            'full_name': user.get_full_name() or user.email.split('@')[0],
-            'phone': '',
-            'user': user,
-        }
-    )
-
-    # Get or create user profile
-    user_profile, _ = UserProfile.objects.get_or_create(user=user)
+    # Resolved lazily by CustomerMiddleware; nothing is created on a GET
+    customer = request.customer
+    user_profile = request.user_profile
 
     # Get user statistics
-    service_requests = ServiceRequest.objects.filter(customer=customer)
-    completed_requests = service_requests.filter(status='completed').count()
-    pending_requests = service_requests.filter(status='pending').count()
-    workshop_registrations = WorkshopRegistration.objects.filter(customer=customer)
+    completed_requests = pending_requests = total_requests = workshop_count = 0
+    if customer.pk:
+        service_requests = ServiceRequest.objects.filter(customer=customer)
+        completed_requests = service_requests.filter(status='completed').count()
+        pending_requests = service_requests.filter(status='pending').count()
+        total_requests = service_requests.count()
+        workshop_count = WorkshopRegistration.objects.filter(customer=customer).count()
 
     context = {
         'customer': customer,
         'user_profile': user_profile,
         'completed_requests': completed_requests,
         'pending_requests': pending_requests,
-        'total_requests': service_requests.count(),
-        'workshop_count': workshop_registrations.count(),
+        'total_requests': total_requests,
+        'workshop_count': workshop_count,
     }
     return render(request, 'profile.html', context)
 
@@ -180,20 +159,10 @@ def edit_profile(request):
     """Edit user profile"""
     user = request.user
 
-    # Get or create customer
-    customer, _ = Customer.objects.get_or_create(
-        email=user.email,
-        defaults={
-            'full_name': user.get_full_name() or user.email.split('@')[0],
-            'phone': '',
-            'user': user,
-        }
-    )
-
-    # Get or create user profile
-    user_profile, _ = UserProfile.objects.get_or_create(user=user)
-    
     if request.method == 'POST':
+        customer = ensure_customer(request)
+        user_profile = ensure_user_profile(request)
+
         customer_form = CustomerProfileForm(request.POST, instance=customer)
         user_profile_form = UserProfileForm(request.POST, request.FILES, instance=user_profile)
         
@@ -209,6 +178,8 @@ def edit_profile(request):
             messages.success(request, 'Profile updated successfully!')
             return redirect('user_profile')
     else:
+        customer = request.customer
+        user_profile = request.user_profile
         customer_form = CustomerProfileForm(instance=customer)
         user_profile_form = UserProfileForm(instance=user_profile)
     
@@ -243,13 +214,14 @@ def change_password(request):
 @login_required
 def user_settings(request):
     """User account settings"""
-    user_profile, _ = UserProfile.objects.get_or_create(user=request.user)
+    user_profile = request.user_profile
     
     if request.method == 'POST':
         # Handle various settings updates
         action = request.POST.get('action')
         
         if action == 'newsletter':
+            user_profile = ensure_user_profile(request)
             user_profile.newsletter_subscribed = 'newsletter' in request.POST
             user_profile.save()
             messages.success(request, 'Newsletter preference updated!')
@@ -278,7 +250,7 @@ def check_username_availability(request):
                 'message': 'Username must be at least 3 characters'
             })
         
-        if User.objects.filter(username=username).exists():
+        if availability_index.username_taken(username):
             return JsonResponse({
                 'available': False,
                 'message': 'This username is already taken'
@@ -309,7 +281,7 @@ def check_email_availability(request):
                 'message': 'Please enter a valid email'
             })
         
-        if User.objects.filter(email=email).exists() or Customer.objects.filter(email=email).exists():
+        if availability_index.email_taken(email):
             return JsonResponse({
                 'available': False,
                 'message': 'This email is already registered'
@@ -328,28 +300,9 @@ def check_email_availability(request):
 
 @require_http_methods(["GET"])
 def get_services_json(request):
-    """Get services list as JSON"""
-    category = request.GET.get('category')
-    services = ResearchService.objects.filter(is_active=True)
-    
-    if category:
-        services = services.filter(category=category)
-    
-    services_list = [
-        {
-            'id': service.id,
-            'name': service.name,
-            'category': service.category,
-            'description': service.description,
-            'icon': service.icon,
-            'price_from': str(service.price_from) if service.price_from else None,
-            'price_to': str(service.price_to) if service.price_to else None,
-            'turnaround_time': service.turnaround_time,
-        }
-        for service in services
-    ]
-    
-    return JsonResponse({'services': services_list})
+    """Get services list as JSON (served from the precomputed payload cache)"""
+    category = request.GET.get('category') or ''
+    return payload_response(request, 'services', category)
 
 
 @require_http_methods(["GET"])
@@ -379,6 +332,8 @@ def get_workshops_json(request):
     workshops = Workshop.objects.filter(
         is_active=True,
         date__gte=timezone.now()
+    ).annotate(
+        registered_count=Count('registrations', filter=Q(registrations__status='registered'))
     ).order_by('date')[:10]
     
     workshops_list = [
@@ -389,7 +344,7 @@ def get_workshops_json(request):
             'location': w.location,
             'is_online': w.is_online,
             'price': str(w.price) if w.price else '0',
-            'registered_count': w.get_registration_count(),
+            'registered_count': w.registered_count,
             'is_full': w.is_full(),
         }
         for w in workshops
@@ -407,30 +362,18 @@ def submit_contact_ajax(request):
         
         form = ContactForm(data)
         if form.is_valid():
-            # Create service request
-            customer, _ = Customer.objects.get_or_create(
-                email=form.cleaned_data['email'],
-                defaults={
-                    'full_name': form.cleaned_data['full_name'],
-                    'phone': form.cleaned_data.get('phone', '')
-                }
-            )
-            
-            service_id = form.cleaned_data.get('service')
-            service = None
-            if service_id:
-                try:
-                    service = ResearchService.objects.get(id=service_id)
-                except ResearchService.DoesNotExist:
-                    pass
-            
-            ServiceRequest.objects.create(
-                customer=customer,
-                service=service,
-                title=form.cleaned_data['subject'],
-                description=form.cleaned_data['message'],
-                status='pending'
-            )
+            service = form.cleaned_data.get('service')
+            payload = {
+                'email': form.cleaned_data['email'],
+                'full_name': form.cleaned_data['full_name'],
+                'phone': form.cleaned_data.get('phone', ''),
+                'service_id': service.id if service else None,
+                'title': form.cleaned_data['subject'],
+                'description': form.cleaned_data['message'],
+            }
+
+            # Spooled for the intake worker; the request row is written behind
+            submit_request(payload, client_key=request.headers.get('Idempotency-Key', ''))
             
             return JsonResponse({
                 'success': True,
@@ -456,3 +399,82 @@ def submit_contact_ajax(request):
             'success': False,
             'message': f'Error: {str(e)}'
         }, status=500)
+
+
+# ============================================================================
+# ATTACHMENT UPLOADS
+# ============================================================================
+
+def _upload_json(attachment):
+    return {
+        'id': str(attachment.upload_id),
+        'name': attachment.original_name,
+        'size': attachment.size,
+        'offset': attachments.received_bytes(attachment),
+        'status': attachment.status,
+        'chunk_size': settings.ATTACHMENT_CHUNK_SIZE,
+    }
+
+
+@login_required
+@require_POST
+def start_attachment_upload(request):
+    """Start a chunked upload from ``{"name", "size", "content_type", "checksum"}``"""
+    try:
+        data = json.loads(request.body)
+        attachment = attachments.start_upload(
+            request.user,
+            name=data.get('name', ''),
+            size=data.get('size'),
+            content_type=data.get('content_type', ''),
+            checksum=data.get('checksum', ''),
+        )
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Invalid request format'}, status=400)
+    except attachments.UploadError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=e.status)
+    return JsonResponse({'success': True, **_upload_json(attachment)}, status=201)
+
+
+@login_required
+@require_http_methods(["GET", "PUT", "DELETE"])
+def attachment_upload(request, upload_id):
+    """Resume point (GET), next chunk (PUT) or cancellation (DELETE) of an upload.
+
+    A chunk is the raw request body, with the byte offset it starts at in
+    ``Upload-Offset`` and optionally ``Upload-Checksum: sha256 <hex digest>``.
+    """
+    attachment = get_object_or_404(RequestAttachment, upload_id=upload_id, uploaded_by=request.user)
+
+    if request.method == 'DELETE':
+        if attachment.service_request_id:
+            return JsonResponse({'success': False, 'message': 'Attachment belongs to a submitted request'}, status=409)
+        attachments.delete_upload(attachment)
+        return JsonResponse({'success': True})
+
+    if request.method == 'PUT':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length') or 0)
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Upload-Offset header is required'}, status=400)
+        algorithm, _, chunk_checksum = request.headers.get('Upload-Checksum', '').partition(' ')
+        if algorithm and algorithm.lower() != 'sha256':
+            return JsonResponse({'success': False, 'message': 'Only sha256 chunk checksums are supported'}, status=400)
+        try:
+            # The body is read straight from the WSGI stream, never buffered whole
+            attachments.write_chunk(attachment, offset, request, length, chunk_checksum.strip())
+        except attachments.UploadError as e:
+            return JsonResponse({'success': False, 'message': str(e), **_upload_json(attachment)}, status=e.status)
+
+    return JsonResponse({'success': True, **_upload_json(attachment)})
+
+
+@login_required
+@require_http_methods(["GET"])
+def download_attachment(request, upload_id):
+    """Attachment file, for its uploader and staff"""
+    attachment = get_object_or_404(RequestAttachment, upload_id=upload_id, status='complete')
+    if not request.user.is_staff and attachment.uploaded_by_id != request.user.pk:
+        raise Http404
+    return FileResponse(attachment.file.open('rb'), as_attachment=True, filename=attachment.original_name)
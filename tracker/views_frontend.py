@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
 from django.utils import timezone
@@ -10,6 +12,21 @@ from .models import (
     Workshop, WorkshopRegistration, Customer, ZoomAppointment, ServiceImage,
     TutorialVideo, ServiceFAQ
 )
+from .attachments import claim_uploads
+from .customers import ensure_customer
+from .exports import DATASETS, FORMATS, export_response, filter_customers, filter_service_requests
+from .images import image_url
+from .intake import submit_request, validate_request_payload
+from . import reports
+from .workshops import (
+    REGISTERED, ALREADY_REGISTERED, WAITLISTED,
+    reserve_seat, cancel_registration, leave_waitlist, waitlist_position,
+)
+
+
+def _hot_page_engine():
+    """Template engine for the high-traffic public pages (see tracker.jinja2_env)"""
+    return 'jinja2' if getattr(settings, 'JINJA2_HOT_PAGES', False) else None
 
 
 def _auto_generate_testimonials():
@@ -94,7 +111,7 @@ def home(request):
         'process_steps': process_steps,
         'company': company,
     }
-    return render(request, 'home.html', context)
+    return render(request, 'home.html', context, using=_hot_page_engine())
 
 
 def services(request):
@@ -153,7 +170,7 @@ def services(request):
 
         # Set image URL with fallback
         if featured:
-            service_image_urls[service.id] = featured.image.url
+            service_image_urls[service.id] = image_url(featured.image.name, 960)
         else:
             # Use default image based on category
             service_image_urls[service.id] = default_images.get(service.category, default_images['default'])
@@ -168,7 +185,7 @@ def services(request):
         'service_images': service_images,
         'service_image_urls': service_image_urls,
     }
-    return render(request, 'services.html', context)
+    return render(request, 'services.html', context, using=_hot_page_engine())
 
 
 def service_detail(request, pk):
@@ -205,7 +222,7 @@ def service_detail(request, pk):
     all_images = service.images.all().order_by('display_order')
 
     # Get featured image URL with fallback
-    featured_image_url = featured_image.image.url if featured_image else default_images.get(service.category, default_images['default'])
+    featured_image_url = image_url(featured_image.image.name, 1280) if featured_image else default_images.get(service.category, default_images['default'])
 
     # Get tutorial videos
     tutorial_videos = service.tutorial_videos.filter(is_published=True).order_by('display_order')
@@ -223,7 +240,7 @@ def service_detail(request, pk):
         'tutorial_videos': tutorial_videos,
         'faqs': faqs,
     }
-    return render(request, 'service_detail.html', context)
+    return render(request, 'service_detail.html', context, using=_hot_page_engine())
 
 
 def contact(request):
@@ -240,35 +257,23 @@ def contact(request):
             messages.error(request, 'Please fill in all required fields.')
             return redirect('contact')
         
-        try:
-            # Find or create customer
-            customer, _ = Customer.objects.get_or_create(
-                full_name=full_name,
-                phone=phone or '',
-                defaults={'email': email}
-            )
-            
-            # Create service request
-            service_req = ServiceRequest.objects.create(
-                customer=customer,
-                title=subject,
-                description=message,
-                status='pending'
-            )
-            
-            if service_id:
-                try:
-                    service = ResearchService.objects.get(id=service_id)
-                    service_req.service = service
-                    service_req.save()
-                except ResearchService.DoesNotExist:
-                    pass
-            
-            messages.success(request, 'Thank you! We\'ll get back to you soon.')
-            return redirect('home')
-        except Exception as e:
-            messages.error(request, f'Error submitting contact form: {str(e)}')
+        payload = {
+            'email': email,
+            'full_name': full_name,
+            'phone': phone,
+            'service_id': int(service_id) if service_id.isdigit() else None,
+            'title': subject,
+            'description': message,
+        }
+        error = validate_request_payload(payload)
+        if error:
+            messages.error(request, error)
             return redirect('contact')
+
+        # Spooled for the intake worker; the request row is written behind
+        submit_request(payload, client_key=request.POST.get('idempotency_key', ''))
+        messages.success(request, 'Thank you! We\'ll get back to you soon.')
+        return redirect('home')
     
     services = ResearchService.objects.filter(is_active=True).order_by('name')
     context = {'services': services}
@@ -313,29 +318,33 @@ def service_request(request, pk):
             messages.error(request, 'Please provide a title and description.')
             return redirect('service_detail', pk=service.id)
 
-        try:
-            # Get or create customer by email
-            customer, _ = Customer.objects.get_or_create(
-                email=request.user.email,
-                defaults={'full_name': request.user.get_full_name() or request.user.username, 'phone': ''}
-            )
-
-            service_req = ServiceRequest.objects.create(
-                customer=customer,
-                service=service,
-                title=title,
-                description=description,
-                deadline=deadline or None,
-                budget=budget or None,
-                status='pending'
-            )
-            messages.success(request, 'Service request submitted successfully!')
-            return redirect('client_dashboard')
-        except Exception as e:
-            messages.error(request, f'Error submitting request: {str(e)}')
+        payload = {
+            'email': request.user.email or request.customer.email,
+            'full_name': request.user.get_full_name() or request.user.username,
+            'phone': '',
+            'service_id': service.id,
+            'title': title,
+            'description': description,
+            'deadline': deadline,
+            'budget': budget,
+            'user_id': request.user.pk,
+        }
+        error = validate_request_payload(payload)
+        if error:
+            messages.error(request, f'Error submitting request: {error}')
             return redirect('service_detail', pk=service.id)
 
-    context = {'service': service}
+        key = submit_request(payload, client_key=request.POST.get('idempotency_key', ''))
+        claim_uploads(request.user, request.POST.getlist('attachment_ids'), key)
+        messages.success(request, 'Service request submitted successfully!')
+        return redirect('client_dashboard')
+
+    context = {
+        'service': service,
+        'accepts_attachments': service.category in settings.ATTACHMENT_CATEGORIES,
+        'attachment_extensions': ','.join(settings.ATTACHMENT_EXTENSIONS),
+        'attachment_max_size': settings.ATTACHMENT_MAX_SIZE,
+    }
     return render(request, 'service_request.html', context)
 
 
@@ -344,15 +353,15 @@ def workshop_detail(request, pk):
     workshop = get_object_or_404(Workshop, pk=pk, is_active=True)
 
     is_registered = False
-    if request.user.is_authenticated:
-        try:
-            customer = Customer.objects.get(email=request.user.email)
-            is_registered = WorkshopRegistration.objects.filter(
-                workshop=workshop,
-                customer=customer
-            ).exists()
-        except Customer.DoesNotExist:
-            pass
+    waitlist_pos = None
+    if request.user.is_authenticated and request.customer.pk:
+        is_registered = WorkshopRegistration.objects.filter(
+            workshop=workshop,
+            customer=request.customer,
+            status='registered',
+        ).exists()
+        if not is_registered:
+            waitlist_pos = waitlist_position(workshop, request.customer)
 
     # Get Zoom appointment if workshop is online
     zoom_appointment = None
@@ -365,6 +374,7 @@ def workshop_detail(request, pk):
     context = {
         'workshop': workshop,
         'is_registered': is_registered,
+        'waitlist_position': waitlist_pos,
         'zoom_appointment': zoom_appointment,
     }
     return render(request, 'workshop_detail.html', context)
@@ -376,23 +386,20 @@ def register_workshop(request, pk):
     workshop = get_object_or_404(Workshop, pk=pk, is_active=True)
 
     try:
-        # Get or create customer by email
-        customer, _ = Customer.objects.get_or_create(
-            email=request.user.email,
-            defaults={'full_name': request.user.get_full_name() or request.user.username, 'phone': ''}
-        )
-
-        # Check if already registered
-        registration, created = WorkshopRegistration.objects.get_or_create(
-            workshop=workshop,
-            customer=customer,
-            defaults={'status': 'registered'}
-        )
+        customer = ensure_customer(request)
+
+        outcome, _ = reserve_seat(workshop, customer)
 
-        if created:
+        if outcome == REGISTERED:
             messages.success(request, 'Successfully registered for the workshop!')
-        else:
+        elif outcome == ALREADY_REGISTERED:
             messages.info(request, 'You are already registered for this workshop.')
+        else:
+            position = waitlist_position(workshop, customer)
+            if outcome == WAITLISTED:
+                messages.info(request, f'This workshop is full. You have been added to the waitlist (position {position}).')
+            else:
+                messages.info(request, f'You are already on the waitlist (position {position}).')
 
         return redirect('workshop_detail', pk=workshop.id)
     except Exception as e:
@@ -400,26 +407,41 @@ def register_workshop(request, pk):
         return redirect('workshop_detail', pk=workshop.id)
 
 
+@login_required
+@require_http_methods(["POST"])
+def cancel_workshop_registration(request, pk):
+    """Cancel a workshop registration or leave its waitlist"""
+    workshop = get_object_or_404(Workshop, pk=pk)
+    customer = request.customer
+
+    registration = None
+    if customer.pk:
+        registration = WorkshopRegistration.objects.filter(
+            workshop=workshop, customer=customer, status='registered'
+        ).first()
+
+    if registration and cancel_registration(registration):
+        messages.success(request, 'Your workshop registration has been cancelled.')
+    elif customer.pk and leave_waitlist(workshop, customer):
+        messages.success(request, 'You have left the waitlist for this workshop.')
+    else:
+        messages.info(request, 'You are not registered for this workshop.')
+    return redirect('workshop_detail', pk=workshop.id)
+
+
 @login_required
 def client_dashboard(request):
     """Client dashboard with their service requests"""
-    # Get or create customer profile
-    customer, created = Customer.objects.get_or_create(
-        email=request.user.email,
-        defaults={
-            'full_name': request.user.get_full_name() or request.user.email.split('@')[0],
-            'phone': '',
-            'user': request.user,
-        }
-    )
+    customer = request.customer
 
-    # If customer was just created, redirect to profile to complete setup
-    if created:
+    # No customer row yet: nothing to list, and nothing is written on a GET
+    if not customer.pk:
         messages.info(request, 'Welcome! Please complete your profile.')
-        return redirect('user_profile')
-
-    service_requests = ServiceRequest.objects.filter(customer=customer).order_by('-created_at')
-    workshop_registrations = WorkshopRegistration.objects.filter(customer=customer).order_by('-registered_at')
+        service_requests = ServiceRequest.objects.none()
+        workshop_registrations = WorkshopRegistration.objects.none()
+    else:
+        service_requests = ServiceRequest.objects.filter(customer=customer).order_by('-created_at')
+        workshop_registrations = WorkshopRegistration.objects.filter(customer=customer).order_by('-registered_at')
 
     context = {
         'service_requests': service_requests,
@@ -654,7 +676,7 @@ def admin_clients(request):
 
         return redirect('admin_clients')
 
-    customers = Customer.objects.all().order_by('-registration_date')
+    customers = filter_customers(Customer.objects.all().order_by('-registration_date'), request.GET)
     new_this_month = Customer.objects.filter(
         registration_date__month=timezone.now().month,
         registration_date__year=timezone.now().year
@@ -678,7 +700,9 @@ def admin_requests(request):
         messages.error(request, 'You do not have permission to access this page.')
         return redirect('home')
     
-    service_requests = ServiceRequest.objects.all().order_by('-created_at')
+    service_requests = filter_service_requests(
+        ServiceRequest.objects.select_related('customer', 'service').order_by('-created_at'), request.GET
+    )
     
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -709,6 +733,17 @@ def admin_requests(request):
     return render(request, 'admin/requests.html', context)
 
 
+@login_required
+def admin_export(request, dataset, fmt):
+    """Stream an admin table as CSV or XLSX, filtered like its list view"""
+    if not request.user.is_staff:
+        messages.error(request, 'You do not have permission to access this page.')
+        return redirect('home')
+    if dataset not in DATASETS or fmt not in FORMATS:
+        raise Http404('Unknown export')
+    return export_response(dataset, fmt, request.GET)
+
+
 @login_required
 def admin_workshops(request):
     """Admin workshops management"""
@@ -815,107 +850,76 @@ def admin_reports(request):
         messages.error(request, 'You do not have permission to access this page.')
         return redirect('home')
 
-    from django.db.models import Count
+    period = request.GET.get('period')
+    if period not in reports.PERIODS:
+        period = reports.DEFAULT_PERIOD
+    report = reports.report_data(period)
+    metrics = report['metrics']
+    context = {
+        'report': report,
+        'periods': [(value, label) for value, (label, _) in reports.PERIODS.items()],
+        'period': period,
+        'metrics': metrics,
+        'top_services': report['top_services'],
+        'statuses': report['statuses'],
+        'segments': [
+            (label, count, round(count / max(report['totals']['clients'], 1) * 100, 1))
+            for label, count in report['segments']
+        ],
+    }
+    return render(request, 'admin/reports.html', context)
 
-    # Key metrics
-    total_clients = Customer.objects.count()
-    total_service_requests = ServiceRequest.objects.count()
-    completed_services = ServiceRequest.objects.filter(status='completed').count()
-    workshop_attendees = WorkshopRegistration.objects.filter(status='attended').count()
-
-    # Calculate month-over-month changes
-    current_month = timezone.now().month
-    current_year = timezone.now().year
-    last_month = current_month - 1 if current_month > 1 else 12
-    last_year = current_year if current_month > 1 else current_year - 1
-
-    current_month_clients = Customer.objects.filter(
-        registration_date__month=current_month,
-        registration_date__year=current_year
-    ).count()
-    last_month_clients = Customer.objects.filter(
-        registration_date__month=last_month,
-        registration_date__year=last_year
-    ).count()
-    client_change = ((current_month_clients - last_month_clients) / max(last_month_clients, 1)) * 100 if last_month_clients > 0 else 100 if current_month_clients > 0 else 0
 
-    current_month_requests = ServiceRequest.objects.filter(
-        created_at__month=current_month,
-        created_at__year=current_year
-    ).count()
-    last_month_requests = ServiceRequest.objects.filter(
-        created_at__month=last_month,
-        created_at__year=last_year
-    ).count()
-    request_change = ((current_month_requests - last_month_requests) / max(last_month_requests, 1)) * 100 if last_month_requests > 0 else 100 if current_month_requests > 0 else 0
+def _report_job(key, status, error=''):
+    return JsonResponse({
+        'key': key,
+        'status': status,
+        'error': error,
+        'status_url': reverse('admin_report_pdf_status', args=[key]),
+        'download_url': reverse('admin_report_pdf_download', args=[key]) if status == reports.READY else '',
+    })
 
-    current_month_completed = ServiceRequest.objects.filter(
-        status='completed',
-        completed_at__month=current_month,
-        completed_at__year=current_year
-    ).count()
-    last_month_completed = ServiceRequest.objects.filter(
-        status='completed',
-        completed_at__month=last_month,
-        completed_at__year=last_year
-    ).count()
-    completed_change = ((current_month_completed - last_month_completed) / max(last_month_completed, 1)) * 100 if last_month_completed > 0 else 100 if current_month_completed > 0 else 0
 
-    current_month_attendees = WorkshopRegistration.objects.filter(
-        attended_at__month=current_month,
-        attended_at__year=current_year
-    ).count()
-    last_month_attendees = WorkshopRegistration.objects.filter(
-        attended_at__month=last_month,
-        attended_at__year=last_year
-    ).count()
-    attendee_change = ((current_month_attendees - last_month_attendees) / max(last_month_attendees, 1)) * 100 if last_month_attendees > 0 else 100 if current_month_attendees > 0 else 0
-
-    # Top services by request count
-    top_services = ResearchService.objects.annotate(
-        request_count=Count('service_requests')
-    ).order_by('-request_count')[:5]
+@login_required
+@require_http_methods(["POST"])
+def admin_report_pdf(request):
+    """Queue the PDF of a report period (rendered in the background)"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    period = request.POST.get('period')
+    if period not in reports.PERIODS:
+        period = reports.DEFAULT_PERIOD
+    key, status = reports.request_report(period)
+    return _report_job(key, status)
 
-    # Customer segments
-    individual_customers = Customer.objects.filter(customer_type='individual').count()
-    organization_customers = Customer.objects.filter(customer_type='organization').count()
-    total_customers = individual_customers + organization_customers
 
-    individual_percentage = (individual_customers / total_customers * 100) if total_customers > 0 else 0
-    organization_percentage = (organization_customers / total_customers * 100) if total_customers > 0 else 0
+@login_required
+def admin_report_pdf_status(request, key):
+    """Poll a queued report PDF"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    try:
+        status, error = reports.report_status(key)
+    except ValueError:
+        status, error = None, ''
+    if status is None:
+        return JsonResponse({'error': 'Unknown report'}, status=404)
+    return _report_job(key, status, error)
 
-    # Request status distribution
-    pending_count = ServiceRequest.objects.filter(status='pending').count()
-    accepted_count = ServiceRequest.objects.filter(status='accepted').count()
-    in_progress_count = ServiceRequest.objects.filter(status='in_progress').count()
-    completed_count = ServiceRequest.objects.filter(status='completed').count()
-    cancelled_count = ServiceRequest.objects.filter(status='cancelled').count()
 
-    context = {
-        'total_clients': total_clients,
-        'current_month_clients': current_month_clients,
-        'client_change': round(client_change, 1),
-        'total_service_requests': total_service_requests,
-        'current_month_requests': current_month_requests,
-        'request_change': round(request_change, 1),
-        'completed_services': completed_services,
-        'current_month_completed': current_month_completed,
-        'completed_change': round(completed_change, 1),
-        'workshop_attendees': workshop_attendees,
-        'current_month_attendees': current_month_attendees,
-        'attendee_change': round(attendee_change, 1),
-        'top_services': top_services,
-        'individual_customers': individual_customers,
-        'organization_customers': organization_customers,
-        'individual_percentage': round(individual_percentage, 1),
-        'organization_percentage': round(organization_percentage, 1),
-        'pending_count': pending_count,
-        'accepted_count': accepted_count,
-        'in_progress_count': in_progress_count,
-        'completed_count': completed_count,
-        'cancelled_count': cancelled_count,
-    }
-    return render(request, 'admin/reports.html', context)
+@login_required
+def admin_report_pdf_download(request, key):
+    if not request.user.is_staff:
+        messages.error(request, 'You do not have permission to access this page.')
+        return redirect('home')
+    try:
+        path = reports.report_path(key)
+    except ValueError:
+        raise Http404('Unknown report')
+    if not path.exists():
+        raise Http404('Report not ready')
+    return FileResponse(path.open('rb'), as_attachment=True, filename=f'report-{key}.pdf',
+                        content_type='application/pdf')
 
 
 @login_required
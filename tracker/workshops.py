@@ -0,0 +1,199 @@
+"""Workshop seat reservation and waitlist.
+
+``Workshop.seats_left`` is the seat counter. A seat is taken with a single
+conditional ``UPDATE ... SET seats_left = seats_left - 1 WHERE seats_left > 0``,
+so concurrent registrations can never oversell: the database applies the
+updates one at a time and the last seat goes to exactly one of them. Workshops
+without ``max_participants`` keep ``seats_left`` empty and never fill up.
+
+When a workshop is full the customer joins a FIFO waitlist instead. A
+cancelled registration hands its seat straight to the head of the waitlist.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.urls import reverse
+
+from .models import Notification, Workshop, WorkshopRegistration, WorkshopWaitlistEntry
+
+# Registration statuses that occupy a seat
+SEAT_HOLDING_STATUSES = ('registered', 'attended')
+
+REGISTERED = 'registered'
+ALREADY_REGISTERED = 'already_registered'
+WAITLISTED = 'waitlisted'
+ALREADY_WAITLISTED = 'already_waitlisted'
+
+
+def _take_seat(workshop_id):
+    """Claim one seat in a single statement; True when a seat was claimed"""
+    return Workshop.objects.filter(
+        Q(seats_left__isnull=True) | Q(seats_left__gt=0), pk=workshop_id,
+    ).update(seats_left=F('seats_left') - 1) == 1
+
+
+def _give_back_seat(workshop_id):
+    Workshop.objects.filter(pk=workshop_id, seats_left__isnull=False).update(
+        seats_left=Least(F('seats_left') + 1, F('max_participants'))
+    )
+
+
+def _register(workshop_id, customer_id, special_requirements=''):
+    """Create or reactivate the registration once a seat is held"""
+    registration = WorkshopRegistration.objects.filter(workshop_id=workshop_id, customer_id=customer_id).first()
+    if registration is None:
+        registration = WorkshopRegistration.objects.create(
+            workshop_id=workshop_id,
+            customer_id=customer_id,
+            status='registered',
+            special_requirements=special_requirements,
+        )
+    else:
+        registration.status = 'registered'
+        if special_requirements:
+            registration.special_requirements = special_requirements
+        registration.save(update_fields=['status', 'special_requirements'])
+    WorkshopWaitlistEntry.objects.filter(workshop_id=workshop_id, customer_id=customer_id).delete()
+    return registration
+
+
+def reserve_seat(workshop, customer, special_requirements=''):
+    """Register ``customer`` for ``workshop``, or waitlist them when it's full.
+
+    Returns ``(outcome, obj)`` where ``outcome`` is one of ``REGISTERED``,
+    ``ALREADY_REGISTERED``, ``WAITLISTED`` or ``ALREADY_WAITLISTED`` and
+    ``obj`` is the registration or waitlist entry.
+    """
+    registration = WorkshopRegistration.objects.filter(workshop=workshop, customer=customer).first()
+    if registration is not None and registration.status in SEAT_HOLDING_STATUSES:
+        return ALREADY_REGISTERED, registration
+
+    try:
+        with transaction.atomic():
+            # Write first, so SQLite takes its write lock up front instead of
+            # failing to upgrade a read transaction under contention. The
+            # update also locks the workshop row, so reservations for it
+            # queue here until this one commits.
+            took_seat = _take_seat(workshop.pk)
+
+            # Check again under that lock: a concurrent submission by the same
+            # customer may have registered them since the check above
+            registration = WorkshopRegistration.objects.select_for_update().filter(
+                workshop=workshop, customer=customer,
+            ).first()
+            if registration is not None and registration.status in SEAT_HOLDING_STATUSES:
+                if took_seat:
+                    _give_back_seat(workshop.pk)
+                return ALREADY_REGISTERED, registration
+
+            if took_seat:
+                return REGISTERED, _register(workshop.pk, customer.pk, special_requirements)
+
+            entry, created = WorkshopWaitlistEntry.objects.get_or_create(
+                workshop=workshop,
+                customer=customer,
+                defaults={'special_requirements': special_requirements},
+            )
+            return (WAITLISTED if created else ALREADY_WAITLISTED), entry
+    except IntegrityError:
+        # A concurrent request registered the same customer; the seat taken
+        # above was rolled back with the transaction
+        registration = WorkshopRegistration.objects.get(workshop=workshop, customer=customer)
+        return ALREADY_REGISTERED, registration
+
+
+def waitlist_position(workshop, customer):
+    """1-based position of ``customer`` on the waitlist, or None"""
+    entry = WorkshopWaitlistEntry.objects.filter(workshop=workshop, customer=customer).first()
+    if entry is None:
+        return None
+    return WorkshopWaitlistEntry.objects.filter(workshop=workshop).filter(
+        Q(joined_at__lt=entry.joined_at) | Q(joined_at=entry.joined_at, id__lt=entry.id)
+    ).count() + 1
+
+
+def leave_waitlist(workshop, customer):
+    return WorkshopWaitlistEntry.objects.filter(workshop=workshop, customer=customer).delete()[0] > 0
+
+
+@transaction.atomic
+def cancel_registration(registration):
+    """Cancel a registration and pass its seat to the waitlist.
+
+    Returns False when the registration wasn't holding a seat.
+    """
+    cancelled = WorkshopRegistration.objects.filter(
+        pk=registration.pk, status='registered',
+    ).update(status='cancelled')
+    if not cancelled:
+        return False
+    registration.status = 'cancelled'
+    _give_back_seat(registration.workshop_id)
+    promote_waitlist(registration.workshop_id)
+    return True
+
+
+def promote_waitlist(workshop_id):
+    """Move waitlisted customers into free seats, oldest first.
+
+    Returns the registrations created.
+    """
+    promoted = []
+    while True:
+        with transaction.atomic():
+            if not _take_seat(workshop_id):
+                break
+            entry = WorkshopWaitlistEntry.objects.filter(workshop_id=workshop_id).select_related(
+                'customer', 'workshop'
+            ).first()
+            if entry is None:
+                _give_back_seat(workshop_id)
+                break
+            # Claim the entry; a concurrent promotion may have taken it already
+            if not WorkshopWaitlistEntry.objects.filter(pk=entry.pk).delete()[0]:
+                _give_back_seat(workshop_id)
+                continue
+            registration = _register(workshop_id, entry.customer_id, entry.special_requirements)
+            _notify_promoted(entry)
+            promoted.append(registration)
+    return promoted
+
+
+def _notify_promoted(entry):
+    if not entry.customer.user_id:
+        return
+    Notification.objects.create(
+        user_id=entry.customer.user_id,
+        notification_type='workshop_update',
+        title=f'You have a seat in {entry.workshop.title}',
+        message='A seat opened up and you have been moved from the waitlist to the registered attendees.',
+        link=reverse('workshop_detail', args=[entry.workshop_id]),
+    )
+
+
+def sync_seats(workshop_ids, promote=True):
+    """Recompute ``seats_left`` from the registrations in one UPDATE.
+
+    Used when ``max_participants`` changes and after registrations are edited
+    or deleted outside ``reserve_seat``/``cancel_registration``.
+    """
+    workshop_ids = list(workshop_ids)
+    if not workshop_ids:
+        return
+    held = WorkshopRegistration.objects.filter(
+        workshop=OuterRef('pk'), status__in=SEAT_HOLDING_STATUSES,
+    ).order_by().values('workshop').annotate(count=Count('pk')).values('count')
+
+    Workshop.objects.filter(pk__in=workshop_ids, max_participants__gt=0).update(
+        seats_left=Greatest(F('max_participants') - Coalesce(Subquery(held), Value(0)), Value(0))
+    )
+    Workshop.objects.filter(pk__in=workshop_ids).filter(
+        Q(max_participants__isnull=True) | Q(max_participants__lte=0)
+    ).update(seats_left=None)
+
+    if promote:
+        waiting = WorkshopWaitlistEntry.objects.filter(workshop_id__in=workshop_ids).filter(
+            Q(workshop__seats_left__isnull=True) | Q(workshop__seats_left__gt=0)
+        ).order_by().values_list('workshop_id', flat=True).distinct()
+        for workshop_id in list(waiting):
+            promote_waitlist(workshop_id)